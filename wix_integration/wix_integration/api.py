@@ -0,0 +1,504 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, now_datetime, strip_html
+import hashlib
+import json
+import time
+import requests
+
+from . import circuit_breaker, media, rate_limiter, wix_client
+from .id_resolver import remember
+from .retry_queue import clear_retries, schedule_retry
+from .utils import SyncTimer, log_integration, log_sync
+
+PRODUCTS_ENDPOINT = "/stores/v3/products"
+
+class WixAPIError(Exception):
+	"""Raised when the Wix API returns a non-success response"""
+
+	def __init__(self, message, status_code=None, response=None):
+		super(WixAPIError, self).__init__(message)
+		self.status_code = status_code
+		self.response = response
+
+class WixCircuitOpenError(WixAPIError, circuit_breaker.CircuitOpenError):
+	"""Raised instead of sending a request while the circuit is open; callers keep the work queued"""
+	pass
+
+def get_wix_settings():
+	"""Get the cached, read-only Wix Settings snapshot"""
+	from .doctype.wix_settings.wix_settings import WixSettings
+	return WixSettings.get_settings()
+
+def get_wix_headers(settings=None):
+	"""Build authentication headers for the Wix API"""
+	settings = settings or get_wix_settings()
+	return {
+		'Authorization': f'Bearer {settings.wix_api_key}',
+		'Content-Type': 'application/json',
+		'wix-site-id': settings.wix_site_id
+	}
+
+def make_wix_request(method, endpoint, data=None, params=None, operation=None,
+		reference_doctype=None, reference_name=None):
+	"""Call the Wix API, log the exchange and return the decoded JSON body"""
+	settings = get_wix_settings()
+	operation = operation or f"{method} {endpoint}"
+	started = time.monotonic()
+
+	try:
+		response = wix_client.request(
+			method,
+			endpoint,
+			headers=get_wix_headers(settings),
+			json=data,
+			params=params,
+			timeout=wix_client.get_timeout(settings)
+		)
+	except circuit_breaker.CircuitOpenError as e:
+		# Not logged: nothing was sent, and callers queue the work instead
+		raise WixCircuitOpenError(str(e))
+	except (requests.exceptions.RequestException, rate_limiter.RateLimitTimeout) as e:
+		log_integration(operation, "Failed", request_data=data, error_message=str(e),
+			reference_doctype=reference_doctype, reference_name=reference_name,
+			duration=time.monotonic() - started)
+		raise WixAPIError(f"Failed to connect to Wix API: {str(e)}")
+
+	return read_response(response, operation, started, data, reference_doctype, reference_name)
+
+def read_response(response, operation, started, data=None, reference_doctype=None, reference_name=None):
+	"""Log a Wix API response and return its decoded JSON body, or raise WixAPIError"""
+	try:
+		response_data = response.json() if response.content else {}
+	except ValueError:
+		response_data = {"raw": response.text}
+	duration = time.monotonic() - started
+
+	if not response.ok:
+		error_message = response_data.get("message") or f"Status code: {response.status_code}"
+		log_integration(operation, "Failed", request_data=data, response_data=response_data,
+			error_message=error_message, reference_doctype=reference_doctype, reference_name=reference_name,
+			duration=duration)
+		raise WixAPIError(error_message, status_code=response.status_code, response=response_data)
+
+	log_integration(operation, "Success", request_data=data, response_data=response_data,
+		reference_doctype=reference_doctype, reference_name=reference_name, duration=duration)
+	return response_data
+
+# Item -> Wix product mapping
+# ---------------------------
+
+def get_selling_price_list():
+	"""Price list used for Wix product prices"""
+	return frappe.db.get_single_value("Selling Settings", "selling_price_list") or "Standard Selling"
+
+def get_item_price(item_code, price_list=None):
+	"""Selling rate of an Item in the Wix price list (the latest one if there are several)"""
+	return flt(frappe.db.get_value(
+		"Item Price",
+		{"item_code": item_code, "price_list": price_list or get_selling_price_list(), "selling": 1},
+		"price_list_rate",
+		order_by="modified desc"
+	))
+
+def get_item_prices(item_codes, price_list=None):
+	"""Selling rates of many Items in the Wix price list, with the same pick as get_item_price"""
+	prices = {}
+	if not item_codes:
+		return prices
+
+	for row in frappe.get_all(
+		"Item Price",
+		filters={"item_code": ("in", list(item_codes)), "price_list": price_list or get_selling_price_list(), "selling": 1},
+		fields=["item_code", "price_list_rate"],
+		order_by="modified desc"
+	):
+		prices.setdefault(row.item_code, flt(row.price_list_rate))
+	return prices
+
+def build_variant(sku, price, choices=None):
+	"""Build a Wix V3 variant entry"""
+	variant = {
+		"sku": sku,
+		"price": {"actualPrice": {"amount": f"{flt(price):.2f}"}},
+		"physicalProperties": {}
+	}
+	if choices:
+		variant["choices"] = [
+			{
+				"optionChoiceNames": {
+					"optionName": attribute,
+					"choiceName": value,
+					"renderType": "TEXT_CHOICES"
+				}
+			}
+			for attribute, value in choices
+		]
+	return variant
+
+def build_options(variant_choices):
+	"""Collect Wix V3 product options from the choices of all variants"""
+	options = {}
+	for choices in variant_choices:
+		for attribute, value in choices:
+			values = options.setdefault(attribute, [])
+			if value not in values:
+				values.append(value)
+
+	return [
+		{
+			"name": attribute,
+			"optionRenderType": "TEXT_CHOICES",
+			"choicesSettings": {
+				"choices": [{"choiceType": "CHOICE_TEXT", "name": value} for value in values]
+			}
+		}
+		for attribute, values in options.items()
+	]
+
+def build_product_payload(item):
+	"""Map an Item (template or stand-alone) to a Wix Catalog V3 product"""
+	price_list = get_selling_price_list()
+	variants = []
+
+	if cint(item.has_variants):
+		for variant in frappe.get_all(
+			"Item",
+			filters={"variant_of": item.name, "disabled": 0},
+			fields=["name"],
+			order_by="name asc"
+		):
+			choices = frappe.get_all(
+				"Item Variant Attribute",
+				filters={"parent": variant.name, "parenttype": "Item"},
+				fields=["attribute", "attribute_value"],
+				order_by="idx asc"
+			)
+			variants.append((variant.name, [(row.attribute, row.attribute_value) for row in choices]))
+
+	codes = [name for name, choices in variants] if cint(item.has_variants) else [item.item_code]
+	prices = {code: get_item_price(code, price_list) for code in codes}
+	return assemble_product_payload(item, variants, prices, media.get_item_media(item))
+
+# Items fetched per batch and the fields the payload is built from
+PAYLOAD_ITEM_FIELDS = [
+	"name", "item_code", "item_name", "description", "disabled", "has_variants", "image", "modified",
+	"wix_product_id", "wix_product_revision", "wix_payload_hash"
+]
+
+def build_product_payloads(item_names):
+	"""Build the Wix products of many Items with a fixed number of queries.
+
+	Items, their variants, variant attributes, prices and media are each
+	loaded with one set-based query and assembled exactly like
+	`build_product_payload`. Returns {item name: (item row, payload)};
+	Items that do not exist are left out.
+	"""
+	if not item_names:
+		return {}
+
+	items = frappe.get_all("Item", filters={"name": ("in", list(item_names))}, fields=PAYLOAD_ITEM_FIELDS)
+	templates = [item.name for item in items if cint(item.has_variants)]
+
+	variants_of = {}
+	if templates:
+		for variant in frappe.get_all(
+			"Item",
+			filters={"variant_of": ("in", templates), "disabled": 0},
+			fields=["name", "variant_of"],
+			order_by="name asc"
+		):
+			variants_of.setdefault(variant.variant_of, []).append(variant.name)
+
+	variant_names = [name for names in variants_of.values() for name in names]
+	choices_of = {}
+	if variant_names:
+		for row in frappe.get_all(
+			"Item Variant Attribute",
+			filters={"parent": ("in", variant_names), "parenttype": "Item"},
+			fields=["parent", "attribute", "attribute_value"],
+			order_by="parent asc, idx asc"
+		):
+			choices_of.setdefault(row.parent, []).append((row.attribute, row.attribute_value))
+
+	prices = get_item_prices(variant_names + [item.item_code for item in items if not cint(item.has_variants)])
+	item_media = media.get_items_media(items)
+
+	payloads = {}
+	for item in items:
+		variants = [(name, choices_of.get(name, [])) for name in variants_of.get(item.name, [])]
+		payloads[item.name] = (item, assemble_product_payload(item, variants, prices, item_media.get(item.name)))
+	return payloads
+
+def assemble_product_payload(item, variants, prices, product_media=None):
+	"""Wix product of an Item from its loaded variants, prices and media.
+
+	`variants` lists (variant name, [(attribute, value), ...]) of an Item
+	with variants; `prices` maps item codes to their rate.
+	"""
+	product = {
+		"name": item.item_name or item.item_code,
+		"plainDescription": strip_html(item.description or ""),
+		"visible": not cint(item.disabled),
+		"productType": "PHYSICAL",
+		"physicalProperties": {}
+	}
+
+	if cint(item.has_variants):
+		product["options"] = build_options([choices for name, choices in variants])
+		product["variantsInfo"] = {
+			"variants": [build_variant(name, prices.get(name), choices) for name, choices in variants]
+		}
+	else:
+		product["variantsInfo"] = {"variants": [build_variant(item.item_code, prices.get(item.item_code))]}
+
+	if product_media:
+		product["media"] = product_media
+
+	if item.get("wix_product_revision"):
+		product["revision"] = item.wix_product_revision
+
+	return product
+
+def get_payload_hash(payload):
+	"""Stable hash of the product content, ignoring Wix bookkeeping fields"""
+	content = {key: value for key, value in payload.items() if key not in ("id", "revision")}
+	return hashlib.sha256(
+		json.dumps(content, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+	).hexdigest()
+
+# Item sync queue
+# ---------------
+
+def sync_item_to_wix(doc, method=None):
+	"""Item doc event: mark the Item as pending instead of calling Wix inline.
+
+	The actual push happens in `tasks.sync_pending_products`, so a save only
+	pays for one UPDATE on its own row, however slow Wix is. Repeated saves
+	before the flush collapse into a single push.
+	"""
+	if not cint(doc.get("sync_with_wix")) or doc.get("variant_of"):
+		return
+
+	if doc.flags.get("from_wix_sync") or frappe.flags.get("in_wix_catalog_import"):
+		return
+
+	settings = get_wix_settings()
+	if not settings or not settings.enable_sync or not settings.sync_products:
+		return
+
+	if doc.get("wix_sync_status") in ("Failed", "Error"):
+		# An edit may fix the cause, so start over with a full set of attempts
+		clear_retries("Product", [doc.name])
+
+	if doc.get("wix_sync_status") != "Pending":
+		doc.db_set("wix_sync_status", "Pending", update_modified=False)
+
+	enqueue_pending_sync()
+
+def enqueue_pending_sync():
+	"""Enqueue a single flush of pending Items once the current transaction commits"""
+	if frappe.flags.get("wix_sync_enqueued"):
+		return
+
+	# Once this transaction is over, the next change needs a flush of its own
+	frappe.flags.wix_sync_enqueued = True
+	frappe.db.after_commit.add(reset_pending_sync_flag)
+	frappe.db.after_rollback.add(reset_pending_sync_flag)
+	frappe.enqueue(
+		"wix_integration.tasks.sync_pending_products",
+		queue="long",
+		job_id="wix_sync_pending_products",
+		deduplicate=True,
+		enqueue_after_commit=True
+	)
+
+def reset_pending_sync_flag():
+	frappe.flags.wix_sync_enqueued = False
+
+def push_item_to_wix(item_name, expected_modified=None, force=False):
+	"""Create or update the Wix product for an Item and record the outcome.
+
+	When `expected_modified` is given, the Item is only marked Synced if it
+	was not edited again while the request was in flight. Unless `force` is
+	set, no request is sent when the payload matches the last one pushed.
+	"""
+	timer = SyncTimer()
+	with timer.stage("build"):
+		item = frappe.get_doc("Item", item_name)
+	expected_modified = expected_modified or item.modified
+
+	try:
+		with timer.stage("http"):
+			media.upload_item_images([item.name])
+		with timer.stage("build"):
+			payload = build_product_payload(item)
+			payload_hash = get_payload_hash(payload)
+		if not force and is_unchanged(item, payload_hash):
+			mark_item_unchanged(item.name, expected_modified)
+			return {"success": True, "skipped": True, "wix_product_id": item.wix_product_id}
+
+		with timer.stage("http"):
+			if item.wix_product_id:
+				response = make_wix_request(
+					"PATCH",
+					f"{PRODUCTS_ENDPOINT}/{item.wix_product_id}",
+					data={"product": payload},
+					operation="Update Product",
+					reference_doctype="Item",
+					reference_name=item.name
+				)
+			else:
+				response = make_wix_request(
+					"POST",
+					PRODUCTS_ENDPOINT,
+					data={"product": payload},
+					operation="Create Product",
+					reference_doctype="Item",
+					reference_name=item.name
+				)
+
+		product = response.get("product") or {}
+		with timer.stage("db"):
+			mark_item_synced(item.name, product.get("id") or item.wix_product_id,
+				product.get("revision"), expected_modified, payload_hash)
+			clear_retries("Product", [item.name])
+		log_sync("Product Sync", "Success", "Item", item.name, wix_id=product.get("id"), timer=timer)
+		return {"success": True, "wix_product_id": product.get("id")}
+
+	except circuit_breaker.CircuitOpenError as e:
+		# Nothing was sent: no attempt is used up, the flush after recovery pushes it
+		mark_items_pending([item.name])
+		return {"success": False, "queued": True, "error": str(e)}
+	except Exception as e:
+		with timer.stage("db"):
+			retry_status = schedule_retry("Product", item.name, e)
+			mark_item_failed(item.name, expected_modified, dead_letter=retry_status == "Dead Letter")
+		log_sync("Product Sync", "Failed", "Item", item.name, error_message=str(e), timer=timer)
+		return {"success": False, "error": str(e)}
+
+def is_unchanged(item, payload_hash):
+	"""Whether the Item's Wix product already has this exact content"""
+	return bool(item.get("wix_product_id")) and item.get("wix_payload_hash") == payload_hash
+
+def mark_item_unchanged(item_name, expected_modified):
+	"""Clear Pending for an Item whose payload did not change since the last push"""
+	frappe.db.sql("""
+		UPDATE `tabItem`
+		SET wix_sync_status = 'Synced'
+		WHERE name = %(name)s AND modified = %(modified)s
+	""", {"name": item_name, "modified": expected_modified})
+
+def mark_item_synced(item_name, wix_product_id, revision, expected_modified, payload_hash=None):
+	"""Store the Wix product reference; only clear Pending if the Item is unchanged"""
+	frappe.db.sql("""
+		UPDATE `tabItem`
+		SET wix_product_id = %(wix_product_id)s,
+			wix_product_revision = %(revision)s,
+			wix_payload_hash = %(payload_hash)s,
+			last_wix_sync = %(now)s,
+			wix_sync_status = CASE WHEN modified = %(modified)s THEN 'Synced' ELSE wix_sync_status END
+		WHERE name = %(name)s
+	""", {
+		"wix_product_id": wix_product_id,
+		"revision": revision,
+		"payload_hash": payload_hash,
+		"now": now_datetime(),
+		"modified": expected_modified,
+		"name": item_name
+	})
+	remember("Product", wix_product_id, item_name)
+
+def mark_items_pending(item_names):
+	"""Put Items back in the queue drained by the pending flush"""
+	if item_names:
+		frappe.db.sql("""
+			UPDATE `tabItem` SET wix_sync_status = 'Pending' WHERE name IN %(names)s
+		""", {"names": list(item_names)})
+
+def mark_item_failed(item_name, expected_modified, dead_letter=False):
+	"""Mark the Item as Failed (Error once it is out of retries) unless it was edited again meanwhile"""
+	frappe.db.sql("""
+		UPDATE `tabItem`
+		SET wix_sync_status = %(status)s
+		WHERE name = %(name)s AND modified = %(modified)s
+	""", {"status": "Error" if dead_letter else "Failed", "name": item_name, "modified": expected_modified})
+
+# Whitelisted methods
+# -------------------
+
+@frappe.whitelist()
+def manual_sync_item(item_name):
+	"""Push a single Item to Wix right away"""
+	frappe.has_permission("Item", "write", item_name, throw=True)
+
+	if circuit_breaker.is_open(get_wix_settings().wix_site_id):
+		frappe.db.set_value("Item", item_name, "wix_sync_status", "Pending", update_modified=False)
+		enqueue_pending_sync()
+		return {"status": "queued", "message": _("Wix is unreachable; the Item will be synced once it recovers")}
+
+	result = push_item_to_wix(item_name, force=True)
+	if result.get("queued"):
+		return {"status": "queued", "message": _("Wix is unreachable; the Item will be synced once it recovers")}
+	if not result.get("success"):
+		frappe.throw(_("Wix sync failed: {0}").format(result.get("error")))
+
+	return {"status": "success", "message": _("Item sync initiated successfully")}
+
+@frappe.whitelist()
+def test_wix_connection():
+	"""Test connectivity to the Wix API"""
+	try:
+		make_wix_request("GET", PRODUCTS_ENDPOINT, params={"limit": 1}, operation="Test Connection")
+		return {"success": True, "message": "Connection successful"}
+	except Exception as e:
+		return {"success": False, "error": str(e)}
+
+@frappe.whitelist()
+def get_connection_stats():
+	"""Connection reuse of the pooled Wix session in this worker"""
+	frappe.only_for("System Manager")
+	return wix_client.get_pool_stats()
+
+@frappe.whitelist()
+def get_rate_limit_status():
+	"""Current capacity of the shared Wix rate limiter for this site"""
+	frappe.only_for("System Manager")
+	return rate_limiter.get_status(get_wix_settings().wix_site_id)
+
+@frappe.whitelist()
+def get_circuit_status():
+	"""State of the shared Wix API circuit breaker for this site"""
+	frappe.only_for("System Manager")
+	return circuit_breaker.get_status(get_wix_settings().wix_site_id)
+
+@frappe.whitelist()
+def get_sync_status(item_name):
+	"""Sync status of an Item together with its recent sync logs"""
+	frappe.has_permission("Item", "read", item_name, throw=True)
+
+	item = frappe.db.get_value(
+		"Item",
+		item_name,
+		["wix_product_id", "last_wix_sync", "wix_sync_status"],
+		as_dict=True
+	) or {}
+
+	logs = frappe.get_all(
+		"Wix Sync Log",
+		filters={"reference_doctype": "Item", "reference_name": item_name},
+		fields=["creation", "status", "error_message"],
+		order_by="creation desc",
+		limit_page_length=10
+	)
+
+	return {
+		"item": {
+			"wix_product_id": item.get("wix_product_id"),
+			"wix_last_sync": item.get("last_wix_sync"),
+			"wix_sync_status": item.get("wix_sync_status")
+		},
+		"logs": logs
+	}
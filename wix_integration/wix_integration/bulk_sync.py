@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe import _
+import time
+
+from .api import (
+	build_product_payloads,
+	enqueue_pending_sync,
+	get_payload_hash,
+	is_unchanged,
+	mark_item_failed,
+	mark_items_pending,
+	mark_item_synced,
+	mark_item_unchanged
+)
+from .circuit_breaker import CircuitOpenError
+from .executor import run_calls, wix_call
+from .media import upload_item_images
+from .retry_queue import classify_error, clear_retries, schedule_retry
+from .utils import SyncTimer, log_sync
+
+BULK_CREATE_ENDPOINT = "/stores/v3/bulk/products/create"
+BULK_UPDATE_ENDPOINT = "/stores/v3/bulk/products/update"
+
+# Wix accepts at most 100 products per bulk request
+BULK_CHUNK_SIZE = 100
+
+# Items whose payloads are built together with one set of queries
+PAYLOAD_BATCH_SIZE = 500
+
+def chunked(items, size):
+	"""Yield successive chunks of `size` from a list"""
+	for i in range(0, len(items), size):
+		yield items[i:i + size]
+
+def bulk_upsert_items(item_names, expected_modified=None, chunk_size=BULK_CHUNK_SIZE):
+	"""Push many Items to Wix through the bulk create/update product endpoints.
+
+	Images not uploaded yet are sent to the Wix Media Manager first. Items
+	without a `wix_product_id` are created, the rest are updated, and
+	Items whose payload hash matches the last push are skipped. The bulk
+	requests are sent concurrently through the executor, and each per-item
+	result is written back to `wix_product_id`/`wix_sync_status`. Returns a
+	summary with success, skipped, failure and queued counts; Items of
+	requests not sent because the circuit is open are queued as Pending.
+	"""
+	expected_modified = expected_modified or {}
+	summary = {"total": len(item_names), "success": 0, "skipped": 0, "failed": 0, "queued": 0}
+
+	# New or changed images go up first, so the payloads can reference them
+	upload_item_images(item_names)
+
+	to_create, to_update, skipped = [], [], []
+	for batch in chunked(list(item_names), PAYLOAD_BATCH_SIZE):
+		started = time.monotonic()
+		try:
+			payloads = build_product_payloads(batch)
+		except Exception as e:
+			payloads, error = {}, e
+		else:
+			error = frappe.DoesNotExistError(_("Item not found"))
+		# The batch is built as a whole, so each Item is charged an equal share
+		build_time = (time.monotonic() - started) / len(batch)
+
+		for item_name in batch:
+			timer = SyncTimer()
+			timer.add("build", build_time)
+			if item_name not in payloads:
+				record_failure(item_name, expected_modified.get(item_name), error, summary, timer)
+				continue
+
+			item, payload = payloads[item_name]
+			modified = expected_modified.get(item.name) or item.modified
+			payload_hash = get_payload_hash(payload)
+
+			if is_unchanged(item, payload_hash):
+				mark_item_unchanged(item.name, modified)
+				skipped.append(item.name)
+				summary["skipped"] += 1
+			elif item.wix_product_id:
+				payload["id"] = item.wix_product_id
+				to_update.append((item.name, modified, payload_hash, timer, {"product": payload}))
+			else:
+				to_create.append((item.name, modified, payload_hash, timer, payload))
+
+	clear_retries("Product", skipped)
+
+	calls = [
+		chunk_call(BULK_CREATE_ENDPOINT, "Bulk Create Products", chunk)
+		for chunk in chunked(to_create, chunk_size)
+	] + [
+		chunk_call(BULK_UPDATE_ENDPOINT, "Bulk Update Products", chunk)
+		for chunk in chunked(to_update, chunk_size)
+	]
+	run_calls(calls, lambda call, response, error: handle_chunk_result(call, response, error, summary))
+
+	return summary
+
+def chunk_call(endpoint, operation, chunk):
+	"""The bulk request of one chunk"""
+	return wix_call(
+		"POST",
+		endpoint,
+		data={"products": [entry for item_name, modified, payload_hash, timer, entry in chunk], "returnEntity": True},
+		operation=operation,
+		context=chunk
+	)
+
+def handle_chunk_result(call, response, error, summary):
+	"""Map the result of one bulk request back to its Items.
+
+	Every Item of the chunk is charged the full request time, since that is
+	how long each of them waited on Wix.
+	"""
+	chunk = call.context
+	elapsed = time.monotonic() - call.started if call.started else 0
+	if isinstance(error, CircuitOpenError):
+		# Nothing was sent, so no attempt is used up
+		mark_items_pending([item_name for item_name, modified, payload_hash, timer, entry in chunk])
+		summary["queued"] += len(chunk)
+		return
+
+	if error:
+		for item_name, modified, payload_hash, timer, entry in chunk:
+			timer.add("http", elapsed)
+			record_failure(item_name, modified, error, summary, timer)
+		return
+
+	for item_name, modified, payload_hash, timer, entry in chunk:
+		timer.add("http", elapsed)
+
+	results = response.get("results") or []
+	handled = set()
+	synced = []
+	for position, result in enumerate(results):
+		metadata = result.get("itemMetadata") or {}
+		index = metadata.get("originalIndex", position)
+		if index >= len(chunk):
+			continue
+
+		item_name, modified, payload_hash, timer, entry = chunk[index]
+		handled.add(index)
+
+		if metadata.get("success"):
+			product = result.get("item") or {}
+			wix_product_id = product.get("id") or metadata.get("id")
+			with timer.stage("db"):
+				mark_item_synced(item_name, wix_product_id, product.get("revision"), modified, payload_hash)
+			log_sync("Product Sync", "Success", "Item", item_name, wix_id=wix_product_id, timer=timer)
+			synced.append(item_name)
+			summary["success"] += 1
+		else:
+			record_failure(item_name, modified, metadata.get("error") or {}, summary, timer)
+
+	clear_retries("Product", synced)
+
+	# Anything Wix did not report on is treated as failed so it gets retried
+	for index, (item_name, modified, payload_hash, timer, entry) in enumerate(chunk):
+		if index not in handled:
+			record_failure(item_name, modified, {"code": "NO_RESULT", "description": _("No result returned by Wix")},
+				summary, timer)
+
+def record_failure(item_name, modified, error, summary, timer):
+	"""Mark an Item as failed, schedule its retry and count it in the summary.
+
+	`error` is an exception or a per-item Wix error dict.
+	"""
+	with timer.stage("db"):
+		retry_status = schedule_retry("Product", item_name, error)
+		mark_item_failed(item_name, modified, dead_letter=retry_status == "Dead Letter")
+	log_sync("Product Sync", "Failed", "Item", item_name, error_message=classify_error(error)[1], timer=timer)
+	summary["failed"] += 1
+
+@frappe.whitelist()
+def resync_all_products():
+	"""Queue every Wix-enabled Item for a bulk push"""
+	frappe.only_for("System Manager")
+
+	frappe.db.sql("""
+		UPDATE `tabItem`
+		SET wix_sync_status = 'Pending'
+		WHERE sync_with_wix = 1 AND IFNULL(variant_of, '') = ''
+	""")
+	enqueue_pending_sync()
+
+	return {"status": "success", "message": _("Full product resync queued")}
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""One-off import of an existing Wix catalog into ERPNext Items.
+
+Products are read page by page through the catalog query. Each page is
+inserted in one transaction, under the Default Item Group of Wix Settings,
+and committed together with the "Wix Catalog Import" checkpoint, so an
+interrupted import resumes at the next page. Products already linked to an
+Item are skipped, and Items whose code matches a product SKU are linked
+instead of duplicated.
+
+Outbound sync is suppressed while the import runs, and imported Items are
+stored as Synced with the hash of the payload their first push would send,
+so nothing is pushed back to Wix. Product images are downloaded by a thread pool while the page
+is being inserted, then attached to their Items.
+
+Run it from the shell to see its progress:
+
+	bench --site [your-site] execute wix_integration.catalog_import.import_catalog
+"""
+from __future__ import unicode_literals
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import frappe
+from frappe import _
+from frappe.utils import cint, cstr, flt, now_datetime
+import requests
+
+from .api import build_product_payloads, get_payload_hash, get_selling_price_list, get_wix_settings
+from .id_resolver import remember, resolve_ids, rollback_savepoint, start_savepoint
+from .media import record_media
+from .reconcile import PRODUCTS_PAGE_SIZE, fetch_products_page, get_main_media_id, project_wix_product
+from .utils import get_checkpoint, log_sync, set_checkpoint
+
+CATALOG_IMPORT_CHECKPOINT = "Wix Catalog Import"
+
+# Parallel image downloads; they only wait on the network
+MEDIA_WORKERS = 8
+MEDIA_TIMEOUT = 30
+
+WIX_MEDIA_BASE = "https://static.wixstatic.com/media/"
+DEFAULT_UOM = "Nos"
+
+def import_catalog(page_size=PRODUCTS_PAGE_SIZE, media_workers=MEDIA_WORKERS, download_media=True, restart=False):
+	"""Create Items for every Wix product that has none yet; returns the import counts"""
+	settings = get_wix_settings()
+	if not settings.default_item_group:
+		frappe.throw(_("Set a Default Item Group in Wix Settings before importing the catalog"))
+
+	checkpoint = get_checkpoint(CATALOG_IMPORT_CHECKPOINT)
+	if restart or checkpoint.watermark == "done":
+		checkpoint = frappe._dict()
+	cursor = checkpoint.cursor
+	processed = cint(checkpoint.processed_count)
+
+	price_list = get_selling_price_list()
+	summary = {
+		"pages": 0, "created": 0, "linked": 0, "skipped": 0, "failed": 0,
+		"images": 0, "images_failed": 0, "image_bytes": 0
+	}
+	started = time.monotonic()
+
+	frappe.flags.in_wix_catalog_import = True
+	try:
+		with ThreadPoolExecutor(max_workers=cint(media_workers) or MEDIA_WORKERS) as pool:
+			while True:
+				response = fetch_products_page(cursor, page_size)
+				products = response.get("products") or []
+				existing = get_existing_items(products)
+				downloads, created = [], []
+
+				for product in products:
+					start_savepoint("wix_catalog_import")
+					try:
+						result, item_code = import_product(product, existing, settings, price_list)
+					except Exception as e:
+						rollback_savepoint("wix_catalog_import")
+						summary["failed"] += 1
+						log_sync("Product Sync", "Failed", wix_id=product.get("id"), error_message=str(e))
+						continue
+
+					summary[result] += 1
+					if result == "created":
+						created.append(item_code)
+					image_url = get_image_url(product) if download_media and result == "created" else None
+					if image_url:
+						downloads.append((item_code, get_main_media_id(product), pool.submit(download_image, image_url)))
+
+				attach_images(downloads, summary)
+				store_payload_hashes(created)
+
+				cursor = ((response.get("pagingMetadata") or {}).get("cursors") or {}).get("next")
+				processed += len(products)
+				summary["pages"] += 1
+				set_checkpoint(CATALOG_IMPORT_CHECKPOINT, watermark="running" if cursor else "done",
+					cursor=cursor, processed_count=processed)
+				frappe.db.commit()
+				print_progress(summary, processed, started)
+
+				if not products or not cursor:
+					break
+	finally:
+		frappe.flags.in_wix_catalog_import = False
+
+	return summary
+
+def get_existing_items(products):
+	"""Items of a page already linked to its products, or named like their SKUs or slugs"""
+	linked = resolve_ids("Product", [product["id"] for product in products])
+	named = resolve_ids("SKU", [code for product in products for code in get_item_codes(product)])
+	return frappe._dict(
+		linked={product_id for product_id, name in linked.items() if name},
+		named={code for code, name in named.items() if name}
+	)
+
+def get_item_codes(product):
+	"""Item code of the product itself (template or stand-alone) and of its variants"""
+	variants = get_variants(product)
+	if not product.get("options"):
+		return [(variants[0].get("sku") if variants else None) or product["id"]]
+	return [product.get("slug") or product["id"]] + [variant.get("sku") or variant.get("id") for variant in variants]
+
+def get_variants(product):
+	return (product.get("variantsInfo") or {}).get("variants") or []
+
+def import_product(product, existing, settings, price_list):
+	"""Create (or link) the Item of one Wix product; returns (result, item code)"""
+	if product["id"] in existing.linked:
+		return "skipped", None
+
+	codes = get_item_codes(product)
+	item_code = codes[0]
+	if item_code in existing.named:
+		# An existing Item is only pushed if its content differs from the product
+		mark_imported(item_code, product, get_payload_hash(project_wix_product(product)))
+		return "linked", item_code
+
+	variants = get_variants(product)
+	if not product.get("options"):
+		insert_item(item_code, product, settings)
+		set_price(item_code, variants[0] if variants else {}, price_list)
+	else:
+		for option in product["options"]:
+			ensure_item_attribute(option.get("name"), [
+				choice.get("name") for choice in (option.get("choicesSettings") or {}).get("choices") or []
+			])
+
+		insert_item(item_code, product, settings, has_variants=1, attributes=[
+			{"attribute": option.get("name")} for option in product["options"]
+		])
+		for variant_code, variant in zip(codes[1:], variants):
+			insert_item(variant_code, product, settings, variant_of=item_code, attributes=[
+				{"attribute": names.get("optionName"), "attribute_value": names.get("choiceName")}
+				for names in (choice.get("optionChoiceNames") for choice in variant.get("choices") or [])
+				if names
+			])
+			set_price(variant_code, variant, price_list)
+
+	mark_imported(item_code, product)
+	return "created", item_code
+
+def insert_item(item_code, product, settings, **values):
+	item = frappe.get_doc(dict(
+		values,
+		doctype="Item",
+		item_code=item_code,
+		item_name=cstr(product.get("name"))[:140] or item_code,
+		description=product.get("plainDescription") or product.get("name"),
+		item_group=settings.default_item_group,
+		stock_uom=DEFAULT_UOM,
+		is_stock_item=1,
+		disabled=0 if product.get("visible", True) else 1,
+		sync_with_wix=1
+	))
+	item.flags.from_wix_sync = True
+	item.insert(ignore_permissions=True)
+	remember("SKU", item_code, item.name)
+	return item
+
+def set_price(item_code, variant, price_list):
+	amount = flt(((variant.get("price") or {}).get("actualPrice") or {}).get("amount"))
+	if amount:
+		frappe.get_doc({
+			"doctype": "Item Price",
+			"item_code": item_code,
+			"price_list": price_list,
+			"price_list_rate": amount
+		}).insert(ignore_permissions=True)
+
+def ensure_item_attribute(attribute, values):
+	"""Create the Item Attribute of a Wix option, or add the choices it lacks"""
+	if frappe.db.exists("Item Attribute", attribute):
+		doc = frappe.get_doc("Item Attribute", attribute)
+		known = {row.attribute_value for row in doc.item_attribute_values}
+		missing = [value for value in values if value not in known]
+		if not missing:
+			return
+	else:
+		doc = frappe.get_doc({"doctype": "Item Attribute", "attribute_name": attribute})
+		missing = values
+
+	for value in missing:
+		doc.append("item_attribute_values", {"attribute_value": value, "abbr": value})
+	doc.save(ignore_permissions=True)
+
+def mark_imported(item_code, product, payload_hash=None):
+	"""Store the Wix reference and content hash so the Item is not pushed straight back"""
+	frappe.db.sql("""
+		UPDATE `tabItem`
+		SET wix_product_id = %(wix_product_id)s,
+			wix_product_revision = %(revision)s,
+			wix_payload_hash = %(payload_hash)s,
+			last_wix_sync = %(now)s,
+			wix_sync_status = 'Synced'
+		WHERE name = %(name)s
+	""", {
+		"wix_product_id": product["id"],
+		"revision": product.get("revision"),
+		"payload_hash": payload_hash,
+		"now": now_datetime(),
+		"name": item_code
+	})
+	remember("Product", product["id"], item_code)
+
+def store_payload_hashes(item_codes):
+	"""Hash created Items as their first push builds them, once their images are attached"""
+	for item_code, (item, payload) in build_product_payloads(item_codes).items():
+		frappe.db.set_value("Item", item_code, "wix_payload_hash", get_payload_hash(payload), update_modified=False)
+
+def get_image_url(product):
+	"""Downloadable URL of the product's main image, if it has one"""
+	image = (((product.get("media") or {}).get("main") or {}).get("image"))
+	if isinstance(image, dict):
+		image = image.get("url") or image.get("id")
+	if not image:
+		return None
+
+	if image.startswith("wix:image://v1/"):
+		# wix:image://v1/<media id>/<file name>#originWidth=...
+		return WIX_MEDIA_BASE + image[len("wix:image://v1/"):].split("/", 1)[0]
+	if image.startswith(("http://", "https://")):
+		return image
+	return WIX_MEDIA_BASE + image
+
+def download_image(url):
+	"""Fetch one image in a pool thread; returns (file name, content). Must not touch the database."""
+	response = requests.get(url, timeout=MEDIA_TIMEOUT)
+	response.raise_for_status()
+	return os.path.basename(urlparse(url).path) or "image", response.content
+
+def attach_images(downloads, summary):
+	"""Attach the downloaded images of a page to their Items as the Item image.
+
+	Each image is also recorded as already uploaded under its Wix media ID,
+	so the first push of the Item does not upload it again.
+	"""
+	for item_code, media_id, future in downloads:
+		try:
+			file_name, content = future.result()
+			file_doc = frappe.get_doc({
+				"doctype": "File",
+				"file_name": file_name,
+				"content": content,
+				"attached_to_doctype": "Item",
+				"attached_to_name": item_code,
+				"is_private": 0
+			}).insert(ignore_permissions=True)
+			frappe.db.set_value("Item", item_code, "image", file_doc.file_url, update_modified=False)
+			if media_id:
+				record_media(hashlib.sha256(content).hexdigest(), {"id": media_id}, file_name, len(content))
+		except Exception as e:
+			summary["images_failed"] += 1
+			frappe.logger("wix_integration").warning(f"Could not import image of Item {item_code}: {str(e)}")
+			continue
+
+		summary["images"] += 1
+		summary["image_bytes"] += len(content)
+
+def print_progress(summary, processed, started):
+	elapsed = max(time.monotonic() - started, 0.001)
+	print(
+		f"Page {summary['pages']}: {processed} products read "
+		f"({summary['created']} created, {summary['linked']} linked, {summary['skipped']} skipped, "
+		f"{summary['failed']} failed), {summary['created'] / elapsed:.1f} Items/s; "
+		f"{summary['images']} images ({summary['image_bytes'] / 1048576:.1f} MB, "
+		f"{summary['image_bytes'] / 1048576 / elapsed:.2f} MB/s), {summary['images_failed']} failed"
+	)
+
+@frappe.whitelist()
+def start_catalog_import(restart=0):
+	"""Run (or resume) the Wix catalog import in the background"""
+	frappe.only_for("System Manager")
+
+	frappe.enqueue(
+		"wix_integration.catalog_import.import_catalog",
+		queue="long",
+		timeout=6 * 3600,
+		job_id="wix_import_catalog",
+		deduplicate=True,
+		restart=cint(restart)
+	)
+	return {"status": "success", "message": _("Wix catalog import queued")}
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Circuit breaker shared by every worker that talks to the same Wix site.
+
+The breaker state lives in a Redis hash in `frappe.cache()` and is changed
+by Lua scripts, so all workers see the same circuit:
+
+- closed: requests go through; connection errors, timeouts and 5xx
+  answers are counted and a success resets the count. Reaching the
+  threshold opens the circuit.
+- open: requests fail fast and sync jobs leave their work queued.
+- half-open: once the cool-down has passed, exactly one caller runs
+  `api.test_wix_connection` as a probe. Success closes the circuit and
+  flushes the pending Items; failure opens it for another cool-down.
+
+Tunable from site config: `wix_circuit_failures` (consecutive failures
+that open the circuit) and `wix_circuit_cooldown` (seconds before a probe).
+"""
+from __future__ import unicode_literals
+import time
+
+import frappe
+from frappe.utils import cint, flt
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_COOLDOWN = 60
+
+# A probe that has not reported back within this many seconds is handed
+# to the next caller, in case its worker died
+PROBE_TIMEOUT = 60
+
+KEY_TTL = 86400
+
+ALLOW_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local cooldown = tonumber(ARGV[1])
+local probe_timeout = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if state == 'closed' then
+	return {'allow', '0'}
+end
+
+if state == 'open' then
+	local opened_at = tonumber(redis.call('HGET', KEYS[1], 'opened_at')) or 0
+	if now - opened_at < cooldown then
+		return {'deny', tostring(opened_at + cooldown - now)}
+	end
+else
+	local probe_started = tonumber(redis.call('HGET', KEYS[1], 'probe_started')) or 0
+	if now - probe_started < probe_timeout then
+		return {'deny', '0'}
+	end
+end
+
+redis.call('HSET', KEYS[1], 'state', 'half_open', 'probe_started', tostring(now))
+redis.call('EXPIRE', KEYS[1], ttl)
+return {'probe', '0'}
+"""
+
+RESULT_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local success = tonumber(ARGV[1])
+local threshold = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if success == 1 then
+	if state == 'closed' and (tonumber(redis.call('HGET', KEYS[1], 'failures')) or 0) > 0 then
+		redis.call('HSET', KEYS[1], 'failures', '0')
+	end
+	return state
+end
+
+local failures = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+if state == 'closed' and failures >= threshold then
+	state = 'open'
+	redis.call('HSET', KEYS[1], 'state', state, 'opened_at', tostring(now))
+end
+redis.call('EXPIRE', KEYS[1], ttl)
+return state
+"""
+
+TRANSITION_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = ARGV[1]
+local ttl = tonumber(ARGV[2])
+
+if state == 'open' then
+	redis.call('HSET', KEYS[1], 'state', 'open', 'opened_at', tostring(now))
+else
+	redis.call('HSET', KEYS[1], 'state', 'closed', 'failures', '0')
+end
+redis.call('EXPIRE', KEYS[1], ttl)
+return state
+"""
+
+class CircuitOpenError(Exception):
+	"""Raised instead of calling Wix while the circuit is open"""
+	pass
+
+_scripts = {}
+
+def get_script(source):
+	"""Register a Lua script once per process and per Redis client"""
+	cache = frappe.cache()
+	key = (id(cache), source)
+	if key not in _scripts:
+		_scripts[key] = cache.register_script(source)
+	return _scripts[key]
+
+def get_limits():
+	"""Configured failure threshold and cool-down"""
+	return (
+		cint(frappe.conf.get("wix_circuit_failures")) or DEFAULT_FAILURE_THRESHOLD,
+		flt(frappe.conf.get("wix_circuit_cooldown")) or DEFAULT_COOLDOWN
+	)
+
+def get_circuit_key(wix_site_id):
+	return frappe.cache().make_key(f"wix_circuit|{wix_site_id or 'default'}")
+
+def before_request(wix_site_id):
+	"""Let a request through, run the half-open probe, or raise CircuitOpenError"""
+	if frappe.flags.get("wix_circuit_probe"):
+		return
+
+	threshold, cooldown = get_limits()
+	try:
+		decision, retry_in = get_script(ALLOW_SCRIPT)(
+			keys=[get_circuit_key(wix_site_id)],
+			args=[cooldown, PROBE_TIMEOUT, KEY_TTL]
+		)
+	except Exception as e:
+		# Never stop syncing because Redis is unavailable
+		frappe.logger("wix_integration").warning(f"Wix circuit breaker unavailable: {str(e)}")
+		return
+
+	decision = frappe.safe_decode(decision)
+	if decision == "allow":
+		return
+	if decision == "probe" and run_probe(wix_site_id).get("success"):
+		return
+
+	raise CircuitOpenError(f"Wix API circuit is open; retry in {max(flt(frappe.safe_decode(retry_in)), 1):.0f}s")
+
+def record_result(wix_site_id, success):
+	"""Count a failed call, or reset the count after a successful one"""
+	threshold, cooldown = get_limits()
+	try:
+		state = get_script(RESULT_SCRIPT)(
+			keys=[get_circuit_key(wix_site_id)],
+			args=[1 if success else 0, threshold, KEY_TTL]
+		)
+	except Exception as e:
+		frappe.logger("wix_integration").warning(f"Wix circuit breaker unavailable: {str(e)}")
+		return
+
+	if not success and frappe.safe_decode(state) == "open":
+		frappe.logger("wix_integration").warning(f"Wix API circuit opened for site {wix_site_id}")
+
+def set_state(wix_site_id, state):
+	"""Force the circuit open or closed"""
+	try:
+		get_script(TRANSITION_SCRIPT)(keys=[get_circuit_key(wix_site_id)], args=[state, KEY_TTL])
+	except Exception as e:
+		frappe.logger("wix_integration").warning(f"Wix circuit breaker unavailable: {str(e)}")
+
+def run_probe(wix_site_id):
+	"""Test the connection, bypassing the breaker, then close or reopen the circuit.
+
+	Returns the result of `api.test_wix_connection`.
+	"""
+	from .api import test_wix_connection
+
+	# Restored afterwards: a caller may already be running past the breaker
+	in_probe = frappe.flags.get("wix_circuit_probe")
+	frappe.flags.wix_circuit_probe = True
+	try:
+		result = test_wix_connection()
+	finally:
+		frappe.flags.wix_circuit_probe = in_probe
+
+	if result.get("success"):
+		close_circuit(wix_site_id)
+	else:
+		set_state(wix_site_id, "open")
+
+	return result
+
+def close_circuit(wix_site_id):
+	"""Close the circuit after a successful call past the breaker and flush what it held back"""
+	from .api import enqueue_pending_sync
+
+	was_open = is_open(wix_site_id)
+	set_state(wix_site_id, "closed")
+	if was_open:
+		frappe.logger("wix_integration").info(f"Wix API circuit closed for site {wix_site_id}")
+		# Items saved while the circuit was open are waiting as Pending
+		enqueue_pending_sync()
+
+def probe_if_due(wix_site_id):
+	"""Run the half-open probe when the cool-down has passed, even without traffic"""
+	try:
+		before_request(wix_site_id)
+	except CircuitOpenError:
+		pass
+
+def is_open(wix_site_id):
+	"""Whether calls to Wix should be deferred (circuit open or being probed)"""
+	return get_status(wix_site_id)["state"] != "closed"
+
+def get_status(wix_site_id):
+	"""State, consecutive failures and remaining cool-down of a site's circuit"""
+	threshold, cooldown = get_limits()
+	try:
+		# Values are written raw by the Lua scripts, so bypass the unpickling hgetall
+		state = frappe.cache().execute_command("HGETALL", get_circuit_key(wix_site_id)) or {}
+	except Exception:
+		state = {}
+	state = {frappe.safe_decode(k): frappe.safe_decode(v) for k, v in state.items()}
+
+	opened_at = flt(state.get("opened_at"))
+	circuit = state.get("state") or "closed"
+	return {
+		"state": circuit,
+		"failures": cint(state.get("failures")),
+		"threshold": threshold,
+		"retry_in": round(max(opened_at + cooldown - time.time(), 0), 1) if circuit == "open" else 0
+	}
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Customer lookup by buyer email for imported Wix orders.
+
+Emails are normalized (trimmed, lower case) before every lookup. A page
+of orders resolves all its emails at once: cached answers come from a
+Redis hash in one HMGET, the rest from one query on the indexed Contact
+Email table. The hash holds plain strings, written with raw commands.
+Customer and Contact doc events drop the cached emails they affect.
+
+Missing Customers are created under a Redis lock per email that is held
+until the creating transaction commits or rolls back, and the email is
+cached on commit, so two workers importing orders of the same new buyer
+end up with one Customer. Rolling back the order's savepoint releases the
+lock too, so the buyer's next order does not wait for it.
+"""
+from __future__ import unicode_literals
+import frappe
+from frappe import _
+
+from .id_resolver import get_map, on_savepoint_rollback, remember
+
+CACHE_KEY = "wix_customer_email"
+
+# A creator that died keeps the lock at most this long
+LOCK_TIMEOUT = 300
+
+# How long another worker waits for the creator's transaction to finish
+LOCK_WAIT = 60
+
+class CustomerLockTimeout(frappe.ValidationError):
+	"""Another import held the lock on a buyer's email for longer than LOCK_WAIT"""
+	pass
+
+def normalize_email(email):
+	return (email or "").strip().lower()
+
+def resolve_customers(emails):
+	"""Customer of each normalized email, or None; one query for everything not cached"""
+	known = get_map("Customer")
+	emails = [email for email in dict.fromkeys(normalize_email(email) for email in emails) if email]
+
+	unseen = [email for email in emails if email not in known]
+	if unseen:
+		known.update(zip(unseen, get_cached(unseen)))
+
+	missing = [email for email in unseen if not known[email]]
+	if missing:
+		found = get_customers_by_email(missing)
+		for email in missing:
+			known[email] = found.get(email)
+		set_cached({email: found[email] for email in missing if found.get(email)})
+
+	return {email: known.get(email) for email in emails}
+
+def get_cache_key():
+	return frappe.cache().make_key(CACHE_KEY)
+
+def get_cached(emails):
+	"""Cached Customer of each email, in order, with one HMGET"""
+	return [
+		frappe.safe_decode(customer) if customer else None
+		for customer in frappe.cache().execute_command("HMGET", get_cache_key(), *emails)
+	]
+
+def set_cached(customers):
+	if customers:
+		frappe.cache().execute_command("HSET", get_cache_key(), *[
+			value for email, customer in customers.items() for value in (email, customer)
+		])
+
+def get_customers_by_email(emails):
+	"""Oldest Customer linked to a Contact with each email"""
+	rows = frappe.db.sql("""
+		SELECT ce.email_id, dl.link_name
+		FROM `tabContact Email` ce
+		INNER JOIN `tabDynamic Link` dl
+			ON dl.parent = ce.parent AND dl.parenttype = 'Contact' AND dl.link_doctype = 'Customer'
+		WHERE ce.email_id IN %(emails)s
+		ORDER BY dl.creation ASC
+	""", {"emails": emails})
+
+	customers = {}
+	for email, customer in rows:
+		customers.setdefault(normalize_email(email), customer)
+	return customers
+
+def get_or_create_customer(email, create):
+	"""Customer of a normalized email, calling `create()` under the email's lock if there is none"""
+	customer = resolve_customers([email]).get(email)
+	if customer:
+		return customer
+
+	lock = frappe.cache().lock(frappe.cache().make_key(f"wix_customer_lock|{email}"), timeout=LOCK_TIMEOUT)
+	if not lock.acquire(blocking_timeout=LOCK_WAIT):
+		raise CustomerLockTimeout(_("Timed out waiting for another import to create the Customer of {0}").format(email))
+
+	try:
+		# The worker we waited for caches the email when it commits
+		customer = get_cached([email])[0]
+		if customer and frappe.db.exists("Customer", customer):
+			get_map("Customer")[email] = customer
+			return customer
+
+		customer = create()
+	except Exception:
+		lock.release()
+		raise
+
+	# Journaled, so rolling back the order's savepoint forgets it again
+	remember("Customer", email, customer)
+	frappe.db.after_commit.add(lambda: publish_customer(email, customer, lock))
+	frappe.db.after_rollback.add(lambda: release(lock))
+	on_savepoint_rollback(lambda: release(lock))
+	return customer
+
+def publish_customer(email, customer, lock):
+	"""After commit: cache the new Customer, unless its order was rolled back to a savepoint"""
+	if frappe.db.exists("Customer", customer):
+		set_cached({email: customer})
+	else:
+		get_map("Customer").pop(email, None)
+	release(lock)
+
+def release(lock):
+	try:
+		lock.release()
+	except Exception:
+		# Already released, or expired after LOCK_TIMEOUT
+		pass
+
+def invalidate_emails(emails):
+	"""Drop cached customers of these emails, in Redis and in this job"""
+	known = get_map("Customer")
+	emails = {normalize_email(email) for email in emails if email}
+	if emails:
+		frappe.cache().execute_command("HDEL", get_cache_key(), *emails)
+	for email in emails:
+		known.pop(email, None)
+
+def invalidate_customer(doc, method=None, *args):
+	"""Customer doc event: forget the emails cached for this Customer"""
+	invalidate_emails(frappe.db.sql_list("""
+		SELECT ce.email_id
+		FROM `tabContact Email` ce
+		INNER JOIN `tabDynamic Link` dl
+			ON dl.parent = ce.parent AND dl.parenttype = 'Contact' AND dl.link_doctype = 'Customer'
+		WHERE dl.link_name = %s
+	""", (doc.name,)))
+
+def invalidate_contact(doc, method=None):
+	"""Contact doc event: forget the emails the Contact has or had"""
+	emails = {row.email_id for row in doc.get("email_ids") or []}
+	previous = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+	if previous:
+		emails.update(row.email_id for row in previous.get("email_ids") or [])
+	invalidate_emails(emails)
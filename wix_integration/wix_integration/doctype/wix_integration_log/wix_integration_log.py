@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.model.document import Document
+
+from wix_integration.payload_store import decode_payload
+
+class WixIntegrationLog(Document):
+	"""Request/response log for a single call to the Wix API"""
+
+	def onload(self):
+		# Bodies are stored compact and possibly compressed; show them readable
+		self.request_data = decode_payload(self.request_data, pretty=True)
+		self.response_data = decode_payload(self.response_data, pretty=True)
+
+def on_doctype_update():
+	# Covers the date-range aggregates of the weekly report without reading rows
+	frappe.db.add_index("Wix Integration Log", ["creation", "status", "operation"])
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.model.document import Document
+
+class WixMedia(Document):
+	"""A file uploaded to the Wix Media Manager, keyed by the hash of its content"""
+	pass
@@ -5,6 +5,19 @@ from frappe.model.document import Document
 from frappe import _
 import requests
 import json
+import hashlib
+import time
+from dataclasses import dataclass
+
+from frappe.utils import cint, flt
+from frappe.utils.password import get_decrypted_password
+
+from wix_integration import circuit_breaker, wix_client
+
+# Seconds a successful credential check is trusted for the same credentials
+CREDENTIALS_CACHE_TTL = 6 * 60 * 60
+
+SETTINGS_VERSION_KEY = "wix_settings_version"
 
 class WixSettings(Document):
 	"""Wix Settings DocType for managing Wix integration configuration"""
@@ -21,26 +34,72 @@ class WixSettings(Document):
 			if not self.default_item_group:
 				frappe.throw(_("Default Item Group is required when sync is enabled"))
 		
-		# Validate API credentials if provided
-		if self.wix_site_id and self.wix_api_key:
-			self.validate_wix_credentials()
+		# Validate API credentials only when they changed and were not verified recently
+		if (self.wix_site_id and self.wix_api_key and self.credentials_changed()
+				and not self.is_credentials_verified()):
+			if self.verify_credentials_async:
+				self.flags.verify_credentials_after_save = True
+			else:
+				self.validate_wix_credentials()
+	
+	def get_api_key(self):
+		"""API key being saved, or the stored one when the field holds the masked value"""
+		if self.wix_api_key and not self.is_dummy_password(self.wix_api_key):
+			return self.wix_api_key
+		return self.get_password("wix_api_key", raise_exception=False)
+	
+	def get_credentials_hash(self):
+		"""Stable hash of the credentials, used as the verification cache key"""
+		credentials = "|".join([self.wix_site_id or "", self.wix_account_id or "", self.get_api_key() or ""])
+		return hashlib.sha256(credentials.encode("utf-8")).hexdigest()
+	
+	def credentials_changed(self):
+		"""Whether the site ID, account ID or API key differ from the saved values"""
+		before = self.get_doc_before_save()
+		if not before:
+			return True
+		
+		return (
+			self.wix_site_id != before.wix_site_id
+			or self.wix_account_id != before.wix_account_id
+			or not self.is_dummy_password(self.wix_api_key or "")
+		)
+	
+	def is_credentials_verified(self):
+		return bool(frappe.cache().get_value(f"wix_credentials_verified|{self.get_credentials_hash()}"))
+	
+	def mark_credentials_verified(self):
+		frappe.cache().set_value(
+			f"wix_credentials_verified|{self.get_credentials_hash()}",
+			1,
+			expires_in_sec=CREDENTIALS_CACHE_TTL
+		)
 	
 	def validate_wix_credentials(self):
 		"""Validate Wix API credentials"""
 		try:
 			# Test connection to Wix API
 			headers = {
-				'Authorization': f'Bearer {self.wix_api_key}',
+				'Authorization': f'Bearer {self.get_api_key()}',
 				'Content-Type': 'application/json',
 				'wix-site-id': self.wix_site_id
 			}
 			
-			# Try to fetch site info to validate credentials
-			response = requests.get(
-				f'https://www.wixapis.com/stores/v3/products?limit=1',
-				headers=headers,
-				timeout=10
-			)
+			# Try to fetch site info to validate credentials. The check goes
+			# past the circuit breaker: an open circuit may be the old
+			# credentials failing, and these are the ones to test
+			in_probe = frappe.flags.get("wix_circuit_probe")
+			frappe.flags.wix_circuit_probe = True
+			try:
+				response = wix_client.request(
+					'GET',
+					'/stores/v3/products',
+					headers=headers,
+					params={'limit': 1},
+					timeout=wix_client.get_timeout(self)
+				)
+			finally:
+				frappe.flags.wix_circuit_probe = in_probe
 			
 			if response.status_code == 401:
 				frappe.throw(_("Invalid Wix API credentials. Please check your API Key and Site ID."))
@@ -49,6 +108,9 @@ class WixSettings(Document):
 			elif response.status_code != 200:
 				frappe.throw(_(f"Failed to connect to Wix API. Status code: {response.status_code}"))
 			
+			self.mark_credentials_verified()
+			circuit_breaker.close_circuit(self.wix_site_id)
+			self.sync_status = "Connected"
 			frappe.msgprint(_("Wix API credentials validated successfully!"), alert=True)
 			
 		except requests.exceptions.RequestException as e:
@@ -69,19 +131,149 @@ class WixSettings(Document):
 	
 	def on_update(self):
 		"""Called when document is updated"""
-		# Clear cache when settings are updated
-		frappe.cache().delete_value("wix_settings")
+		# Invalidate the settings snapshot held by every worker, once the new
+		# values are committed and visible to them
+		frappe.db.after_commit.add(bump_settings_version)
+		
+		if self.flags.verify_credentials_after_save:
+			frappe.enqueue(
+				"wix_integration.doctype.wix_settings.wix_settings.verify_credentials_in_background",
+				credentials_hash=self.get_credentials_hash(),
+				user=frappe.session.user,
+				enqueue_after_commit=True
+			)
 		
 		# Log the update
 		frappe.logger().info("Wix Settings updated")
 	
 	@staticmethod
 	def get_settings():
-		"""Get Wix settings with caching"""
-		cached_settings = frappe.cache().get_value("wix_settings")
-		if cached_settings:
-			return cached_settings
-		
-		settings = frappe.get_single("Wix Settings")
-		frappe.cache().set_value("wix_settings", settings, expires_in_sec=300)  # Cache for 5 minutes
-		return settings
+		"""Get a read-only snapshot of Wix settings for hot paths"""
+		return get_settings_snapshot()
+
+@dataclass(frozen=True)
+class WixSettingsSnapshot:
+	"""Immutable copy of the Wix Settings fields read while syncing"""
+	__slots__ = (
+		"enable_sync", "wix_site_id", "wix_api_key", "wix_account_id",
+		"default_item_group", "default_warehouse", "default_customer_group", "default_territory",
+		"sync_products", "sync_orders", "sync_inventory", "sync_customers",
+		"inventory_sync_mode", "stock_threshold", "sync_frequency", "max_retry_attempts", "connection_timeout", "push_concurrency", "enable_webhook", "webhook_public_key",
+		"log_retention_days", "failed_log_retention_days", "archive_purged_logs"
+	)
+	enable_sync: bool
+	wix_site_id: str
+	wix_api_key: str
+	wix_account_id: str
+	default_item_group: str
+	default_warehouse: str
+	default_customer_group: str
+	default_territory: str
+	sync_products: bool
+	sync_orders: bool
+	sync_inventory: bool
+	sync_customers: bool
+	inventory_sync_mode: str
+	stock_threshold: float
+	sync_frequency: str
+	max_retry_attempts: int
+	connection_timeout: int
+	push_concurrency: int
+	enable_webhook: bool
+	webhook_public_key: str
+	log_retention_days: int
+	failed_log_retention_days: int
+	archive_purged_logs: bool
+
+	def get(self, fieldname, default=None):
+		return getattr(self, fieldname, default)
+
+	def __repr__(self):
+		# Keep the decrypted API key out of logs and tracebacks
+		return f"WixSettingsSnapshot(wix_site_id={self.wix_site_id!r}, enable_sync={self.enable_sync!r})"
+
+	@classmethod
+	def load(cls):
+		"""Build a snapshot from the singles table"""
+		values = frappe.db.get_singles_dict("Wix Settings")
+		return cls(
+			enable_sync=bool(cint(values.get("enable_sync"))),
+			wix_site_id=values.get("wix_site_id"),
+			wix_api_key=get_decrypted_password("Wix Settings", "Wix Settings", "wix_api_key", raise_exception=False),
+			wix_account_id=values.get("wix_account_id"),
+			default_item_group=values.get("default_item_group"),
+			default_warehouse=values.get("default_warehouse"),
+			default_customer_group=values.get("default_customer_group"),
+			default_territory=values.get("default_territory"),
+			sync_products=bool(cint(values.get("sync_products"))),
+			sync_orders=bool(cint(values.get("sync_orders"))),
+			sync_inventory=bool(cint(values.get("sync_inventory"))),
+			sync_customers=bool(cint(values.get("sync_customers"))),
+			inventory_sync_mode=values.get("inventory_sync_mode") or "Quantity",
+			stock_threshold=flt(values.get("stock_threshold")),
+			sync_frequency=values.get("sync_frequency"),
+			# None while never set, so that 0 ("no retries") stays distinguishable
+			max_retry_attempts=None if values.get("max_retry_attempts") in (None, "") else cint(values.get("max_retry_attempts")),
+			connection_timeout=cint(values.get("connection_timeout")),
+			push_concurrency=cint(values.get("push_concurrency")),
+			enable_webhook=bool(cint(values.get("enable_webhook"))),
+			webhook_public_key=values.get("webhook_public_key"),
+			log_retention_days=cint(values.get("log_retention_days")),
+			failed_log_retention_days=cint(values.get("failed_log_retention_days")),
+			archive_purged_logs=bool(cint(values.get("archive_purged_logs")))
+		)
+
+# Per-process memo: site -> (version, snapshot, last version check)
+_snapshots = {}
+
+# Seconds a process trusts its snapshot before asking Redis for the version again
+VERSION_CHECK_INTERVAL = 1
+
+def get_settings_version():
+	return frappe.cache().execute_command("GET", frappe.cache().make_key(SETTINGS_VERSION_KEY))
+
+def bump_settings_version():
+	"""Invalidate the settings snapshot in every worker"""
+	frappe.cache().execute_command("INCR", frappe.cache().make_key(SETTINGS_VERSION_KEY))
+
+def get_settings_snapshot():
+	"""Snapshot of Wix Settings, reloaded only when the version in Redis moves"""
+	site = getattr(frappe.local, "site", None)
+	memo = _snapshots.get(site)
+	now = time.monotonic()
+
+	if memo and now - memo[2] < VERSION_CHECK_INTERVAL:
+		return memo[1]
+
+	version = get_settings_version()
+	if memo and memo[0] == version:
+		_snapshots[site] = (version, memo[1], now)
+		return memo[1]
+
+	snapshot = WixSettingsSnapshot.load()
+	_snapshots[site] = (version, snapshot, now)
+	return snapshot
+
+def verify_credentials_in_background(credentials_hash, user=None):
+	"""Verify saved credentials off the request and record the result in Sync Status"""
+	settings = frappe.get_single("Wix Settings")
+	if settings.get_credentials_hash() != credentials_hash:
+		# Credentials changed again; the newer save queued its own check
+		return
+	
+	try:
+		settings.validate_wix_credentials()
+		status, message = "Connected", _("Wix API credentials validated successfully!")
+	except Exception as e:
+		status, message = "Error", str(e)
+	
+	frappe.db.set_single_value("Wix Settings", "sync_status", status)
+	frappe.db.after_commit.add(bump_settings_version)
+	frappe.db.commit()
+	
+	if user:
+		frappe.publish_realtime(
+			"msgprint",
+			{"message": message, "title": _("Wix Credentials"), "indicator": "green" if status == "Connected" else "red"},
+			user=user
+		)
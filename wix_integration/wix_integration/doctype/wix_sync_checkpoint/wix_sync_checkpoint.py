@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.model.document import Document
+
+class WixSyncCheckpoint(Document):
+	"""Durable resume point of an incremental Wix sync job"""
+	pass
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.model.document import Document
+
+class WixSyncDailyRollup(Document):
+	"""Wix Sync Log counts and durations of one day, sync type and status"""
+	pass
+
+def on_doctype_update():
+	# One row per key; the report reads date ranges of it
+	frappe.db.add_unique("Wix Sync Daily Rollup", ["rollup_date", "sync_type", "status"],
+		constraint_name="unique_rollup_key")
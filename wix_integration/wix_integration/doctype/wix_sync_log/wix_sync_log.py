@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.model.document import Document
+
+class WixSyncLog(Document):
+	"""Outcome of syncing a single document with Wix"""
+	pass
+
+def on_doctype_update():
+	# Date-range scans of the daily rollup and the report fallback
+	frappe.db.add_index("Wix Sync Log", ["sync_date", "sync_type", "status"])
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.model.document import Document
+
+class WixSyncReport(Document):
+	"""Weekly totals of the Wix Integration Log, one document per period"""
+	pass
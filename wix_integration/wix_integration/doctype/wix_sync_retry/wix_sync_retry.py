@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.model.document import Document
+
+class WixSyncRetry(Document):
+	"""Failed sync of one entity waiting for its next attempt, or dead-lettered"""
+	pass
+
+def on_doctype_update():
+	# The retry job reads due rows in next_attempt_at order
+	frappe.db.add_index("Wix Sync Retry", ["status", "next_attempt_at"])
+	frappe.db.add_unique("Wix Sync Retry", ["entity_type", "entity_id"], constraint_name="unique_retry_entity")
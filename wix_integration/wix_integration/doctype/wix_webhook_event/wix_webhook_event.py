@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.model.document import Document
+
+class WixWebhookEvent(Document):
+	"""Raw Wix webhook event waiting in the inbox for background processing"""
+	pass
+
+def on_doctype_update():
+	# The inbox consumer scans queued events oldest first
+	frappe.db.add_index("Wix Webhook Event", ["status", "creation"])
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Concurrent execution of many Wix API calls from one worker.
+
+A worker sending its calls one after another spends most of its time
+waiting on round trips. The executor keeps up to **Concurrent Requests**
+(Wix Settings) calls in flight over the pooled keep-alive session.
+
+Only the HTTP round trips run in the thread pool. The circuit breaker,
+the rate limiter and the integration log need the site context, which is
+thread-local, so they are driven from the calling thread: a call is
+submitted only once it holds a rate limiter token, and each response is
+logged and handed to the caller as it completes. A 429 is reported to
+the limiter and the call is sent again. A failed call is turned into a
+WixAPIError for that call alone; the others carry on. While the circuit
+is open calls are not sent and get a WixCircuitOpenError, which callers
+answer by leaving the work queued.
+"""
+from __future__ import unicode_literals
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import frappe
+from frappe.utils import cint
+import requests
+
+from . import circuit_breaker, rate_limiter, wix_client
+from .api import WixAPIError, WixCircuitOpenError, get_wix_headers, get_wix_settings, read_response
+from .utils import log_integration
+
+DEFAULT_CONCURRENCY = 4
+
+def get_concurrency(settings=None):
+	"""Calls kept in flight, from Wix Settings; never more than the session's connection pool"""
+	settings = settings or get_wix_settings()
+	concurrency = cint(settings.get("push_concurrency") if settings else 0) or DEFAULT_CONCURRENCY
+	return max(1, min(concurrency, wix_client.POOL_MAXSIZE))
+
+def wix_call(method, endpoint, data=None, params=None, operation=None,
+		reference_doctype=None, reference_name=None, context=None):
+	"""One call for run_calls; `context` is passed back untouched with its result"""
+	return frappe._dict(
+		method=method,
+		endpoint=endpoint,
+		data=data,
+		params=params,
+		operation=operation or f"{method} {endpoint}",
+		reference_doctype=reference_doctype,
+		reference_name=reference_name,
+		context=context,
+		throttled=0,
+		started=None
+	)
+
+def run_calls(calls, on_result, concurrency=None):
+	"""Send Wix calls with up to `concurrency` in flight.
+
+	`on_result(call, response, error)` runs on this thread once per call, as
+	calls complete, with either the decoded body or the WixAPIError;
+	`call.started` is when it was last sent. An exception raised by
+	`on_result` is logged and does not stop the other calls.
+	"""
+	settings = get_wix_settings()
+	headers = get_wix_headers(settings)
+	timeout = wix_client.get_timeout(settings)
+	wix_site_id = settings.wix_site_id
+	concurrency = cint(concurrency) or get_concurrency(settings)
+
+	pending = deque(calls)
+	in_flight = {}
+
+	with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(pending)))) as pool:
+		while pending or in_flight:
+			while pending and len(in_flight) < concurrency:
+				call = pending.popleft()
+				try:
+					circuit_breaker.before_request(wix_site_id)
+					rate_limiter.acquire(wix_site_id, timeout=timeout)
+				except circuit_breaker.CircuitOpenError as e:
+					# Not logged: nothing was sent, and callers queue the work instead
+					deliver(on_result, call, None, WixCircuitOpenError(str(e)))
+					continue
+				except rate_limiter.RateLimitTimeout as e:
+					log_failure(call, e, time.monotonic())
+					deliver(on_result, call, None, WixAPIError(f"Failed to connect to Wix API: {str(e)}"))
+					continue
+
+				call.started = time.monotonic()
+				future = pool.submit(wix_client.send, call.method, wix_client.get_url(call.endpoint),
+					headers, call.data, call.params, timeout)
+				in_flight[future] = call
+
+			if not in_flight:
+				continue
+
+			for future in wait(in_flight, return_when=FIRST_COMPLETED).done:
+				finish(in_flight.pop(future), future, wix_site_id, pending, on_result)
+
+def finish(call, future, wix_site_id, pending, on_result):
+	"""Handle one completed round trip on the calling thread"""
+	try:
+		response = future.result()
+	except requests.exceptions.RequestException as e:
+		wix_client.record_error(wix_site_id, e)
+		log_failure(call, e, call.started)
+		deliver(on_result, call, None, WixAPIError(f"Failed to connect to Wix API: {str(e)}"))
+		return
+
+	if wix_client.record_response(wix_site_id, response) and call.throttled < wix_client.MAX_THROTTLE_RETRIES:
+		call.throttled += 1
+		pending.appendleft(call)
+		return
+
+	try:
+		response_data = read_response(response, call.operation, call.started, call.data,
+			call.reference_doctype, call.reference_name)
+	except WixAPIError as e:
+		deliver(on_result, call, None, e)
+		return
+
+	deliver(on_result, call, response_data, None)
+
+def log_failure(call, error, started):
+	log_integration(call.operation, "Failed", request_data=call.data, error_message=str(error),
+		reference_doctype=call.reference_doctype, reference_name=call.reference_name,
+		duration=time.monotonic() - started)
+
+def deliver(on_result, call, response, error):
+	try:
+		on_result(call, response, error)
+	except Exception:
+		frappe.log_error(title=f"Wix {call.operation} result handling failed", message=frappe.get_traceback())
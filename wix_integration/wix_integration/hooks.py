@@ -100,6 +100,15 @@ doc_events = {
 	"Item": {
 		"after_insert": "wix_integration.api.sync_item_to_wix",
 		"on_update": "wix_integration.api.sync_item_to_wix"
+	},
+	"Customer": {
+		"on_update": "wix_integration.customer_resolver.invalidate_customer",
+		"on_trash": "wix_integration.customer_resolver.invalidate_customer",
+		"after_rename": "wix_integration.customer_resolver.invalidate_customer"
+	},
+	"Contact": {
+		"on_update": "wix_integration.customer_resolver.invalidate_contact",
+		"on_trash": "wix_integration.customer_resolver.invalidate_contact"
 	}
 }
 
@@ -107,12 +116,27 @@ doc_events = {
 # ---------------
 
 scheduler_events = {
+	"all": [
+		"wix_integration.tasks.enqueue_webhook_processing",
+		"wix_integration.tasks.probe_wix_circuit"
+	],
+	"cron": {
+		"*/5 * * * *": [
+			"wix_integration.tasks.sync_wix_orders_to_erpnext",
+			"wix_integration.tasks.sync_inventory_to_wix",
+			"wix_integration.tasks.retry_due_syncs"
+		]
+	},
 	"hourly": [
-		"wix_integration.tasks.sync_pending_products"
+		"wix_integration.tasks.enqueue_pending_products",
+		"wix_integration.tasks.update_sync_rollup"
 	],
 	"daily": [
 		"wix_integration.tasks.cleanup_sync_logs",
-		"wix_integration.tasks.sync_wix_orders_to_erpnext"
+		"wix_integration.tasks.health_check"
+	],
+	"weekly": [
+		"wix_integration.tasks.generate_sync_report"
 	]
 }
 
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Batched mapping of Wix ids to ERPNext document names.
+
+Each lookup resolves a whole batch of ids with one `IN (...)` query on
+the (uniquely indexed) link field and remembers the answers, including
+ids that have no document, in a map that lives for the current request
+or background job. Jobs prefetch a page of ids at once, so per-order and
+per-line lookups afterwards are served from memory.
+
+Links written under a savepoint are journaled: start_savepoint and
+rollback_savepoint wrap the database calls and drop those entries again
+when the savepoint is rolled back, so the map never points at documents
+that no longer exist. Callers can add their own undo steps for the
+savepoint with on_savepoint_rollback.
+"""
+from __future__ import unicode_literals
+import frappe
+
+# Entity type -> (DocType, field holding the Wix reference)
+LINK_FIELDS = {
+	"Product": ("Item", "wix_product_id"),
+	"Order": ("Sales Order", "wix_order_id"),
+	# Order lines name their Item by SKU, which is the Item code
+	"SKU": ("Item", "name"),
+}
+
+# Ids per IN (...) query
+RESOLVE_BATCH_SIZE = 500
+
+def get_map(entity_type):
+	"""Resolved ids of one entity type for this job; reset with frappe.local"""
+	if not hasattr(frappe.local, "wix_id_map"):
+		frappe.local.wix_id_map = {}
+	return frappe.local.wix_id_map.setdefault(entity_type, {})
+
+def resolve_ids(entity_type, wix_ids):
+	"""Map Wix ids to document names (None when there is none), querying only unseen ids"""
+	doctype, field = LINK_FIELDS[entity_type]
+	known = get_map(entity_type)
+	wix_ids = [wix_id for wix_id in dict.fromkeys(wix_ids) if wix_id]
+
+	unseen = [wix_id for wix_id in wix_ids if wix_id not in known]
+	for start in range(0, len(unseen), RESOLVE_BATCH_SIZE):
+		batch = unseen[start:start + RESOLVE_BATCH_SIZE]
+		# The database compares case-insensitively, so match the rows the same way
+		found = {
+			row[field].lower(): row.name
+			for row in frappe.get_all(doctype, filters={field: ("in", batch)}, fields=["name", field])
+		}
+		for wix_id in batch:
+			known[wix_id] = found.get(wix_id.lower())
+
+	return {wix_id: known[wix_id] for wix_id in wix_ids}
+
+def resolve_id(entity_type, wix_id):
+	"""Document name of a single Wix id"""
+	return resolve_ids(entity_type, [wix_id]).get(wix_id) if wix_id else None
+
+def remember(entity_type, wix_id, name):
+	"""Record a link written during this job"""
+	if wix_id:
+		get_map(entity_type)[wix_id] = name
+		journal = getattr(frappe.local, "wix_id_journal", None)
+		if journal is not None:
+			journal.append((entity_type, wix_id))
+
+def on_savepoint_rollback(callback):
+	"""Call `callback` if the current savepoint is rolled back; a no-op outside one"""
+	callbacks = getattr(frappe.local, "wix_savepoint_callbacks", None)
+	if callbacks is not None:
+		callbacks.append(callback)
+
+def forget_all():
+	"""Drop every resolved id, after the whole transaction was rolled back"""
+	frappe.local.wix_id_map = {}
+	frappe.local.wix_id_journal = None
+	frappe.local.wix_savepoint_callbacks = None
+
+def start_savepoint(savepoint):
+	"""Set a database savepoint and journal the links remembered after it"""
+	frappe.db.savepoint(savepoint)
+	frappe.local.wix_id_journal = []
+	frappe.local.wix_savepoint_callbacks = []
+
+def rollback_savepoint(savepoint):
+	"""Roll back to the savepoint, forget the links remembered since and run its callbacks"""
+	frappe.db.rollback(save_point=savepoint)
+	for entity_type, wix_id in getattr(frappe.local, "wix_id_journal", None) or []:
+		get_map(entity_type).pop(wix_id, None)
+	callbacks = getattr(frappe.local, "wix_savepoint_callbacks", None) or []
+	frappe.local.wix_id_journal = []
+	frappe.local.wix_savepoint_callbacks = []
+	for callback in callbacks:
+		callback()
+
+def forget(entity_type, wix_ids):
+	"""Drop ids whose link changed, so the next lookup reads them again"""
+	known = get_map(entity_type)
+	for wix_id in wix_ids:
+		known.pop(wix_id, None)
@@ -11,6 +11,9 @@ def after_install():
 	# Create custom fields
 	create_custom_fields_for_wix()
 	
+	# Add indexes used by the sync jobs
+	create_indexes_for_wix()
+	
 	# Create Wix Settings if it doesn't exist
 	create_wix_settings_single()
 	
@@ -40,8 +43,27 @@ def create_custom_fields_for_wix():
 				"fieldtype": "Data",
 				"read_only": 1,
 				"hidden": 1,
+				"no_copy": 1,
 				"description": "Unique identifier for the product in Wix"
 			},
+			{
+				"fieldname": "wix_product_revision",
+				"label": "Wix Product Revision",
+				"fieldtype": "Data",
+				"read_only": 1,
+				"hidden": 1,
+				"no_copy": 1,
+				"description": "Revision of the Wix product, required for updates"
+			},
+			{
+				"fieldname": "wix_payload_hash",
+				"label": "Wix Payload Hash",
+				"fieldtype": "Data",
+				"read_only": 1,
+				"hidden": 1,
+				"no_copy": 1,
+				"description": "Hash of the product payload last pushed to Wix"
+			},
 			{
 				"fieldname": "sync_with_wix",
 				"label": "Sync with Wix",
@@ -72,6 +94,7 @@ def create_custom_fields_for_wix():
 				"fieldtype": "Data",
 				"read_only": 1,
 				"hidden": 1,
+				"no_copy": 1,
 				"description": "Unique identifier for the order in Wix"
 			},
 			{
@@ -87,6 +110,50 @@ def create_custom_fields_for_wix():
 	create_custom_fields(custom_fields, update=True)
 	frappe.logger().info("Custom fields created for Wix integration")
 
+def create_indexes_for_wix():
+	"""Create indexes on core tables that the Wix sync jobs scan"""
+	add_inventory_sync_index()
+	add_wix_link_indexes()
+	add_contact_email_index()
+	frappe.logger().info("Indexes created for Wix integration")
+
+def add_inventory_sync_index():
+	"""Inventory sync reads Bins of one warehouse changed after a watermark"""
+	frappe.db.add_index("Bin", ["warehouse", "modified"], index_name="wix_warehouse_modified")
+
+def add_wix_link_indexes():
+	"""Every import and webhook looks documents up by their Wix ID"""
+	add_unique_link_index("Item", "wix_product_id")
+	add_unique_link_index("Sales Order", "wix_order_id")
+
+def add_contact_email_index():
+	"""Imported orders find their Customer through the buyer's email"""
+	frappe.db.add_index("Contact Email", ["email_id"], index_name="wix_email_id")
+
+def add_unique_link_index(doctype, fieldname):
+	"""Unique index on a Wix ID field; a plain index while existing rows share an ID"""
+	# A unique index accepts any number of NULLs but only one empty string
+	frappe.db.sql(f"UPDATE `tab{doctype}` SET `{fieldname}` = NULL WHERE `{fieldname}` = ''")
+
+	try:
+		frappe.db.add_unique(doctype, [fieldname], constraint_name=f"unique_{fieldname}")
+	except Exception:
+		duplicates = frappe.db.sql(f"""
+			SELECT `{fieldname}`, COUNT(*)
+			FROM `tab{doctype}`
+			WHERE `{fieldname}` IS NOT NULL
+			GROUP BY `{fieldname}`
+			HAVING COUNT(*) > 1
+			LIMIT 20
+		""")
+		frappe.log_error(
+			title=f"Wix Integration: duplicate {fieldname} values",
+			message=_("Clear the duplicate {0} values on {1} and run the patch again: {2}").format(
+				fieldname, doctype, ", ".join(f"{value} ({count})" for value, count in duplicates)
+			)
+		)
+		frappe.db.add_index(doctype, [fieldname], index_name=f"{fieldname}_index")
+
 def create_wix_settings_single():
 	"""Create Wix Settings single doctype if it doesn't exist"""
 	if not frappe.db.exists("Wix Settings", "Wix Settings"):
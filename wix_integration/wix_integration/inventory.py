@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import time
+
+import frappe
+from frappe.utils import add_to_date, flt, get_datetime
+
+from .api import get_wix_settings, make_wix_request
+from .bulk_sync import chunked
+from .circuit_breaker import CircuitOpenError
+from .executor import run_calls, wix_call
+from .utils import SyncTimer, get_checkpoint, log_sync, set_checkpoint
+
+INVENTORY_SEARCH_ENDPOINT = "/stores/v3/inventory-items/search"
+INVENTORY_BULK_UPDATE_ENDPOINT = "/stores/v3/bulk/inventory-items/update"
+INVENTORY_CHECKPOINT = "Wix Inventory"
+
+# Bins read per page of the watermark scan
+BIN_BATCH_SIZE = 500
+
+# Wix accepts at most 100 inventory items per bulk update and search page
+INVENTORY_CHUNK_SIZE = 100
+
+# Bins may be committed a while after their modified timestamp, behind rows
+# the checkpoint already passed, so each run rescans this far back
+INVENTORY_SETTLE_SECONDS = 600
+
+def sync_inventory(batch_size=BIN_BATCH_SIZE):
+	"""Push stock levels of the default warehouse that changed since the last run.
+
+	Bins are read in (modified, name) order after the checkpoint, so the scan
+	uses the (warehouse, modified) index and resumes exactly where it
+	stopped. Each run starts INVENTORY_SETTLE_SECONDS before the checkpoint
+	to catch Bins committed late; levels Wix already has are not sent again.
+	Each page is coalesced per Item and sent through the bulk inventory
+	endpoint before the checkpoint advances.
+	"""
+	settings = get_wix_settings()
+	warehouse = settings.default_warehouse
+	checkpoint = get_checkpoint(INVENTORY_CHECKPOINT)
+	watermark, last_id = checkpoint.watermark, checkpoint.last_id
+	if watermark:
+		watermark = str(add_to_date(get_datetime(watermark), seconds=-INVENTORY_SETTLE_SECONDS))
+		last_id = ""
+	processed = checkpoint.processed_count or 0
+	summary = {"bins": 0, "updated": 0, "unchanged": 0, "failed": 0}
+
+	while True:
+		bins = get_changed_bins(warehouse, watermark, last_id, batch_size)
+		if not bins:
+			break
+
+		levels = {}
+		for row in bins:
+			levels[row.item_code] = max(flt(row.actual_qty) - flt(row.reserved_qty), 0)
+
+		if not push_stock_levels(levels, settings, summary):
+			# Wix unreachable: keep the checkpoint so this page is sent again next run
+			break
+
+		watermark, last_id = str(bins[-1].modified), bins[-1].name
+		processed += len(bins)
+		summary["bins"] += len(bins)
+		set_checkpoint(INVENTORY_CHECKPOINT, watermark=watermark, last_id=last_id, processed_count=processed)
+		frappe.db.commit()
+
+		if len(bins) < batch_size:
+			break
+
+	return summary
+
+def get_changed_bins(warehouse, watermark, last_id, limit):
+	"""Bins of a warehouse after the (modified, name) keyset position"""
+	conditions = ""
+	if watermark:
+		conditions = "AND (modified > %(watermark)s OR (modified = %(watermark)s AND name > %(last_id)s))"
+
+	return frappe.db.sql(f"""
+		SELECT name, item_code, actual_qty, reserved_qty, modified
+		FROM `tabBin`
+		WHERE warehouse = %(warehouse)s {conditions}
+		ORDER BY modified ASC, name ASC
+		LIMIT %(limit)s
+	""", {"warehouse": warehouse, "watermark": watermark, "last_id": last_id or "", "limit": limit}, as_dict=True)
+
+def get_wix_targets(item_codes):
+	"""Wix product of each Item; variants resolve to their template's product"""
+	rows = frappe.db.sql("""
+		SELECT item.name AS item_code,
+			COALESCE(template.wix_product_id, item.wix_product_id) AS wix_product_id
+		FROM `tabItem` item
+		LEFT JOIN `tabItem` template ON template.name = item.variant_of
+		WHERE item.name IN %(items)s
+			AND COALESCE(template.sync_with_wix, item.sync_with_wix) = 1
+			AND COALESCE(template.wix_product_id, item.wix_product_id, '') != ''
+	""", {"items": list(item_codes)}, as_dict=True)
+	return {row.item_code: row.wix_product_id for row in rows}
+
+def get_inventory_items(product_ids):
+	"""Wix inventory items of the given products, keyed by variant SKU"""
+	inventory = {}
+	for chunk in chunked(list(product_ids), INVENTORY_CHUNK_SIZE):
+		cursor = None
+		while True:
+			if cursor:
+				search = {"cursorPaging": {"limit": INVENTORY_CHUNK_SIZE, "cursor": cursor}}
+			else:
+				search = {
+					"filter": {"productId": {"$in": chunk}},
+					"cursorPaging": {"limit": INVENTORY_CHUNK_SIZE}
+				}
+
+			response = make_wix_request("POST", INVENTORY_SEARCH_ENDPOINT, data={"search": search},
+				operation="Search Inventory Items")
+			for inventory_item in response.get("inventoryItems") or []:
+				sku = (inventory_item.get("product") or {}).get("variantSku")
+				if sku:
+					inventory[sku] = inventory_item
+
+			cursor = ((response.get("pagingMetadata") or {}).get("cursors") or {}).get("next")
+			if not cursor:
+				break
+
+	return inventory
+
+def push_stock_levels(levels, settings, summary):
+	"""Send the changed stock levels of a page of Items in bulk.
+
+	Returns False when a request failed as a whole; items rejected one by
+	one are logged and not retried.
+	"""
+	timer = SyncTimer()
+	with timer.stage("db"):
+		targets = get_wix_targets(levels.keys())
+	if not targets:
+		return True
+
+	with timer.stage("http"):
+		inventory = get_inventory_items(set(targets.values()))
+	status_only = settings.inventory_sync_mode == "Stock Status"
+
+	updates = []
+	with timer.stage("build"):
+		for item_code, qty in levels.items():
+			inventory_item = inventory.get(item_code)
+			if item_code not in targets or not inventory_item:
+				continue
+
+			update = {"id": inventory_item.get("id"), "revision": inventory_item.get("revision")}
+			if status_only:
+				in_stock = qty > flt(settings.stock_threshold)
+				if bool(inventory_item.get("inStock")) == in_stock:
+					summary["unchanged"] += 1
+					continue
+				update.update({"trackQuantity": False, "inStock": in_stock})
+			else:
+				# Wix holds whole quantities; compare with what would be sent
+				quantity = int(qty)
+				if inventory_item.get("trackQuantity") and flt(inventory_item.get("quantity")) == quantity:
+					summary["unchanged"] += 1
+					continue
+				update.update({"trackQuantity": True, "quantity": quantity})
+
+			updates.append((item_code, update))
+
+	chunks = list(chunked(updates, INVENTORY_CHUNK_SIZE))
+	failed_requests = []
+	run_calls(
+		[
+			wix_call(
+				"POST",
+				INVENTORY_BULK_UPDATE_ENDPOINT,
+				data={"inventoryItems": [{"inventoryItem": update} for item_code, update in chunk]},
+				operation="Bulk Update Inventory",
+				context=(chunk, get_request_timer(timer, len(chunks)))
+			)
+			for chunk in chunks
+		],
+		lambda call, response, error: handle_update_result(call, response, error, summary, failed_requests)
+	)
+	return not failed_requests
+
+def get_request_timer(page_timer, requests):
+	"""Timer of one bulk request, charged an equal share of preparing the page"""
+	timer = SyncTimer()
+	for stage, seconds in page_timer.stages.items():
+		timer.add(stage, seconds / requests)
+	return timer
+
+def handle_update_result(call, response, error, summary, failed_requests):
+	"""Count the per-item results of one bulk inventory update.
+
+	Each request is logged once with its timings, so the rollup has the
+	latency of inventory syncs; rejected items are logged one by one.
+	"""
+	chunk, timer = call.context
+	if isinstance(error, CircuitOpenError):
+		# Not sent; the checkpoint stays put and the page goes out after recovery
+		failed_requests.append(error)
+		return
+
+	timer.add("http", time.monotonic() - call.started if call.started else 0)
+	if error:
+		failed_requests.append(error)
+		summary["failed"] += len(chunk)
+		log_sync("Inventory Sync", "Failed", error_message=str(error), timer=timer)
+		return
+
+	results = {}
+	for position, result in enumerate(response.get("results") or []):
+		metadata = result.get("itemMetadata") or {}
+		results[metadata.get("originalIndex", position)] = metadata
+
+	updated = 0
+	for index, (item_code, update) in enumerate(chunk):
+		metadata = results.get(index) or {}
+		if metadata.get("success"):
+			updated += 1
+		else:
+			summary["failed"] += 1
+			error = metadata.get("error") or {}
+			log_sync("Inventory Sync", "Failed", "Item", item_code, wix_id=update["id"],
+				error_message=error.get("description") or "No result returned by Wix")
+
+	summary["updated"] += updated
+	if updated:
+		log_sync("Inventory Sync", "Success", timer=timer)
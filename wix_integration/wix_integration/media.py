@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""Content-addressed upload of Item images to the Wix Media Manager.
+
+Every image file is identified by the SHA-256 of its content, read in
+chunks and cached per path, size and mtime. The Wix Media DocType maps
+each hash to the Wix media ID it was uploaded as, so an image is uploaded
+once however many Items or pushes use it, and only new or changed files
+are sent. Uploads stream the file from disk through a small thread pool;
+product payloads then reference the cached media IDs.
+"""
+from __future__ import unicode_literals
+import hashlib
+import mimetypes
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+
+from . import wix_client
+
+MEDIA_DOCTYPE = "Wix Media"
+GENERATE_UPLOAD_URL_ENDPOINT = "/site-media/v1/files/generate-upload-url"
+
+# Concurrent uploads; each holds one file handle and one connection
+MEDIA_UPLOAD_WORKERS = 4
+
+HASH_CHUNK_SIZE = 1024 * 1024
+HASH_CACHE_TTL = 7 * 86400
+
+def get_image_path(file_url):
+	"""Local path of an attached image, or None for remote or missing files"""
+	path = (file_url or "").split("?", 1)[0]
+	if path.startswith("/private/files/"):
+		path = frappe.get_site_path(path.lstrip("/"))
+	elif path.startswith("/files/"):
+		path = frappe.get_site_path("public", path.lstrip("/"))
+	else:
+		return None
+
+	return path if os.path.isfile(path) else None
+
+def hash_file(path):
+	"""SHA-256 of a file's content, without reading it into memory at once"""
+	stat = os.stat(path)
+	key = f"wix_media_hash|{path}|{stat.st_size}|{stat.st_mtime_ns}"
+	content_hash = frappe.cache().get_value(key)
+	if content_hash:
+		return content_hash
+
+	digest = hashlib.sha256()
+	with open(path, "rb") as image:
+		for chunk in iter(lambda: image.read(HASH_CHUNK_SIZE), b""):
+			digest.update(chunk)
+
+	content_hash = digest.hexdigest()
+	frappe.cache().set_value(key, content_hash, expires_in_sec=HASH_CACHE_TTL)
+	return content_hash
+
+def get_media_ids(content_hashes):
+	"""Wix media ID of each already uploaded hash"""
+	if not content_hashes:
+		return {}
+	return dict(frappe.get_all(
+		MEDIA_DOCTYPE,
+		filters={"name": ("in", list(content_hashes))},
+		fields=["name", "wix_media_id"],
+		as_list=True
+	))
+
+def upload_item_images(item_names, workers=MEDIA_UPLOAD_WORKERS):
+	"""Upload the images of these Items that Wix does not have yet.
+
+	Returns the Wix media ID of every image found, by content hash. Failed
+	uploads are logged and left out; their products are pushed without
+	media and pick it up on a later push.
+	"""
+	if not item_names:
+		return {}
+
+	files = {}
+	for file_url in set(frappe.get_all("Item", filters={"name": ("in", list(item_names))}, pluck="image")):
+		path = get_image_path(file_url)
+		if path:
+			files.setdefault(hash_file(path), path)
+
+	media_ids = get_media_ids(files)
+	missing = {content_hash: path for content_hash, path in files.items() if content_hash not in media_ids}
+	if missing:
+		media_ids.update(upload_files(missing, workers))
+	return media_ids
+
+def upload_files(files, workers=MEDIA_UPLOAD_WORKERS):
+	"""Upload files by content hash; returns the media ID of each one that succeeded"""
+	from .api import get_wix_settings, make_wix_request
+
+	timeout = wix_client.get_timeout(get_wix_settings())
+	logger = frappe.logger("wix_integration")
+
+	# Upload URLs come from the Wix API, which needs the site context, so
+	# they are requested here; only the PUTs of the file bodies run in threads
+	targets = []
+	for content_hash, path in files.items():
+		mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+		try:
+			response = make_wix_request(
+				"POST",
+				GENERATE_UPLOAD_URL_ENDPOINT,
+				data={"mimeType": mime_type, "fileName": os.path.basename(path)},
+				operation="Generate Media Upload URL"
+			)
+		except Exception as e:
+			logger.warning(f"Could not upload {os.path.basename(path)} to Wix: {str(e)}")
+			continue
+		targets.append((content_hash, path, mime_type, response.get("uploadUrl")))
+
+	uploaded = {}
+	if not targets:
+		return uploaded
+
+	with ThreadPoolExecutor(max_workers=min(workers, len(targets))) as pool:
+		futures = [
+			(content_hash, path, pool.submit(put_file, upload_url, path, mime_type, timeout))
+			for content_hash, path, mime_type, upload_url in targets
+		]
+		for content_hash, path, future in futures:
+			try:
+				file_info = future.result()
+			except Exception as e:
+				logger.warning(f"Could not upload {os.path.basename(path)} to Wix: {str(e)}")
+				continue
+
+			if file_info.get("id"):
+				record_media(content_hash, file_info, os.path.basename(path), os.path.getsize(path))
+				uploaded[content_hash] = file_info["id"]
+
+	return uploaded
+
+def put_file(upload_url, path, mime_type, timeout):
+	"""Stream one file to its upload URL. Runs in a pool thread: no database access."""
+	with open(path, "rb") as body:
+		response = wix_client.get_session().put(
+			upload_url,
+			data=body,
+			params={"filename": os.path.basename(path)},
+			headers={"Content-Type": mime_type},
+			timeout=timeout
+		)
+	response.raise_for_status()
+	return response.json().get("file") or {}
+
+def record_media(content_hash, file_info, file_name=None, file_size=None):
+	"""Remember the Wix media a file was uploaded as"""
+	if frappe.db.exists(MEDIA_DOCTYPE, content_hash):
+		return
+
+	try:
+		frappe.get_doc({
+			"doctype": MEDIA_DOCTYPE,
+			"content_hash": content_hash,
+			"wix_media_id": file_info["id"],
+			"file_name": file_name or file_info.get("displayName"),
+			"file_size": file_size or file_info.get("sizeInBytes"),
+			"media_url": file_info.get("url")
+		}).insert(ignore_permissions=True)
+	except frappe.DuplicateEntryError:
+		# Another worker uploaded the same content meanwhile
+		pass
+
+def get_item_media(item):
+	"""Media of the product payload for the Item's image, from uploads already made"""
+	return get_items_media([item]).get(item.name)
+
+def get_items_media(items):
+	"""Product payload media of many Items, looked up with one query"""
+	item_media, hashes = {}, {}
+	for item in items:
+		image = item.get("image")
+		if not image:
+			continue
+		if image.startswith(("http://", "https://")):
+			item_media[item.name] = {"itemsInfo": {"items": [{"url": image}]}}
+			continue
+
+		path = get_image_path(image)
+		if path:
+			hashes[item.name] = hash_file(path)
+
+	media_ids = get_media_ids(set(hashes.values()))
+	for item_name, content_hash in hashes.items():
+		if media_ids.get(content_hash):
+			item_media[item_name] = {"itemsInfo": {"items": [{"id": media_ids[content_hash]}]}}
+
+	return item_media
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import time
+
+import frappe
+from frappe import _
+from frappe.utils import flt, getdate
+
+from . import customer_resolver
+from .api import get_wix_settings, make_wix_request
+from .customer_resolver import normalize_email
+from .id_resolver import remember, resolve_id, resolve_ids, rollback_savepoint, start_savepoint
+from .retry_queue import schedule_retry
+from .utils import SyncTimer, get_checkpoint, log_sync, set_checkpoint
+
+ORDERS_ENDPOINT = "/ecom/v1/orders"
+ORDERS_SEARCH_ENDPOINT = f"{ORDERS_ENDPOINT}/search"
+ORDERS_CHECKPOINT = "Wix Orders"
+
+# Wix allows up to 100 orders per search page
+ORDERS_PAGE_SIZE = 100
+
+# Customer used for orders when customer sync is disabled
+WIX_WALK_IN_CUSTOMER = "Wix Customer"
+
+def import_orders(page_size=ORDERS_PAGE_SIZE, max_pages=None):
+	"""Import Wix orders updated since the last checkpoint into Sales Orders.
+
+	Orders are read in ascending `updatedDate` order. Each page is committed
+	together with the advanced checkpoint, so a crash resumes from the last
+	completed page. The watermark is inclusive: orders at the boundary are
+	seen again on the next run and upserted idempotently.
+	"""
+	settings = get_wix_settings()
+	checkpoint = get_checkpoint(ORDERS_CHECKPOINT)
+	watermark = checkpoint.watermark
+	processed = checkpoint.processed_count or 0
+	summary = {"pages": 0, "created": 0, "updated": 0, "unchanged": 0, "failed": 0}
+
+	cursor = None
+	while True:
+		started = time.monotonic()
+		response = fetch_orders_page(watermark, cursor, page_size)
+		page_time = time.monotonic() - started
+		orders = response.get("orders") or []
+		prefetch_links(orders, settings)
+
+		for order in orders:
+			# Every order of the page waited for the whole search request
+			timer = SyncTimer()
+			timer.add("http", page_time)
+			start_savepoint("wix_order")
+			try:
+				with timer.stage("db"):
+					result, sales_order = upsert_sales_order(order, settings)
+				summary[result] += 1
+				if result != "unchanged":
+					log_sync("Order Sync", "Success", "Sales Order", sales_order, wix_id=order.get("id"), timer=timer)
+			except Exception as e:
+				rollback_savepoint("wix_order")
+				summary["failed"] += 1
+				# The watermark moves past this order, so the retry queue picks it up
+				schedule_retry("Order", order.get("id"), e, settings)
+				log_sync("Order Sync", "Failed", wix_id=order.get("id"), error_message=str(e), timer=timer)
+
+			watermark = max(watermark or "", order.get("updatedDate") or "")
+
+		processed += len(orders)
+		summary["pages"] += 1
+		set_checkpoint(ORDERS_CHECKPOINT, watermark=watermark, processed_count=processed)
+		frappe.db.commit()
+
+		metadata = response.get("metadata") or {}
+		cursor = (metadata.get("cursors") or {}).get("next")
+		if not orders or not metadata.get("hasNext") or not cursor:
+			break
+		if max_pages and summary["pages"] >= max_pages:
+			break
+
+	return summary
+
+def fetch_orders_page(watermark, cursor, page_size):
+	"""One page of the orders search, oldest update first"""
+	if cursor:
+		search = {"cursorPaging": {"limit": page_size, "cursor": cursor}}
+	else:
+		search = {
+			"filter": {"status": {"$ne": "INITIALIZED"}},
+			"sort": [{"fieldName": "updatedDate", "order": "ASC"}],
+			"cursorPaging": {"limit": page_size}
+		}
+		if watermark:
+			search["filter"]["updatedDate"] = {"$gte": watermark}
+
+	return make_wix_request("POST", ORDERS_SEARCH_ENDPOINT, data={"search": search}, operation="Search Orders")
+
+def prefetch_links(orders, settings):
+	"""Resolve the Sales Orders, Items and Customers of a page of orders in a few batched queries"""
+	resolve_ids("Order", [order.get("id") for order in orders])
+	get_item_codes([line for order in orders for line in order.get("lineItems") or []])
+	if settings.sync_customers:
+		customer_resolver.resolve_customers([(order.get("buyerInfo") or {}).get("email") for order in orders])
+
+def upsert_sales_order(order, settings):
+	"""Create or refresh the Sales Order of a Wix order.
+
+	Returns the outcome (created, updated or unchanged) and the Sales Order name.
+	"""
+	existing = resolve_id("Order", order.get("id"))
+	if existing:
+		existing = frappe._dict(name=existing, docstatus=frappe.db.get_value("Sales Order", existing, "docstatus"))
+
+	transaction_date = getdate((order.get("createdDate") or "")[:10] or None)
+	items = build_sales_order_items(order, settings, transaction_date)
+
+	if not existing:
+		sales_order = frappe.get_doc({
+			"doctype": "Sales Order",
+			"customer": get_or_create_customer(order, settings),
+			"company": get_company(),
+			"transaction_date": transaction_date,
+			"delivery_date": transaction_date,
+			"wix_order_id": order.get("id"),
+			"wix_order_number": str(order.get("number") or ""),
+			"items": items
+		})
+		sales_order.flags.from_wix_sync = True
+		sales_order.insert(ignore_permissions=True)
+		remember("Order", order.get("id"), sales_order.name)
+		return "created", sales_order.name
+
+	# Submitted orders are owned by ERPNext from here on
+	if existing.docstatus != 0:
+		return "unchanged", existing.name
+
+	sales_order = frappe.get_doc("Sales Order", existing.name)
+	current = [(row.item_code, flt(row.qty), flt(row.rate)) for row in sales_order.items]
+	wanted = [(row["item_code"], flt(row["qty"]), flt(row["rate"])) for row in items]
+	if current == wanted:
+		return "unchanged", existing.name
+
+	sales_order.set("items", [])
+	for row in items:
+		sales_order.append("items", row)
+	sales_order.flags.from_wix_sync = True
+	sales_order.save(ignore_permissions=True)
+	return "updated", sales_order.name
+
+def build_sales_order_items(order, settings, delivery_date):
+	"""Sales Order Item rows for the line items of a Wix order"""
+	items = []
+	lines = order.get("lineItems") or []
+	for line, item_code in zip(lines, get_item_codes(lines)):
+		if not item_code:
+			frappe.throw(_("No Item found for Wix product {0} (SKU {1})").format(
+				(line.get("catalogReference") or {}).get("catalogItemId"),
+				(line.get("physicalProperties") or {}).get("sku")
+			))
+
+		row = {
+			"item_code": item_code,
+			"qty": flt(line.get("quantity")) or 1,
+			"rate": flt((line.get("price") or {}).get("amount")),
+			"delivery_date": delivery_date
+		}
+		if settings.default_warehouse:
+			row["warehouse"] = settings.default_warehouse
+		items.append(row)
+
+	if not items:
+		frappe.throw(_("Wix order {0} has no line items").format(order.get("number")))
+
+	return items
+
+def get_item_codes(lines):
+	"""Item of each Wix order line, by SKU first and Wix product ID second.
+
+	All lines are resolved together: one query for the SKUs and, for lines
+	whose SKU is unknown, one for the product IDs.
+	"""
+	skus = [(line.get("physicalProperties") or {}).get("sku") for line in lines]
+	catalog_item_ids = [(line.get("catalogReference") or {}).get("catalogItemId") for line in lines]
+
+	by_sku = resolve_ids("SKU", skus)
+	by_product = resolve_ids("Product", [
+		catalog_item_id for sku, catalog_item_id in zip(skus, catalog_item_ids) if not by_sku.get(sku)
+	])
+
+	return [
+		by_sku.get(sku) or by_product.get(catalog_item_id)
+		for sku, catalog_item_id in zip(skus, catalog_item_ids)
+	]
+
+def get_company():
+	"""Company for imported Sales Orders"""
+	return frappe.defaults.get_global_default("company") or frappe.db.get_value("Company", {}, "name")
+
+def get_or_create_customer(order, settings):
+	"""Customer of a Wix order, matched on the buyer's normalized email"""
+	if not settings.sync_customers:
+		return get_walk_in_customer(settings)
+
+	email = normalize_email((order.get("buyerInfo") or {}).get("email"))
+	contact_details = (order.get("billingInfo") or {}).get("contactDetails") or {}
+	customer_name = " ".join(filter(None, [contact_details.get("firstName"), contact_details.get("lastName")])) \
+		or email or WIX_WALK_IN_CUSTOMER
+
+	if not email:
+		return create_customer(customer_name, settings)
+
+	def create():
+		customer = create_customer(customer_name, settings)
+		frappe.get_doc({
+			"doctype": "Contact",
+			"first_name": contact_details.get("firstName") or customer_name,
+			"last_name": contact_details.get("lastName"),
+			"email_ids": [{"email_id": email, "is_primary": 1}],
+			"links": [{"link_doctype": "Customer", "link_name": customer}]
+		}).insert(ignore_permissions=True)
+		return customer
+
+	return customer_resolver.get_or_create_customer(email, create)
+
+def create_customer(customer_name, settings):
+	"""Create a Customer under the default group and territory of Wix Settings"""
+	customer = frappe.get_doc({
+		"doctype": "Customer",
+		"customer_name": customer_name,
+		"customer_type": "Individual",
+		"customer_group": settings.default_customer_group or "All Customer Groups",
+		"territory": settings.default_territory or "All Territories"
+	})
+	customer.flags.from_wix_sync = True
+	customer.insert(ignore_permissions=True)
+	return customer.name
+
+def get_walk_in_customer(settings):
+	"""Shared Customer for Wix orders when customer sync is off"""
+	return frappe.db.get_value("Customer", {"customer_name": WIX_WALK_IN_CUSTOMER}, "name") \
+		or create_customer(WIX_WALK_IN_CUSTOMER, settings)
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+
+def execute():
+	"""Index Contact Email on email_id for the customer lookup of imported orders"""
+	from wix_integration.install import add_contact_email_index
+	add_contact_email_index()
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+
+def execute():
+	"""Index Bin on (warehouse, modified) for the inventory sync watermark"""
+	from wix_integration.install import add_inventory_sync_index
+	add_inventory_sync_index()
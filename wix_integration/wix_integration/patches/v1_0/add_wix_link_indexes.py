@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+
+def execute():
+	"""Uniquely index the Wix product and order IDs looked up by every import"""
+	from wix_integration.install import add_wix_link_indexes, create_custom_fields_for_wix
+	# The link fields became no_copy along with the index
+	create_custom_fields_for_wix()
+	add_wix_link_indexes()
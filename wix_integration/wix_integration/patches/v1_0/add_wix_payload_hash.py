@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+
+def execute():
+	"""Add the field holding the hash of the last product payload pushed to Wix"""
+	from wix_integration.install import create_custom_fields_for_wix
+	create_custom_fields_for_wix()
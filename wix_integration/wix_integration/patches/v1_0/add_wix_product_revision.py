@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+
+def execute():
+	"""Add the Wix product revision field used by queued product updates"""
+	from wix_integration.install import create_custom_fields_for_wix
+	create_custom_fields_for_wix()
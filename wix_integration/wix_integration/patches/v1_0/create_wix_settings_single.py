@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+
+def execute():
+	"""Ensure the Wix Settings single exists on sites installed before it was added"""
+	from wix_integration.install import create_wix_settings_single
+	create_wix_settings_single()
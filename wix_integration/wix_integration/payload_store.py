@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Compact storage of request/response bodies in Wix Integration Log.
+
+Bodies are written as compact JSON. Bodies of successful calls are cut
+down to a preview unless sampled, since they are rarely looked at;
+failures keep the full body. Anything above the compression threshold is
+stored zlib-compressed and base64-encoded behind a `zlib:` prefix, which
+`decode_payload` undoes when the log is opened.
+"""
+from __future__ import unicode_literals
+import base64
+import json
+import random
+import zlib
+
+import frappe
+
+COMPRESSED_PREFIX = "zlib:"
+
+# Stored bodies larger than this (in characters) are compressed
+COMPRESS_THRESHOLD = 2048
+
+# Bodies of successful calls are truncated to this many characters
+SUCCESS_BODY_LIMIT = 4096
+
+def encode_payload(data, keep_full=True):
+	"""Serialize a request/response body for storage, or None when there is none"""
+	if data is None:
+		return None
+
+	body = data if isinstance(data, str) else json.dumps(data, default=str, separators=(",", ":"))
+
+	if not keep_full and len(body) > SUCCESS_BODY_LIMIT and not is_sampled():
+		body = json.dumps({
+			"_truncated": True,
+			"_size": len(body),
+			"preview": body[:SUCCESS_BODY_LIMIT]
+		}, separators=(",", ":"))
+
+	if len(body) > COMPRESS_THRESHOLD:
+		compressed = zlib.compress(body.encode("utf-8"), 6)
+		return COMPRESSED_PREFIX + base64.b64encode(compressed).decode("ascii")
+
+	return body
+
+def decode_payload(value, pretty=False):
+	"""Inverse of encode_payload; plain values written before compression pass through"""
+	if not value:
+		return value
+
+	if value.startswith(COMPRESSED_PREFIX):
+		value = zlib.decompress(base64.b64decode(value[len(COMPRESSED_PREFIX):])).decode("utf-8")
+
+	if pretty:
+		try:
+			value = json.dumps(json.loads(value), indent=2, ensure_ascii=False)
+		except ValueError:
+			pass
+
+	return value
+
+def is_sampled():
+	"""Whether to keep this successful call's body in full (`wix_log_sample_rate` in site config)"""
+	rate = frappe.conf.get("wix_log_sample_rate") or 0
+	return bool(rate) and random.random() < float(rate)
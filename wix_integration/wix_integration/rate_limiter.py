@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Token bucket shared by every worker that talks to the same Wix site.
+
+The bucket lives in a Redis hash in `frappe.cache()` and is updated by Lua
+scripts, so scheduler jobs, doc-event flushes and manual syncs all draw
+from one budget. A 429 halves the refill rate and blocks the bucket for
+the `Retry-After` period; the rate then climbs back linearly.
+
+Tunable from site config: `wix_rate_limit` (requests per second),
+`wix_rate_burst` (bucket capacity) and `wix_rate_min` (floor after throttling).
+"""
+from __future__ import unicode_literals
+import time
+from email.utils import parsedate_to_datetime
+
+import frappe
+from frappe.utils import flt
+
+DEFAULT_RATE = 3.0
+DEFAULT_BURST = 10
+DEFAULT_MIN_RATE = 0.2
+
+# Requests per second regained for every second without a 429
+RECOVERY_PER_SECOND = 0.05
+
+KEY_TTL = 3600
+
+ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local requested = tonumber(ARGV[1])
+local max_rate = tonumber(ARGV[2])
+local capacity = tonumber(ARGV[3])
+local recovery = tonumber(ARGV[4])
+local ttl = tonumber(ARGV[5])
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'rate', 'blocked_until')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+local rate = tonumber(state[3]) or max_rate
+local blocked_until = tonumber(state[4]) or 0
+
+local elapsed = math.max(now - ts, 0)
+rate = math.min(max_rate, rate + elapsed * recovery)
+tokens = math.min(capacity, tokens + elapsed * rate)
+
+local wait = 0
+if blocked_until > now then
+	wait = blocked_until - now
+elseif tokens >= requested then
+	tokens = tokens - requested
+else
+	wait = (requested - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now), 'rate', tostring(rate))
+redis.call('EXPIRE', KEYS[1], ttl)
+return {wait == 0 and 1 or 0, tostring(wait), tostring(tokens), tostring(rate)}
+"""
+
+THROTTLE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local retry_after = tonumber(ARGV[1])
+local max_rate = tonumber(ARGV[2])
+local min_rate = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+
+local rate = tonumber(redis.call('HGET', KEYS[1], 'rate')) or max_rate
+local blocked_until = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+
+rate = math.max(min_rate, rate / 2)
+blocked_until = math.max(blocked_until, now + retry_after)
+
+redis.call('HSET', KEYS[1], 'tokens', '0', 'ts', tostring(now), 'rate', tostring(rate),
+	'blocked_until', tostring(blocked_until))
+redis.call('EXPIRE', KEYS[1], ttl)
+return tostring(rate)
+"""
+
+class RateLimitTimeout(Exception):
+	"""Raised when no token became available within the allowed wait"""
+	pass
+
+_scripts = {}
+
+def get_script(source):
+	"""Register a Lua script once per process and per Redis client"""
+	cache = frappe.cache()
+	key = (id(cache), source)
+	if key not in _scripts:
+		_scripts[key] = cache.register_script(source)
+	return _scripts[key]
+
+def get_limits():
+	"""Configured refill rate, burst capacity and throttled floor"""
+	return (
+		flt(frappe.conf.get("wix_rate_limit")) or DEFAULT_RATE,
+		flt(frappe.conf.get("wix_rate_burst")) or DEFAULT_BURST,
+		flt(frappe.conf.get("wix_rate_min")) or DEFAULT_MIN_RATE
+	)
+
+def get_bucket_key(wix_site_id):
+	return frappe.cache().make_key(f"wix_rate_limit|{wix_site_id or 'default'}")
+
+def acquire(wix_site_id, tokens=1, timeout=30):
+	"""Block until the bucket of a Wix site grants `tokens`, or raise RateLimitTimeout"""
+	max_rate, capacity, min_rate = get_limits()
+	deadline = time.monotonic() + timeout
+
+	while True:
+		try:
+			allowed, wait, _, _ = get_script(ACQUIRE_SCRIPT)(
+				keys=[get_bucket_key(wix_site_id)],
+				args=[tokens, max_rate, capacity, RECOVERY_PER_SECOND, KEY_TTL]
+			)
+		except Exception as e:
+			# Never stop syncing because Redis is unavailable
+			frappe.logger("wix_integration").warning(f"Wix rate limiter unavailable: {str(e)}")
+			return
+
+		if int(allowed):
+			return
+
+		wait = flt(wait)
+		if time.monotonic() + wait > deadline:
+			raise RateLimitTimeout(f"Wix rate limit: no capacity within {timeout}s")
+
+		time.sleep(wait)
+
+def report_throttle(wix_site_id, retry_after=None):
+	"""Slow the shared bucket down after Wix answered 429"""
+	max_rate, capacity, min_rate = get_limits()
+	try:
+		get_script(THROTTLE_SCRIPT)(
+			keys=[get_bucket_key(wix_site_id)],
+			args=[flt(retry_after) or 1, max_rate, min_rate, KEY_TTL]
+		)
+	except Exception as e:
+		frappe.logger("wix_integration").warning(f"Wix rate limiter unavailable: {str(e)}")
+
+def parse_retry_after(value):
+	"""Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+	if not value:
+		return None
+
+	try:
+		return max(float(value), 0)
+	except ValueError:
+		pass
+
+	try:
+		return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+	except Exception:
+		return None
+
+def get_status(wix_site_id):
+	"""Current tokens, refill rate and capacity of a site's bucket"""
+	max_rate, capacity, min_rate = get_limits()
+	# Values are written raw by the Lua scripts, so bypass the unpickling hgetall
+	state = frappe.cache().execute_command("HGETALL", get_bucket_key(wix_site_id)) or {}
+	state = {frappe.safe_decode(k): frappe.safe_decode(v) for k, v in state.items()}
+
+	now = time.time()
+	ts = flt(state.get("ts")) or now
+	rate = min(max_rate, (flt(state.get("rate")) or max_rate) + max(now - ts, 0) * RECOVERY_PER_SECOND)
+	tokens = min(capacity, (flt(state["tokens"]) if "tokens" in state else capacity) + max(now - ts, 0) * rate)
+	blocked_until = flt(state.get("blocked_until"))
+
+	return {
+		"capacity": capacity,
+		"available_tokens": round(tokens, 2),
+		"refill_rate": round(rate, 3),
+		"max_rate": max_rate,
+		"blocked_for": round(max(blocked_until - now, 0), 2)
+	}
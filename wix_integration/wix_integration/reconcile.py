@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""Full-catalog reconciliation between ERPNext Items and Wix products.
+
+The job runs in three resumable phases, each saving its position in the
+"Wix Reconciliation" checkpoint after every page:
+
+1. wix: stream every Wix product page by page and add its id, content
+   hashes and revision to an index kept in a Redis hash, so the worker
+   holds one page at a time and a restarted job keeps the index.
+2. items: stream synced Items in keyset order by name and look their
+   `wix_product_id` up in the index. An id Wix does not have is
+   *missing*; a product whose content no longer matches the hash of the
+   last push was *changed* in Wix. Wix replaces a remote image URL with
+   its own media, so Items with such images are compared without media.
+3. orphans: scan the index and look its ids up on Items; Wix products
+   no Item points to are *orphaned*. HSCAN may return an id twice, so
+   the orphans of a run are kept in a Redis set and counted once.
+
+Drift is only reported unless `repair` is set: missing and changed Items
+are then queued for a fresh push (ERPNext wins), and with `delete_orphans`
+orphaned products are deleted from Wix.
+"""
+from __future__ import unicode_literals
+import frappe
+from frappe import _
+from frappe.utils import cint, flt
+
+from .api import PRODUCTS_ENDPOINT, build_product_payloads, enqueue_pending_sync, get_payload_hash, make_wix_request
+from .utils import get_checkpoint, log_integration, set_checkpoint
+
+PRODUCTS_QUERY_ENDPOINT = f"{PRODUCTS_ENDPOINT}/query"
+BULK_DELETE_ENDPOINT = "/stores/v3/bulk/products/delete"
+RECONCILE_CHECKPOINT = "Wix Reconciliation"
+
+PHASES = ("wix", "items", "orphans", "done")
+DRIFT_KINDS = ("missing", "changed", "orphaned")
+
+# Wix returns at most 100 products per query page
+PRODUCTS_PAGE_SIZE = 100
+
+# Items and index entries compared per page
+ITEM_BATCH_SIZE = 1000
+
+# Hex digits of the payload hash kept in the index
+HASH_PREFIX_LENGTH = 16
+
+# Ids of each kind of drift kept for the report
+SAMPLE_SIZE = 100
+
+# The index only has to outlive one run, including restarts
+INDEX_TTL = 7 * 86400
+
+def get_index_key():
+	return frappe.cache().make_key("wix_reconcile|index")
+
+def get_summary_key():
+	return frappe.cache().make_key("wix_reconcile|summary")
+
+def get_orphans_key():
+	return frappe.cache().make_key("wix_reconcile|orphans")
+
+def reconcile_catalog(repair=False, delete_orphans=False, restart=False):
+	"""Compare the whole catalog with Wix, resuming an unfinished run.
+
+	Returns the drift counts and a sample of the ids of each kind.
+	"""
+	repair, delete_orphans = cint(repair), cint(delete_orphans)
+	checkpoint = get_checkpoint(RECONCILE_CHECKPOINT)
+	phase = checkpoint.watermark
+
+	# A lost index cannot be trusted to find missing products; scan Wix again
+	if phase in ("items", "orphans") and not frappe.cache().execute_command("EXISTS", get_index_key()):
+		phase = None
+
+	if restart or phase not in PHASES or phase == "done":
+		frappe.cache().execute_command("DEL", get_index_key(), get_summary_key(), get_orphans_key(),
+			*[f"{get_summary_key()}|{key}" for key in DRIFT_KINDS])
+		phase, checkpoint = "wix", frappe._dict()
+		set_checkpoint(RECONCILE_CHECKPOINT, watermark=phase, last_id=None, cursor=None, processed_count=0)
+		frappe.db.commit()
+
+	if phase == "wix":
+		index_wix_products(checkpoint.cursor)
+		phase, checkpoint = "items", frappe._dict()
+		set_checkpoint(RECONCILE_CHECKPOINT, watermark=phase, last_id=None, cursor=None, processed_count=0)
+		frappe.db.commit()
+
+	if phase == "items":
+		compare_items(checkpoint.last_id, repair)
+		phase, checkpoint = "orphans", frappe._dict()
+		set_checkpoint(RECONCILE_CHECKPOINT, watermark=phase, last_id=None, cursor=None, processed_count=0)
+		frappe.db.commit()
+
+	if phase == "orphans":
+		find_orphans(checkpoint.cursor, delete_orphans)
+
+	summary = get_summary()
+	set_checkpoint(RECONCILE_CHECKPOINT, watermark="done", last_id=None, cursor=None)
+	log_integration("Catalog Reconciliation", "Success", response_data=summary)
+	frappe.db.commit()
+
+	if repair and (summary["missing"] or summary["changed"]):
+		enqueue_pending_sync()
+
+	return summary
+
+def index_wix_products(cursor=None, page_size=PRODUCTS_PAGE_SIZE):
+	"""Phase 1: add every Wix product to the index, one query page at a time"""
+	processed = cint(get_checkpoint(RECONCILE_CHECKPOINT).processed_count)
+
+	while True:
+		response = fetch_products_page(cursor, page_size)
+		products = response.get("products") or []
+
+		entries = []
+		for product in products:
+			projected = project_wix_product(product)
+			content_hash = get_payload_hash(projected)[:HASH_PREFIX_LENGTH]
+			entries.extend([product["id"],
+				f"{content_hash} {get_hash_without_media(projected)} {product.get('revision') or ''}"])
+		if entries:
+			frappe.cache().execute_command("HSET", get_index_key(), *entries)
+			frappe.cache().execute_command("EXPIRE", get_index_key(), INDEX_TTL)
+
+		cursor = ((response.get("pagingMetadata") or {}).get("cursors") or {}).get("next")
+		processed += len(products)
+		set_checkpoint(RECONCILE_CHECKPOINT, watermark="wix", cursor=cursor, processed_count=processed)
+		frappe.db.commit()
+		add_to_summary(wix_products=len(products))
+
+		if not products or not cursor:
+			break
+
+def fetch_products_page(cursor=None, page_size=PRODUCTS_PAGE_SIZE):
+	"""One page of the whole Wix catalog in id order, with the fields `project_wix_product` reads"""
+	query = {"cursorPaging": {"limit": page_size}}
+	if cursor:
+		query["cursorPaging"]["cursor"] = cursor
+	else:
+		query["sort"] = [{"fieldName": "id", "order": "ASC"}]
+
+	return make_wix_request(
+		"POST",
+		PRODUCTS_QUERY_ENDPOINT,
+		data={"query": query, "fields": ["PLAIN_DESCRIPTION", "VARIANT_OPTION_CHOICE_NAMES", "MEDIA_ITEMS_INFO"]},
+		operation="Query Products"
+	)
+
+def project_wix_product(product):
+	"""Reduce a Wix product to the fields `build_product_payload` writes, in the same shape"""
+	projected = {
+		"name": product.get("name"),
+		"plainDescription": product.get("plainDescription") or "",
+		"visible": bool(product.get("visible")),
+		"productType": product.get("productType"),
+		"physicalProperties": {}
+	}
+
+	options = [
+		{
+			"name": option.get("name"),
+			"optionRenderType": option.get("optionRenderType"),
+			"choicesSettings": {
+				"choices": [
+					{"choiceType": choice.get("choiceType"), "name": choice.get("name")}
+					for choice in (option.get("choicesSettings") or {}).get("choices") or []
+				]
+			}
+		}
+		for option in product.get("options") or []
+	]
+	if options:
+		projected["options"] = options
+
+	variants = []
+	for variant in (product.get("variantsInfo") or {}).get("variants") or []:
+		amount = ((variant.get("price") or {}).get("actualPrice") or {}).get("amount")
+		entry = {
+			"sku": variant.get("sku"),
+			"price": {"actualPrice": {"amount": f"{flt(amount):.2f}"}},
+			"physicalProperties": {}
+		}
+		choices = [
+			{
+				"optionChoiceNames": {
+					"optionName": names.get("optionName"),
+					"choiceName": names.get("choiceName"),
+					"renderType": names.get("renderType")
+				}
+			}
+			for names in (choice.get("optionChoiceNames") for choice in variant.get("choices") or [])
+			if names
+		]
+		if choices:
+			entry["choices"] = choices
+		variants.append(entry)
+	projected["variantsInfo"] = {"variants": variants}
+
+	media_id = get_main_media_id(product)
+	if media_id:
+		projected["media"] = {"itemsInfo": {"items": [{"id": media_id}]}}
+
+	return projected
+
+def get_main_media_id(product):
+	"""Wix media ID of the product's first image"""
+	product_media = product.get("media") or {}
+	media_items = (product_media.get("itemsInfo") or {}).get("items") \
+		or ([product_media["main"]] if product_media.get("main") else [])
+	return media_items[0].get("id") if media_items else None
+
+def get_hash_without_media(product):
+	"""Index-length hash of a product payload with its media left out"""
+	return get_payload_hash({key: value for key, value in product.items() if key != "media"})[:HASH_PREFIX_LENGTH]
+
+def has_remote_image(item):
+	return (item.image or "").startswith(("http://", "https://"))
+
+def compare_items(last_name=None, repair=False, batch_size=ITEM_BATCH_SIZE):
+	"""Phase 2: look up every linked Item in the index to find missing and changed products"""
+	processed = cint(get_checkpoint(RECONCILE_CHECKPOINT).processed_count)
+
+	while True:
+		items = frappe.db.sql("""
+			SELECT name, wix_product_id, wix_payload_hash, wix_sync_status, image
+			FROM `tabItem`
+			WHERE name > %(last_name)s
+				AND IFNULL(wix_product_id, '') != ''
+				AND IFNULL(variant_of, '') = ''
+			ORDER BY name ASC
+			LIMIT %(limit)s
+		""", {"last_name": last_name or "", "limit": batch_size}, as_dict=True)
+		if not items:
+			break
+
+		entries = frappe.cache().execute_command("HMGET", get_index_key(), *[item.wix_product_id for item in items])
+
+		# The stored hash has the image URL, Wix has a media ID: compare the rest of the
+		# current payload. Pending Items are skipped, their push overwrites Wix anyway.
+		rebuilt = build_product_payloads([item.name for item in items
+			if has_remote_image(item) and item.wix_sync_status == "Synced"])
+
+		missing, changed = [], []
+		for item, entry in zip(items, entries):
+			if entry is None:
+				missing.append(item.name)
+				continue
+
+			content_hash, media_free_hash, revision = frappe.safe_decode(entry).split(" ", 2)
+			if item.name in rebuilt:
+				if get_hash_without_media(rebuilt[item.name][1]) != media_free_hash:
+					changed.append((item.name, revision))
+			elif has_remote_image(item):
+				continue
+			elif item.wix_payload_hash and item.wix_payload_hash[:HASH_PREFIX_LENGTH] != content_hash:
+				changed.append((item.name, revision))
+
+		if repair:
+			requeue_missing(missing)
+			requeue_changed(changed)
+
+		last_name = items[-1].name
+		processed += len(items)
+		set_checkpoint(RECONCILE_CHECKPOINT, watermark="items", last_id=last_name, processed_count=processed)
+		frappe.db.commit()
+
+		# Counted after the commit: a page is never counted twice after a restart
+		add_to_summary(items=len(items), missing=missing, changed=[name for name, revision in changed],
+			repaired=len(missing) + len(changed) if repair else 0)
+
+		if len(items) < batch_size:
+			break
+
+def requeue_missing(item_names):
+	"""Forget the deleted Wix product so the next push creates it again"""
+	if item_names:
+		frappe.db.sql("""
+			UPDATE `tabItem`
+			SET wix_product_id = NULL, wix_product_revision = NULL, wix_payload_hash = NULL,
+				wix_sync_status = 'Pending'
+			WHERE name IN %(names)s
+		""", {"names": item_names})
+
+def requeue_changed(changed):
+	"""Queue Items edited in Wix for a push that overwrites the current Wix revision"""
+	for item_name, revision in changed:
+		frappe.db.sql("""
+			UPDATE `tabItem`
+			SET wix_product_revision = %(revision)s, wix_payload_hash = NULL, wix_sync_status = 'Pending'
+			WHERE name = %(name)s
+		""", {"revision": revision or None, "name": item_name})
+
+def find_orphans(cursor=None, delete_orphans=False, batch_size=ITEM_BATCH_SIZE):
+	"""Phase 3: scan the index for Wix products that no Item points to"""
+	cursor = cint(cursor)
+	processed = cint(get_checkpoint(RECONCILE_CHECKPOINT).processed_count)
+
+	while True:
+		cursor, entries = frappe.cache().execute_command("HSCAN", get_index_key(), cursor, "COUNT", batch_size)
+		cursor = cint(cursor)
+		product_ids = [frappe.safe_decode(product_id) for product_id in entries]
+
+		orphans, deleted = [], 0
+		if product_ids:
+			linked = set(frappe.get_all(
+				"Item",
+				filters={"wix_product_id": ("in", product_ids)},
+				pluck="wix_product_id"
+			))
+			orphans = [product_id for product_id in product_ids
+				if product_id not in linked and is_new_orphan(product_id)]
+			deleted = delete_wix_products(orphans) if delete_orphans else 0
+
+		processed += len(product_ids)
+		set_checkpoint(RECONCILE_CHECKPOINT, watermark="orphans", cursor=str(cursor), processed_count=processed)
+		frappe.db.commit()
+		add_to_summary(orphaned=orphans, deleted=deleted)
+
+		if not cursor:
+			break
+
+def is_new_orphan(product_id):
+	"""True the first time this run finds the orphan"""
+	added = frappe.cache().execute_command("SADD", get_orphans_key(), product_id)
+	frappe.cache().execute_command("EXPIRE", get_orphans_key(), INDEX_TTL)
+	return bool(cint(added))
+
+def delete_wix_products(product_ids):
+	"""Delete orphaned Wix products in bulk; returns how many Wix deleted"""
+	if not product_ids:
+		return 0
+
+	deleted = 0
+	for start in range(0, len(product_ids), PRODUCTS_PAGE_SIZE):
+		response = make_wix_request(
+			"POST",
+			BULK_DELETE_ENDPOINT,
+			data={"productIds": product_ids[start:start + PRODUCTS_PAGE_SIZE]},
+			operation="Bulk Delete Products"
+		)
+		deleted += cint((response.get("bulkActionMetadata") or {}).get("totalSuccesses"))
+	return deleted
+
+def add_to_summary(**values):
+	"""Add counts, and samples of drifted ids, to the running totals of this run.
+
+	Lists are counted by length and their first ids kept as a sample.
+	"""
+	cache = frappe.cache()
+	for key, value in values.items():
+		if isinstance(value, list):
+			if value:
+				cache.execute_command("RPUSH", f"{get_summary_key()}|{key}", *value)
+				cache.execute_command("LTRIM", f"{get_summary_key()}|{key}", 0, SAMPLE_SIZE - 1)
+				cache.execute_command("EXPIRE", f"{get_summary_key()}|{key}", INDEX_TTL)
+			value = len(value)
+		if value:
+			cache.execute_command("HINCRBY", get_summary_key(), key, value)
+	cache.execute_command("EXPIRE", get_summary_key(), INDEX_TTL)
+
+def get_summary():
+	"""Counts of the current run and a sample of each kind of drift"""
+	cache = frappe.cache()
+	counts = cache.execute_command("HGETALL", get_summary_key()) or {}
+	counts = {frappe.safe_decode(k): cint(frappe.safe_decode(v)) for k, v in counts.items()}
+
+	summary = {key: counts.get(key, 0) for key in
+		("wix_products", "items", "missing", "changed", "orphaned", "repaired", "deleted")}
+	for key in DRIFT_KINDS:
+		sample = cache.execute_command("LRANGE", f"{get_summary_key()}|{key}", 0, SAMPLE_SIZE - 1) or []
+		summary[f"{key}_sample"] = [frappe.safe_decode(value) for value in sample]
+	return summary
+
+@frappe.whitelist()
+def start_reconciliation(repair=0, delete_orphans=0, restart=0):
+	"""Run (or resume) the catalog reconciliation in the background"""
+	frappe.only_for("System Manager")
+
+	frappe.enqueue(
+		"wix_integration.reconcile.reconcile_catalog",
+		queue="long",
+		timeout=6 * 3600,
+		job_id="wix_reconcile_catalog",
+		deduplicate=True,
+		repair=cint(repair),
+		delete_orphans=cint(delete_orphans),
+		restart=cint(restart)
+	)
+	return {"status": "success", "message": _("Catalog reconciliation queued")}
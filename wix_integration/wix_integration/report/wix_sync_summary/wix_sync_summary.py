@@ -1,9 +1,16 @@
 # Copyright (c) 2024, Your Company and contributors
 # For license information, please see license.txt
 
+import json
+
 import frappe
 from frappe import _
-from frappe.utils import getdate, add_days
+from frappe.utils import add_days, cint, flt, get_datetime, getdate
+
+from wix_integration.rollup import get_histogram, get_histogram_columns, get_percentile, get_rollup_watermark, \
+	merge_histograms
+
+PERCENTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
 
 def execute(filters=None):
 	"""Generate Wix Sync Summary Report"""
@@ -59,12 +66,33 @@ def get_columns():
 			"fieldtype": "Float",
 			"width": 150,
 			"precision": 2
+		},
+		{
+			"fieldname": "p50_response_time",
+			"label": _("P50 (s)"),
+			"fieldtype": "Float",
+			"width": 90,
+			"precision": 2
+		},
+		{
+			"fieldname": "p95_response_time",
+			"label": _("P95 (s)"),
+			"fieldtype": "Float",
+			"width": 90,
+			"precision": 2
+		},
+		{
+			"fieldname": "p99_response_time",
+			"label": _("P99 (s)"),
+			"fieldtype": "Float",
+			"width": 90,
+			"precision": 2
 		}
 	]
 
 def get_data(filters):
 	"""Get report data based on filters"""
-	filters = filters or {}
+	filters = frappe._dict(filters or {})
 	
 	# Set default date range if not provided
 	if not filters.get("from_date"):
@@ -72,31 +100,78 @@ def get_data(filters):
 	if not filters.get("to_date"):
 		filters["to_date"] = frappe.utils.today()
 	
-	# Base query
-	query = """
-		SELECT 
-			DATE(sync_date) as sync_date,
+	conditions = ""
+	if filters.get("sync_type") and filters.sync_type != "All":
+		conditions += " AND sync_type = %(sync_type)s"
+	if filters.get("status") and filters.status != "All":
+		conditions += " AND status = %(status)s"
+	
+	# Days already rolled up by the scheduler; histograms are merged below
+	rows = frappe.db.sql(f"""
+		SELECT
+			rollup_date as sync_date,
 			sync_type,
-			COUNT(*) as total_syncs,
-			SUM(CASE WHEN status = 'Success' THEN 1 ELSE 0 END) as successful_syncs,
-			SUM(CASE WHEN status = 'Failed' THEN 1 ELSE 0 END) as failed_syncs,
-			(SUM(CASE WHEN status = 'Success' THEN 1 ELSE 0 END) * 100.0 / COUNT(*)) as success_rate,
-			0 as avg_response_time
-		FROM `tabWix Sync Log`
-		WHERE DATE(sync_date) BETWEEN %(from_date)s AND %(to_date)s
-	"""
-	
-	# Add sync type filter if specified
-	if filters.get("sync_type"):
-		query += " AND sync_type = %(sync_type)s"
-	
-	# Add status filter if specified
-	if filters.get("status"):
-		query += " AND status = %(status)s"
-	
-	query += " GROUP BY DATE(sync_date), sync_type ORDER BY sync_date DESC, sync_type"
-	
-	return frappe.db.sql(query, filters, as_dict=True)
+			sync_count as total_syncs,
+			CASE WHEN status = 'Success' THEN sync_count ELSE 0 END as successful_syncs,
+			CASE WHEN status = 'Failed' THEN sync_count ELSE 0 END as failed_syncs,
+			total_duration,
+			timed_count,
+			max_duration,
+			latency_histogram
+		FROM `tabWix Sync Daily Rollup`
+		WHERE rollup_date BETWEEN %(from_date)s AND %(to_date)s {conditions}
+	""", filters, as_dict=True)
+	for row in rows:
+		row.histogram = json.loads(row.latency_histogram or "[]")
+	
+	# Logs written since the last rollup run, read with a range on the sync_date index
+	watermark = get_rollup_watermark()
+	filters["raw_from"] = max(watermark, get_datetime(filters.from_date)) if watermark else get_datetime(filters.from_date)
+	filters["raw_to"] = get_datetime(add_days(filters.to_date, 1))
+	if filters.raw_from < filters.raw_to:
+		raw_rows = frappe.db.sql(f"""
+			SELECT
+				DATE(sync_date) as sync_date,
+				sync_type,
+				COUNT(*) as total_syncs,
+				SUM(CASE WHEN status = 'Success' THEN 1 ELSE 0 END) as successful_syncs,
+				SUM(CASE WHEN status = 'Failed' THEN 1 ELSE 0 END) as failed_syncs,
+				COALESCE(SUM(duration), 0) as total_duration,
+				COUNT(duration) as timed_count,
+				COALESCE(MAX(duration), 0) as max_duration,
+				{get_histogram_columns()}
+			FROM `tabWix Sync Log`
+			WHERE sync_date >= %(raw_from)s AND sync_date < %(raw_to)s {conditions}
+			GROUP BY DATE(sync_date), sync_type
+		""", filters, as_dict=True)
+		for row in raw_rows:
+			row.histogram = get_histogram(row)
+		rows += raw_rows
+	
+	data = {}
+	for row in rows:
+		key = (getdate(row.sync_date), row.sync_type)
+		entry = data.setdefault(key, frappe._dict(
+			sync_date=key[0], sync_type=row.sync_type, total_syncs=0, successful_syncs=0,
+			failed_syncs=0, total_duration=0, timed_count=0, max_duration=0, histogram=[]
+		))
+		for field in ("total_syncs", "successful_syncs", "failed_syncs", "timed_count"):
+			entry[field] += cint(row[field])
+		entry.total_duration += flt(row.total_duration)
+		entry.max_duration = max(entry.max_duration, flt(row.max_duration))
+		entry.histogram = merge_histograms(entry.histogram, row.histogram)
+	
+	for entry in data.values():
+		entry.success_rate = (entry.successful_syncs * 100.0 / entry.total_syncs) if entry.total_syncs else 0
+		set_latency(entry)
+	
+	return sorted(data.values(), key=lambda row: (-row.sync_date.toordinal(), row.sync_type or ""))
+
+def set_latency(entry):
+	"""Average and percentile response times of a row from its duration sums and histogram"""
+	entry.avg_response_time = (entry.total_duration / entry.timed_count) if entry.timed_count else 0
+	for label, quantile in PERCENTILES:
+		entry[f"{label}_response_time"] = get_percentile(entry.histogram, quantile, entry.max_duration)
 
 def get_chart_data(data):
 	"""Generate chart data for the report"""
@@ -177,4 +252,27 @@ def get_summary(data):
 		}
 	]
 	
+	# Latency over the whole range, per sync type
+	by_type = {}
+	for row in data:
+		entry = by_type.setdefault(row.sync_type, frappe._dict(
+			total_duration=0, timed_count=0, max_duration=0, histogram=[]
+		))
+		entry.total_duration += row.total_duration
+		entry.timed_count += row.timed_count
+		entry.max_duration = max(entry.max_duration, row.max_duration)
+		entry.histogram = merge_histograms(entry.histogram, row.histogram)
+	
+	for sync_type, entry in sorted(by_type.items(), key=lambda item: item[0] or ""):
+		if not entry.timed_count:
+			continue
+		set_latency(entry)
+		summary.append({
+			"label": _("{0} Latency (avg / p50 / p95 / p99)").format(sync_type or _("Unknown")),
+			"value": " / ".join(f"{entry[field]:.2f}s" for field in (
+				"avg_response_time", "p50_response_time", "p95_response_time", "p99_response_time"
+			)),
+			"indicator": "Blue"
+		})
+	
 	return summary
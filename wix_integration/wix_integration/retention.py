@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import gzip
+import json
+import os
+import time
+
+import frappe
+from frappe.utils import add_days, now_datetime, nowdate
+
+from .api import get_wix_settings
+from .payload_store import decode_payload
+
+# Log DocTypes and the indexed datetime column their retention is based on
+LOG_TABLES = (
+	("Wix Integration Log", "creation"),
+	("Wix Sync Log", "sync_date"),
+)
+
+# Rows deleted per statement and transaction
+PURGE_BATCH_SIZE = 1000
+
+# Seconds one run may spend purging each DocType; the rest is left for the next run
+PURGE_TIME_BUDGET = 120
+
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_FAILED_RETENTION_DAYS = 90
+
+ARCHIVE_FOLDER = "wix_log_archive"
+
+def get_retention_rules(settings=None, days=None, failed_days=None):
+	"""Retention in days per log status; the None key covers every other status"""
+	settings = settings or get_wix_settings()
+	return {
+		"Failed": failed_days or settings.failed_log_retention_days or DEFAULT_FAILED_RETENTION_DAYS,
+		None: days or settings.log_retention_days or DEFAULT_RETENTION_DAYS
+	}
+
+def purge_logs(days=None, failed_days=None, archive=None, time_budget=PURGE_TIME_BUDGET,
+		batch_size=PURGE_BATCH_SIZE):
+	"""Delete expired Wix log rows in small batches within a time budget per DocType.
+
+	Every DocType gets the whole budget, so a backlog in one log table
+	never keeps the other from being purged. Each batch selects the
+	primary keys of the oldest expired rows through the datetime index,
+	keyset-paged so rows kept by a longer rule are not read again, and
+	deletes exactly those keys in its own transaction. With `archive`
+	(default: Archive Purged Logs in Wix Settings) the rows are appended to
+	a gzipped JSONL file first. Returns the rows purged per DocType and
+	whether the run finished within its budget.
+	"""
+	settings = get_wix_settings()
+	rules = get_retention_rules(settings, days, failed_days)
+	archive = settings.archive_purged_logs if archive is None else archive
+	summary = {"purged": {}, "complete": True}
+
+	for doctype, date_field in LOG_TABLES:
+		deadline = time.monotonic() + time_budget
+		purged = 0
+		for status, retention_days in rules.items():
+			others = [key for key in rules if key] if status is None else None
+			cutoff = add_days(now_datetime(), -retention_days)
+			position = None
+
+			while True:
+				if time.monotonic() >= deadline:
+					summary["complete"] = False
+					break
+
+				rows = get_expired_rows(doctype, date_field, cutoff, status, others, position, batch_size)
+				if not rows:
+					break
+
+				names = [row.name for row in rows]
+				if archive:
+					archive_rows(doctype, names)
+				frappe.db.delete(doctype, {"name": ("in", names)})
+				frappe.db.commit()
+
+				purged += len(names)
+				position = (rows[-1].date, rows[-1].name)
+				if len(rows) < batch_size:
+					break
+
+		summary["purged"][doctype] = purged
+
+	return summary
+
+def get_expired_rows(doctype, date_field, cutoff, status, others, position, limit):
+	"""Next batch of (date, name) keys older than the cutoff for one retention rule"""
+	values = {"cutoff": cutoff, "limit": limit}
+
+	if status:
+		conditions = "status = %(status)s"
+		values["status"] = status
+	else:
+		conditions = "(status IS NULL OR status NOT IN %(others)s)"
+		values["others"] = others
+
+	if position:
+		conditions += f" AND ({date_field} > %(last_date)s OR ({date_field} = %(last_date)s AND name > %(last_name)s))"
+		values["last_date"], values["last_name"] = position
+
+	return frappe.db.sql(f"""
+		SELECT name, {date_field} AS date
+		FROM `tab{doctype}`
+		WHERE {date_field} < %(cutoff)s AND {conditions}
+		ORDER BY {date_field} ASC, name ASC
+		LIMIT %(limit)s
+	""", values, as_dict=True)
+
+def archive_rows(doctype, names):
+	"""Append rows to today's gzipped JSONL archive of their DocType"""
+	rows = frappe.get_all(doctype, filters={"name": ("in", names)}, fields=["*"], order_by="creation asc")
+	for row in rows:
+		for field in ("request_data", "response_data"):
+			if row.get(field):
+				row[field] = decode_payload(row[field])
+
+	folder = frappe.get_site_path("private", ARCHIVE_FOLDER)
+	os.makedirs(folder, exist_ok=True)
+	path = os.path.join(folder, f"{frappe.scrub(doctype)}-{nowdate()}.jsonl.gz")
+
+	# Every append adds a gzip member; readers decompress them as one stream
+	with gzip.open(path, "at", encoding="utf-8") as archive:
+		for row in rows:
+			archive.write(json.dumps(row, default=str, separators=(",", ":")) + "\n")
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""Retry queue for failed product pushes and order imports.
+
+Every failed entity gets one Wix Sync Retry row holding its attempt count
+and when it is due again. Transient failures (connection errors, 408,
+429, 5xx and retryable Wix error codes) back off exponentially with
+jitter, so a Wix outage does not end in every worker retrying at once.
+Permanent failures, and entities that ran out of attempts, go to the
+Dead Letter state and are not retried until the document changes or they
+are requeued by hand.
+"""
+from __future__ import unicode_literals
+import random
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, cint, now_datetime
+
+from .circuit_breaker import CircuitOpenError
+from .customer_resolver import CustomerLockTimeout
+
+RETRY_DOCTYPE = "Wix Sync Retry"
+
+# First retry after about a minute, doubling up to six hours
+RETRY_BASE_DELAY = 60
+RETRY_MAX_DELAY = 6 * 3600
+
+# Due entries handled per run of the retry job
+RETRY_BATCH_SIZE = 200
+
+# Used while Max Retry Attempts was never set; an explicit 0 means no retries
+DEFAULT_MAX_RETRY_ATTEMPTS = 3
+
+TRANSIENT_STATUS_CODES = {408, 425, 429}
+
+# Wix error codes (per-item bulk results) worth retrying
+TRANSIENT_ERROR_CODES = {
+	"ABORTED", "DEADLINE_EXCEEDED", "INTERNAL", "NO_RESULT", "RESOURCE_EXHAUSTED",
+	"REVISION_MISMATCH", "UNAVAILABLE", "UNKNOWN"
+}
+
+def classify_error(error):
+	"""Return (transient, message) for an exception or a Wix error dict"""
+	if isinstance(error, dict):
+		code = error.get("code")
+		message = error.get("description") or code or _("Rejected by Wix")
+		return (not code or code in TRANSIENT_ERROR_CODES), message
+
+	message = str(error)
+	if hasattr(error, "status_code"):
+		# WixAPIError: no status means the request never got an answer
+		status_code = error.status_code
+		return (status_code is None or status_code >= 500 or status_code in TRANSIENT_STATUS_CODES), message
+
+	# Everything else failed on our side; only lock contention is worth retrying
+	return isinstance(error, (frappe.QueryDeadlockError, frappe.QueryTimeoutError, CustomerLockTimeout)), message
+
+def get_backoff(attempts):
+	"""Seconds until the next attempt: exponential with equal jitter"""
+	delay = min(RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), RETRY_MAX_DELAY)
+	return delay / 2 + random.uniform(0, delay / 2)
+
+def get_max_retry_attempts(settings):
+	"""Retries allowed after the first failure, from Wix Settings"""
+	value = settings.get("max_retry_attempts")
+	return DEFAULT_MAX_RETRY_ATTEMPTS if value is None or value == "" else cint(value)
+
+def schedule_retry(entity_type, entity_id, error, settings=None):
+	"""Record a failed attempt and return the entry's new status (Queued or Dead Letter)"""
+	if isinstance(error, CircuitOpenError):
+		# Nothing was sent while the circuit is open; that is not an attempt
+		return "Queued"
+
+	if settings is None:
+		from .api import get_wix_settings
+		settings = get_wix_settings()
+
+	transient, message = classify_error(error)
+	existing = frappe.db.get_value(
+		RETRY_DOCTYPE,
+		{"entity_type": entity_type, "entity_id": entity_id},
+		["name", "attempts"],
+		as_dict=True
+	)
+	attempts = (existing.attempts if existing else 0) + 1
+	dead = not transient or attempts > get_max_retry_attempts(settings)
+
+	values = {
+		"status": "Dead Letter" if dead else "Queued",
+		"attempts": attempts,
+		"next_attempt_at": None if dead else add_to_date(now_datetime(), seconds=get_backoff(attempts)),
+		"error_type": "Transient" if transient else "Permanent",
+		"last_error": message
+	}
+	if existing:
+		frappe.db.set_value(RETRY_DOCTYPE, existing.name, values)
+	else:
+		frappe.get_doc(dict(values, doctype=RETRY_DOCTYPE, entity_type=entity_type, entity_id=entity_id)).insert(
+			ignore_permissions=True
+		)
+
+	if dead and entity_type == "Order":
+		# The order import has moved past it and no document shows its state
+		log_dead_order(entity_id, message, attempts)
+
+	return values["status"]
+
+def log_dead_order(order_id, message, attempts):
+	"""Record a dead-lettered Wix order in the Error Log, with how to import it again"""
+	frappe.log_error(
+		title=_("Wix order {0} was not imported").format(order_id),
+		message=_(
+			"Wix order {0} failed after {1} attempt(s) and will not be retried: {2}\n\n"
+			"Fix the cause, then requeue it by calling "
+			"wix_integration.retry_queue.requeue_dead_letters with entity_type \"Order\"."
+		).format(order_id, attempts, message)
+	)
+
+def clear_retries(entity_type, entity_ids):
+	"""Drop the retry entries of entities that synced successfully"""
+	if entity_ids:
+		frappe.db.delete(RETRY_DOCTYPE, {"entity_type": entity_type, "entity_id": ("in", list(entity_ids))})
+
+def process_due_retries(limit=RETRY_BATCH_SIZE):
+	"""Retry the entries whose next attempt is due, oldest due first"""
+	from .api import get_wix_settings
+	settings = get_wix_settings()
+
+	due = frappe.db.sql("""
+		SELECT entity_type, entity_id
+		FROM `tabWix Sync Retry`
+		WHERE status = 'Queued' AND next_attempt_at <= %(now)s
+		ORDER BY next_attempt_at ASC
+		LIMIT %(limit)s
+	""", {"now": now_datetime(), "limit": limit}, as_dict=True)
+
+	products = [row.entity_id for row in due if row.entity_type == "Product"]
+	orders = [row.entity_id for row in due if row.entity_type == "Order"]
+	summary = {"products": 0, "orders": 0}
+
+	if products and settings.sync_products:
+		summary["products"] = retry_products(products)
+	if orders and settings.sync_orders:
+		summary["orders"] = retry_orders(orders, settings)
+
+	frappe.db.commit()
+	return summary
+
+def retry_products(item_names):
+	"""Push the due Items again in bulk; failures are rescheduled by the bulk path"""
+	from .bulk_sync import bulk_upsert_items
+	from .tasks import FLUSH_LOCK_TIMEOUT, PUSH_LOCK
+	from .utils import job_lock
+
+	items = frappe.get_all(
+		"Item",
+		filters={"name": ("in", item_names), "sync_with_wix": 1},
+		pluck="name"
+	)
+	clear_retries("Product", set(item_names) - set(items))
+	if not items:
+		return 0
+
+	with job_lock(PUSH_LOCK, FLUSH_LOCK_TIMEOUT) as acquired:
+		# A flush is pushing right now; the entries stay due for the next run
+		if not acquired:
+			return 0
+		bulk_upsert_items(items)
+	return len(items)
+
+def retry_orders(order_ids, settings):
+	"""Fetch the due Wix orders again, concurrently, and upsert their Sales Orders"""
+	from .executor import run_calls, wix_call
+	from .orders import ORDERS_ENDPOINT
+
+	run_calls(
+		[
+			wix_call("GET", f"{ORDERS_ENDPOINT}/{order_id}", operation="Get Order", context=order_id)
+			for order_id in order_ids
+		],
+		lambda call, response, error: retry_order(call.context, response, error, settings)
+	)
+	return len(order_ids)
+
+def retry_order(order_id, response, error, settings):
+	"""Upsert one refetched order in its own savepoint, or reschedule it"""
+	from .id_resolver import rollback_savepoint, start_savepoint
+	from .orders import upsert_sales_order
+	from .utils import log_sync
+
+	if isinstance(error, CircuitOpenError):
+		# Not sent; the entry stays due and is retried once the circuit closes
+		return
+
+	start_savepoint("wix_order_retry")
+	try:
+		if error:
+			raise error
+		result, sales_order = upsert_sales_order(response.get("order"), settings)
+		clear_retries("Order", [order_id])
+		log_sync("Order Sync", "Success", "Sales Order", sales_order, wix_id=order_id)
+	except Exception as e:
+		rollback_savepoint("wix_order_retry")
+		schedule_retry("Order", order_id, e, settings)
+		log_sync("Order Sync", "Failed", wix_id=order_id, error_message=str(e))
+
+@frappe.whitelist()
+def requeue_dead_letters(entity_type=None):
+	"""Give dead-lettered entries a fresh set of attempts"""
+	frappe.only_for("System Manager")
+
+	filters = {"status": "Dead Letter"}
+	if entity_type:
+		filters["entity_type"] = entity_type
+
+	names = frappe.get_all(RETRY_DOCTYPE, filters=filters, pluck="name")
+	for name in names:
+		frappe.db.set_value(RETRY_DOCTYPE, name, {
+			"status": "Queued",
+			"attempts": 0,
+			"next_attempt_at": now_datetime()
+		})
+
+	return {"status": "success", "message": _("{0} entries requeued").format(len(names))}
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import json
+import math
+
+import frappe
+from frappe.utils import add_days, add_to_date, cint, flt, get_datetime, getdate, now_datetime
+
+from .utils import get_checkpoint, set_checkpoint
+
+ROLLUP_CHECKPOINT = "Wix Sync Rollup"
+ROLLUP_DOCTYPE = "Wix Sync Daily Rollup"
+
+# Log rows may be committed a while after their sync_date by long jobs, so
+# days are recomputed until this long after they ended
+ROLLUP_SETTLE_SECONDS = 3600
+
+# Upper bounds (seconds) of the latency histogram buckets; one more bucket
+# holds everything slower than the last bound
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def refresh_daily_rollup():
+	"""Recompute the rollup of every day that may still have changed.
+
+	Each run starts at the day of the previous run's end (less the settle
+	time) and rebuilds day by day up to now, committing per day. The end of
+	the last rebuilt range is kept as the watermark; the report reads raw
+	logs only after it.
+	"""
+	now = now_datetime()
+	checkpoint = get_checkpoint(ROLLUP_CHECKPOINT)
+
+	if checkpoint.watermark:
+		day = getdate(add_to_date(get_datetime(checkpoint.watermark), seconds=-ROLLUP_SETTLE_SECONDS))
+	else:
+		first_log = frappe.db.sql("SELECT MIN(sync_date) FROM `tabWix Sync Log`")[0][0]
+		day = getdate(first_log or now)
+
+	days = 0
+	while day <= getdate(now):
+		end = min(get_datetime(add_days(day, 1)), now)
+		rebuild_day(day, end)
+		set_checkpoint(ROLLUP_CHECKPOINT, watermark=str(end))
+		frappe.db.commit()
+
+		day = add_days(day, 1)
+		days += 1
+
+	return days
+
+def rebuild_day(day, end):
+	"""Replace the rollup rows of one day with fresh aggregates of its logs"""
+	rows = frappe.db.sql(f"""
+		SELECT sync_type, status,
+			COUNT(*) AS sync_count,
+			COUNT(duration) AS timed_count,
+			COALESCE(SUM(duration), 0) AS total_duration,
+			COALESCE(MAX(duration), 0) AS max_duration,
+			{get_histogram_columns()}
+		FROM `tabWix Sync Log`
+		WHERE sync_date >= %(start)s AND sync_date < %(end)s
+		GROUP BY sync_type, status
+	""", {"start": get_datetime(day), "end": end}, as_dict=True)
+
+	frappe.db.delete(ROLLUP_DOCTYPE, {"rollup_date": day})
+	if not rows:
+		return
+
+	now = now_datetime()
+	frappe.db.bulk_insert(
+		ROLLUP_DOCTYPE,
+		fields=["name", "creation", "modified", "owner", "modified_by", "docstatus",
+			"rollup_date", "sync_type", "status", "sync_count", "timed_count", "total_duration",
+			"max_duration", "latency_histogram"],
+		values=[
+			(frappe.generate_hash(length=10), now, now, "Administrator", "Administrator", 0,
+				day, row.sync_type or "", row.status or "",
+				cint(row.sync_count), cint(row.timed_count), flt(row.total_duration),
+				flt(row.max_duration), json.dumps(get_histogram(row)))
+			for row in rows
+		]
+	)
+
+def get_rollup_watermark():
+	"""End of the range the rollup covers, or None before its first run"""
+	watermark = get_checkpoint(ROLLUP_CHECKPOINT).watermark
+	return get_datetime(watermark) if watermark else None
+
+def get_histogram_columns():
+	"""SELECT columns counting durations per latency bucket, as bucket_0..bucket_N"""
+	columns, lower = [], None
+	for index, upper in enumerate(LATENCY_BUCKETS):
+		condition = f"duration <= {upper}" if lower is None else f"duration > {lower} AND duration <= {upper}"
+		columns.append(f"SUM(CASE WHEN {condition} THEN 1 ELSE 0 END) AS bucket_{index}")
+		lower = upper
+	columns.append(f"SUM(CASE WHEN duration > {lower} THEN 1 ELSE 0 END) AS bucket_{len(LATENCY_BUCKETS)}")
+	return ",\n\t\t\t".join(columns)
+
+def get_histogram(row):
+	"""Bucket counts of a row selected with get_histogram_columns()"""
+	return [cint(row.get(f"bucket_{index}")) for index in range(len(LATENCY_BUCKETS) + 1)]
+
+def merge_histograms(histogram, other):
+	"""Add the bucket counts of two histograms"""
+	if not histogram or not other:
+		return list(histogram or other or [])
+	return [a + b for a, b in zip(histogram, other)]
+
+def get_percentile(histogram, quantile, max_duration=None):
+	"""Estimate a latency percentile from bucket counts.
+
+	The value is interpolated linearly inside the bucket holding the rank,
+	so it is exact to within that bucket's width. The open-ended last
+	bucket is bounded by the slowest duration seen.
+	"""
+	total = sum(histogram or [])
+	if not total:
+		return 0
+
+	rank = max(math.ceil(quantile * total), 1)
+	seen, lower = 0, 0
+	for index, count in enumerate(histogram):
+		if index < len(LATENCY_BUCKETS):
+			upper = LATENCY_BUCKETS[index]
+		else:
+			upper = max(flt(max_duration), lower)
+
+		if count and seen + count >= rank:
+			value = lower + (upper - lower) * (rank - seen) / count
+			return min(value, flt(max_duration)) if max_duration else value
+
+		seen += count
+		lower = upper
+
+	return flt(max_duration)
@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for the Wix Stores API, for exercising the sync offline.
+
+Run it with
+
+	python -m wix_integration.stub_server --port 8765
+
+and point the site at it with
+
+	bench --site [your-site] set-config wix_api_base_url http://127.0.0.1:8765
+
+Only the endpoints used by this app are implemented, with the response
+shapes of Catalog V3, eCommerce Orders and Media Manager uploads. Products,
+their inventory items, orders and uploaded files are kept in memory;
+POST /_stub/orders seeds orders. SKUs passed with `--reject-sku` are
+refused per item, to exercise partial bulk failures, and
+`--throttle-every N` answers every Nth request with 429 and Retry-After.
+"""
+from __future__ import unicode_literals
+import argparse
+import base64
+import json
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class WixStubState(object):
+	"""In-memory catalog shared by all requests to one stub server"""
+
+	def __init__(self, reject_skus=None, throttle_every=0):
+		self.lock = threading.Lock()
+		self.products = {}
+		self.inventory = {}
+		self.orders = {}
+		self.media = {}
+		self.uploads = {}
+		self.reject_skus = set(reject_skus or [])
+		self.throttle_every = throttle_every
+		self.request_count = 0
+
+	def get_skus(self, product):
+		return [v.get("sku") for v in (product.get("variantsInfo") or {}).get("variants", [])]
+
+	def validate(self, product):
+		"""Return an error dict when the product must be refused"""
+		if not product.get("name"):
+			return {"code": "INVALID_ARGUMENT", "description": "product.name is required"}
+		if self.reject_skus.intersection(self.get_skus(product)):
+			return {"code": "INVALID_ARGUMENT", "description": "SKU rejected by stub"}
+
+	def create(self, product):
+		error = self.validate(product)
+		if error:
+			return None, error
+
+		product = dict(product)
+		product["id"] = str(uuid.uuid4())
+		product["revision"] = "1"
+		with self.lock:
+			self.products[product["id"]] = product
+			for sku in self.get_skus(product):
+				inventory_id = str(uuid.uuid4())
+				self.inventory[inventory_id] = {
+					"id": inventory_id,
+					"revision": "1",
+					"productId": product["id"],
+					"product": {"variantSku": sku},
+					"trackQuantity": False,
+					"inStock": True
+				}
+		return product, None
+
+	def update_inventory(self, inventory_item):
+		with self.lock:
+			existing = self.inventory.get(inventory_item.get("id"))
+			if not existing:
+				return None, {"code": "NOT_FOUND", "description": "Inventory item not found"}
+			if inventory_item.get("revision") and inventory_item["revision"] != existing["revision"]:
+				return None, {"code": "REVISION_MISMATCH", "description": "Revision mismatch"}
+
+			existing.update(inventory_item)
+			if existing.get("trackQuantity"):
+				existing["inStock"] = (existing.get("quantity") or 0) > 0
+			else:
+				existing.pop("quantity", None)
+			existing["revision"] = str(int(existing["revision"]) + 1)
+			return dict(existing), None
+
+	def delete(self, product):
+		with self.lock:
+			existing = self.products.pop(product.get("id"), None)
+			if not existing:
+				return None, {"code": "NOT_FOUND", "description": "Product not found"}
+			for inventory_id in [i for i, entry in self.inventory.items() if entry["productId"] == existing["id"]]:
+				del self.inventory[inventory_id]
+			return existing, None
+
+	def update(self, product):
+		with self.lock:
+			existing = self.products.get(product.get("id"))
+			if not existing:
+				return None, {"code": "NOT_FOUND", "description": "Product not found"}
+			if product.get("revision") and product["revision"] != existing["revision"]:
+				return None, {"code": "REVISION_MISMATCH", "description": "Revision mismatch"}
+
+			error = self.validate(dict(existing, **product))
+			if error:
+				return None, error
+
+			existing.update(product)
+			existing["revision"] = str(int(existing["revision"]) + 1)
+			return dict(existing), None
+
+class WixStubHandler(BaseHTTPRequestHandler):
+	"""Routes requests to handler methods by HTTP method and path pattern"""
+
+	routes = [
+		("GET", r"^/stores/v3/products$", "list_products"),
+		("POST", r"^/stores/v3/products$", "create_product"),
+		("PATCH", r"^/stores/v3/products/(?P<product_id>[^/]+)$", "update_product"),
+		("POST", r"^/stores/v3/bulk/products/create$", "bulk_create_products"),
+		("POST", r"^/stores/v3/bulk/products/update$", "bulk_update_products"),
+		("POST", r"^/stores/v3/products/query$", "query_products"),
+		("POST", r"^/stores/v3/bulk/products/delete$", "bulk_delete_products"),
+		("POST", r"^/stores/v3/inventory-items/search$", "search_inventory_items"),
+		("POST", r"^/stores/v3/bulk/inventory-items/update$", "bulk_update_inventory_items"),
+		("POST", r"^/ecom/v1/orders/search$", "search_orders"),
+		("GET", r"^/ecom/v1/orders/(?P<order_id>[^/]+)$", "get_order"),
+		("POST", r"^/site-media/v1/files/generate-upload-url$", "generate_upload_url"),
+		("PUT", r"^/_stub/upload/(?P<token>[^/]+)$", "upload_file"),
+		("POST", r"^/_stub/orders$", "seed_orders"),
+	]
+
+	protocol_version = "HTTP/1.1"
+
+	@property
+	def state(self):
+		return self.server.state
+
+	def log_message(self, format, *args):
+		if self.server.verbose:
+			BaseHTTPRequestHandler.log_message(self, format, *args)
+
+	def do_GET(self):
+		self.dispatch("GET")
+
+	def do_POST(self):
+		self.dispatch("POST")
+
+	def do_PATCH(self):
+		self.dispatch("PATCH")
+
+	def do_PUT(self):
+		self.dispatch("PUT")
+
+	def dispatch(self, method):
+		parsed = urlparse(self.path)
+		self.query = parse_qs(parsed.query)
+		length = int(self.headers.get("Content-Length") or 0)
+		raw_body = self.rfile.read(length) if length else b""
+
+		with self.state.lock:
+			self.state.request_count += 1
+			throttled = self.state.throttle_every and self.state.request_count % self.state.throttle_every == 0
+
+		if throttled:
+			self.retry_after = "1"
+			return self.send_json(429, {"message": "Too many requests"})
+
+		# Upload URLs are pre-signed and take the raw file as body
+		upload = parsed.path.startswith("/_stub/upload/")
+		self.raw_body = raw_body
+
+		if not upload and not self.headers.get("Authorization"):
+			return self.send_json(401, {"message": "Missing authorization"})
+
+		try:
+			self.body = json.loads(raw_body) if raw_body and not upload else {}
+		except ValueError:
+			return self.send_json(400, {"message": "Invalid JSON"})
+
+		for route_method, pattern, handler in self.routes:
+			match = re.match(pattern, parsed.path)
+			if route_method == method and match:
+				status, payload = getattr(self, handler)(**match.groupdict())
+				return self.send_json(status, payload)
+
+		self.send_json(404, {"message": f"No stub for {method} {parsed.path}"})
+
+	def send_json(self, status, payload):
+		body = json.dumps(payload).encode("utf-8")
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json")
+		if status == 429:
+			self.send_header("Retry-After", self.retry_after)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def list_products(self):
+		limit = int((self.query.get("limit") or [100])[0])
+		return 200, {"products": list(self.state.products.values())[:limit]}
+
+	def create_product(self):
+		product, error = self.state.create(self.body.get("product") or {})
+		if error:
+			return 400, {"message": error["description"], "details": error}
+		return 200, {"product": product}
+
+	def update_product(self, product_id):
+		product, error = self.state.update(dict(self.body.get("product") or {}, id=product_id))
+		if error:
+			return (404 if error["code"] == "NOT_FOUND" else 400), {"message": error["description"], "details": error}
+		return 200, {"product": product}
+
+	def bulk_create_products(self):
+		return self.bulk_results(self.body.get("products") or [], self.state.create)
+
+	def bulk_update_products(self):
+		entries = [entry.get("product") or {} for entry in self.body.get("products") or []]
+		return self.bulk_results(entries, self.state.update)
+
+	def query_products(self):
+		paging = (self.body.get("query") or {}).get("cursorPaging") or {}
+		limit = min(int(paging.get("limit") or 100), 100)
+		offset = json.loads(base64.urlsafe_b64decode(paging["cursor"]))["offset"] if paging.get("cursor") else 0
+
+		with self.state.lock:
+			products = sorted((dict(p) for p in self.state.products.values()), key=lambda p: p["id"])
+
+		page = products[offset:offset + limit]
+		next_cursor = base64.urlsafe_b64encode(
+			json.dumps({"offset": offset + limit}).encode("utf-8")
+		).decode("ascii") if offset + limit < len(products) else None
+
+		return 200, {
+			"products": page,
+			"pagingMetadata": {"count": len(page), "cursors": {"next": next_cursor}}
+		}
+
+	def bulk_delete_products(self):
+		return self.bulk_results([{"id": product_id} for product_id in self.body.get("productIds") or []],
+			self.state.delete)
+
+	def bulk_results(self, products, action):
+		if len(products) > 100:
+			return 400, {"message": "At most 100 products per bulk request"}
+
+		results = []
+		for index, product in enumerate(products):
+			item, error = action(product)
+			metadata = {"originalIndex": index, "success": error is None}
+			if error:
+				metadata["error"] = error
+			else:
+				metadata["id"] = item["id"]
+			results.append({"itemMetadata": metadata, "item": item if self.body.get("returnEntity") else None})
+
+		successes = sum(1 for r in results if r["itemMetadata"]["success"])
+		return 200, {
+			"results": results,
+			"bulkActionMetadata": {
+				"totalSuccesses": successes,
+				"totalFailures": len(results) - successes,
+				"undetailedFailures": 0
+			}
+		}
+
+	def search_inventory_items(self):
+		search = self.body.get("search") or {}
+		paging = search.get("cursorPaging") or {}
+		limit = min(int(paging.get("limit") or 100), 100)
+
+		if paging.get("cursor"):
+			position = json.loads(base64.urlsafe_b64decode(paging["cursor"]))
+			product_ids, offset = position["productIds"], position["offset"]
+		else:
+			product_ids = ((search.get("filter") or {}).get("productId") or {}).get("$in") or []
+			offset = 0
+
+		with self.state.lock:
+			items = sorted(
+				(dict(i) for i in self.state.inventory.values() if i["productId"] in product_ids),
+				key=lambda i: i["id"]
+			)
+
+		page = items[offset:offset + limit]
+		next_cursor = base64.urlsafe_b64encode(
+			json.dumps({"productIds": product_ids, "offset": offset + limit}).encode("utf-8")
+		).decode("ascii") if offset + limit < len(items) else None
+
+		return 200, {
+			"inventoryItems": page,
+			"pagingMetadata": {"count": len(page), "cursors": {"next": next_cursor}}
+		}
+
+	def bulk_update_inventory_items(self):
+		entries = [entry.get("inventoryItem") or {} for entry in self.body.get("inventoryItems") or []]
+		return self.bulk_results(entries, self.state.update_inventory)
+
+	def generate_upload_url(self):
+		token = str(uuid.uuid4())
+		with self.state.lock:
+			self.state.uploads[token] = {"mimeType": self.body.get("mimeType"), "fileName": self.body.get("fileName")}
+		return 200, {"uploadUrl": f"http://{self.headers.get('Host')}/_stub/upload/{token}"}
+
+	def upload_file(self, token):
+		with self.state.lock:
+			upload = self.state.uploads.pop(token, None)
+			if not upload:
+				return 404, {"message": "Unknown upload URL"}
+
+			media_id = f"{uuid.uuid4().hex[:6]}_{uuid.uuid4().hex}~mv2"
+			self.state.media[media_id] = {
+				"id": media_id,
+				"displayName": (self.query.get("filename") or [upload["fileName"]])[0],
+				"mimeType": upload["mimeType"],
+				"sizeInBytes": str(len(self.raw_body)),
+				"url": f"https://static.wixstatic.com/media/{media_id}"
+			}
+			return 200, {"file": self.state.media[media_id]}
+
+	def seed_orders(self):
+		"""Test hook: add or replace orders, e.g. {"orders": [{"id": ..., "updatedDate": ...}]}"""
+		with self.state.lock:
+			for order in self.body.get("orders") or []:
+				self.state.orders[order["id"]] = order
+		return 200, {"count": len(self.state.orders)}
+
+	def get_order(self, order_id):
+		order = self.state.orders.get(order_id)
+		if not order:
+			return 404, {"message": "Order not found"}
+		return 200, {"order": order}
+
+	def search_orders(self):
+		search = self.body.get("search") or {}
+		paging = search.get("cursorPaging") or {}
+		limit = min(int(paging.get("limit") or 50), 100)
+
+		if paging.get("cursor"):
+			position = json.loads(base64.urlsafe_b64decode(paging["cursor"]))
+			since, offset = position["since"], position["offset"]
+		else:
+			since = ((search.get("filter") or {}).get("updatedDate") or {}).get("$gte") or ""
+			offset = 0
+
+		with self.state.lock:
+			orders = sorted(
+				(o for o in self.state.orders.values()
+					if o.get("status") != "INITIALIZED" and (o.get("updatedDate") or "") >= since),
+				key=lambda o: (o.get("updatedDate") or "", o["id"])
+			)
+
+		page = orders[offset:offset + limit]
+		has_next = offset + limit < len(orders)
+		next_cursor = base64.urlsafe_b64encode(
+			json.dumps({"since": since, "offset": offset + limit}).encode("utf-8")
+		).decode("ascii") if has_next else None
+
+		return 200, {
+			"orders": page,
+			"metadata": {"count": len(page), "cursors": {"next": next_cursor}, "hasNext": has_next}
+		}
+
+def make_server(host="127.0.0.1", port=0, reject_skus=None, throttle_every=0, verbose=False):
+	"""Create a stub server; port 0 picks a free port"""
+	server = ThreadingHTTPServer((host, port), WixStubHandler)
+	server.state = WixStubState(reject_skus=reject_skus, throttle_every=throttle_every)
+	server.verbose = verbose
+	return server
+
+def start_in_thread(**kwargs):
+	"""Start a stub server in a daemon thread and return it with its base URL"""
+	server = make_server(**kwargs)
+	thread = threading.Thread(target=server.serve_forever, daemon=True)
+	thread.start()
+	host, port = server.server_address[:2]
+	return server, f"http://{host}:{port}"
+
+def main():
+	parser = argparse.ArgumentParser(description="Run a local Wix API stub")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("--reject-sku", action="append", default=[], help="SKU to refuse in product writes")
+	parser.add_argument("--throttle-every", type=int, default=0, help="Answer every Nth request with 429")
+	args = parser.parse_args()
+
+	server = make_server(args.host, args.port, reject_skus=args.reject_sku,
+		throttle_every=args.throttle_every, verbose=True)
+	print(f"Wix stub listening on http://{args.host}:{args.port}")
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import json
+
+import frappe
+from frappe.utils import now_datetime, time_diff_in_seconds
+from .utils import job_lock, retry_failed_syncs, log_integration
+from .api import get_wix_settings
+from . import circuit_breaker
+
+# Seconds during which a repeated alert is not sent again
+ALERT_WINDOW = 3600
+
+def hourly():
+    """Hourly scheduled tasks"""
+    # Retry failed syncs that are due
+    retry_due_syncs()
+
+def daily():
+    """Daily scheduled tasks"""
+    # Clean up old logs per the retention in Wix Settings
+    cleanup_sync_logs()
+    
+    # Health check - ensure Wix connection is working
+    health_check()
+
+def weekly():
+    """Weekly scheduled tasks"""
+    # Generate sync report
+    generate_sync_report()
+
+# Held by whichever job is bulk pushing Items; a flush that runs longer loses it
+PUSH_LOCK = "push_products"
+FLUSH_LOCK_TIMEOUT = 3 * 3600
+
+def enqueue_pending_products():
+    """Hourly safety net: queue a flush of pending Items through the deduplicated job"""
+    from .api import enqueue_pending_sync
+    enqueue_pending_sync()
+
+def sync_pending_products(batch_size=200):
+    """Drain Items marked Pending by the Item doc events and push them to Wix.
+
+    Only one push job runs at a time; two would both create the Items that
+    have no Wix product yet.
+    """
+    settings = get_wix_settings()
+    if not settings or not settings.enable_sync or not settings.sync_products:
+        return
+
+    # While Wix is down the Items simply stay Pending
+    if circuit_breaker.is_open(settings.wix_site_id):
+        return
+
+    with job_lock(PUSH_LOCK, FLUSH_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            frappe.logger("wix_integration").info("Wix pending product flush already running")
+            return
+        flush_pending_products(settings, batch_size)
+
+def flush_pending_products(settings, batch_size):
+    from .bulk_sync import bulk_upsert_items
+
+    totals = {"total": 0, "success": 0, "skipped": 0, "failed": 0, "queued": 0}
+    attempted = set()
+    while not circuit_breaker.is_open(settings.wix_site_id):
+        pending = frappe.get_all(
+            "Item",
+            filters={"sync_with_wix": 1, "wix_sync_status": "Pending"},
+            fields=["name", "modified"],
+            order_by="modified asc",
+            limit_page_length=batch_size
+        )
+
+        # Items edited again while being pushed come back with a new modified
+        # timestamp; anything else we have already seen is left for the next run
+        batch = [row for row in pending if (row.name, row.modified) not in attempted]
+        if not batch:
+            break
+
+        attempted.update((row.name, row.modified) for row in batch)
+        summary = bulk_upsert_items(
+            [row.name for row in batch],
+            expected_modified={row.name: row.modified for row in batch}
+        )
+        for key in totals:
+            totals[key] += summary.get(key, 0)
+
+        frappe.db.commit()
+
+    if totals["total"]:
+        # Unchanged payloads are skipped without calling Wix; keep the counts visible
+        log_integration("Flush Pending Products", "Success", response_data=totals)
+        frappe.db.commit()
+
+    from .wix_client import get_pool_stats
+    frappe.logger("wix_integration").info(f"Wix connection pool after flush: {get_pool_stats()}")
+
+def sync_wix_orders_to_erpnext():
+    """Import Wix orders changed since the last checkpoint"""
+    settings = get_wix_settings()
+    if not settings or not settings.enable_sync or not settings.sync_orders:
+        return
+
+    if circuit_breaker.is_open(settings.wix_site_id):
+        return
+
+    from .orders import ORDERS_CHECKPOINT, import_orders
+    from .utils import get_checkpoint
+
+    # With webhooks on, orders arrive by push; polling only backs them up hourly
+    if settings.enable_webhook:
+        last_run = get_checkpoint(ORDERS_CHECKPOINT).last_run
+        if last_run and time_diff_in_seconds(now_datetime(), last_run) < 3600:
+            return
+
+    summary = import_orders()
+    frappe.logger("wix_integration").info(f"Wix order import: {summary}")
+
+def sync_inventory_to_wix():
+    """Push stock changes of the default warehouse to Wix"""
+    settings = get_wix_settings()
+    if not settings or not settings.enable_sync or not settings.sync_inventory or not settings.default_warehouse:
+        return
+
+    if circuit_breaker.is_open(settings.wix_site_id):
+        return
+
+    from .inventory import sync_inventory
+    summary = sync_inventory()
+    if summary["bins"]:
+        log_integration("Inventory Sync", "Failed" if summary["failed"] else "Success", response_data=summary)
+        frappe.db.commit()
+
+def retry_due_syncs():
+    """Retry failed product pushes and order imports whose backoff has expired"""
+    settings = get_wix_settings()
+    if not settings or not settings.enable_sync:
+        return
+
+    # Retrying against an open circuit would only burn attempts
+    if circuit_breaker.is_open(settings.wix_site_id):
+        return
+
+    retry_failed_syncs()
+
+def probe_wix_circuit():
+    """Close the Wix API circuit once Wix answers again, even when no sync is running"""
+    settings = get_wix_settings()
+    if not settings or not settings.enable_sync:
+        return
+
+    circuit_breaker.probe_if_due(settings.wix_site_id)
+
+def cleanup_sync_logs():
+    """Purge expired Wix log rows in batches, within a time budget"""
+    from .retention import purge_logs
+    summary = purge_logs()
+    frappe.logger("wix_integration").info(f"Purged Wix logs: {summary}")
+
+def update_sync_rollup():
+    """Bring the daily Wix Sync Log rollup behind the Wix Sync Summary report up to date"""
+    from .rollup import refresh_daily_rollup
+    refresh_daily_rollup()
+
+def process_webhook_events():
+    """Process events waiting in the Wix webhook inbox"""
+    from .webhooks import process_webhook_inbox
+    process_webhook_inbox()
+
+def enqueue_webhook_processing():
+    """Scheduled safety net: queue the inbox consumer through its deduplicated job"""
+    from .webhooks import enqueue_inbox_processing
+    enqueue_inbox_processing()
+
+def health_check():
+    """Check Wix integration health"""
+    try:
+        settings = get_wix_settings()
+        if not settings or not settings.enable_sync:
+            return
+        
+        # Runs as a circuit breaker probe: a failure opens the circuit so
+        # syncs stop waiting out timeouts, a success closes it
+        result = circuit_breaker.run_probe(settings.wix_site_id)
+        
+        if not result.get('success'):
+            # Log health check failure
+            frappe.log_error(
+                message=f"Wix integration health check failed: {result.get('error')}",
+                title="Wix Integration Health Check Failed"
+            )
+            
+            # Optionally send notification to admin
+            send_health_check_notification(result.get('error'))
+            
+    except Exception as e:
+        frappe.log_error(
+            message=str(e),
+            title="Wix Integration Health Check Error"
+        )
+
+def send_health_check_notification(error_message):
+    """Send notification when health check fails"""
+    # A flapping connection alerts at most once per window
+    if not claim_alert_window("health_check"):
+        return
+
+    try:
+        # Enabled System Managers in one query
+        users = frappe.db.sql("""
+            SELECT DISTINCT u.name, u.email
+            FROM `tabUser` u
+            INNER JOIN `tabHas Role` hr ON hr.parent = u.name AND hr.parenttype = 'User'
+            WHERE hr.role = 'System Manager' AND u.enabled = 1
+        """, as_dict=True)
+        if not users:
+            return
+
+        names = [user.name for user in users]
+        subject = "Wix Integration Health Check Failed"
+        now = now_datetime()
+        email_content = f"""
+                    <p>The Wix integration health check has failed.</p>
+                    <p><strong>Error:</strong> {frappe.utils.escape_html(error_message or "")}</p>
+                    <p>Please check the Wix Settings and API credentials.</p>
+                    """
+        frappe.db.bulk_insert(
+            "Notification Log",
+            fields=["name", "creation", "modified", "owner", "modified_by", "docstatus", "subject",
+                "for_user", "type", "document_type", "document_name", "email_content", "read"],
+            values=[
+                (frappe.generate_hash(length=10), now, now, "Administrator", "Administrator", 0,
+                    subject, name, "Alert", "Wix Settings", "Wix Settings", email_content, 0)
+                for name in names
+            ]
+        )
+
+        # What Notification Log's after_insert would do, once for all users
+        frappe.db.sql("""
+            UPDATE `tabNotification Settings` SET seen = 0 WHERE name IN %(users)s
+        """, {"users": names})
+        for name in names:
+            frappe.publish_realtime("notification", after_commit=True, user=name)
+
+        recipients = get_email_recipients(users)
+        if recipients:
+            # One email queued for everyone; each recipient gets their own copy
+            frappe.sendmail(
+                recipients=recipients,
+                subject=subject,
+                message=email_content,
+                reference_doctype="Wix Settings",
+                reference_name="Wix Settings"
+            )
+
+    except Exception as e:
+        # Nobody was told; let the next failure alert again
+        release_alert_window("health_check")
+        frappe.log_error(
+            message=str(e),
+            title="Failed to send health check notification"
+        )
+
+def get_email_recipients(users):
+    """Emails of the users who did not turn email notifications off; no settings row means on"""
+    opted_out = set(frappe.db.sql_list("""
+        SELECT name FROM `tabNotification Settings`
+        WHERE name IN %(users)s AND (enabled = 0 OR enable_email_notifications = 0)
+    """, {"users": [user.name for user in users]}))
+    return [user.email for user in users if user.email and user.name not in opted_out]
+
+def get_alert_key(alert):
+    return frappe.cache().make_key(f"wix_alert|{alert}")
+
+def claim_alert_window(alert, window=ALERT_WINDOW):
+    """True for the first caller of an alert within the window, across all workers"""
+    try:
+        return bool(frappe.cache().execute_command("SET", get_alert_key(alert), "1", "NX", "EX", window))
+    except Exception:
+        # Without Redis, alerting beats staying silent
+        return True
+
+def release_alert_window(alert):
+    try:
+        frappe.cache().execute_command("DEL", get_alert_key(alert))
+    except Exception:
+        pass
+
+def generate_sync_report():
+    """Generate weekly sync report"""
+    try:
+        from frappe.utils import add_days, cint, today
+
+        # Stats for the last 7 full days
+        period_end = today()
+        period_start = add_days(period_end, -7)
+
+        # One pass over the (creation, status, operation) index
+        operations = frappe.db.sql("""
+            SELECT operation,
+                COUNT(*) AS count,
+                SUM(CASE WHEN status = 'Success' THEN 1 ELSE 0 END) AS successful,
+                SUM(CASE WHEN status = 'Failed' THEN 1 ELSE 0 END) AS failed
+            FROM `tabWix Integration Log`
+            WHERE creation >= %s AND creation < %s
+            GROUP BY operation
+            ORDER BY count DESC
+        """, (period_start, period_end), as_dict=True)
+
+        total_syncs = sum(row.count for row in operations)
+        successful_syncs = sum(cint(row.successful) for row in operations)
+        failed_syncs = sum(cint(row.failed) for row in operations)
+
+        if frappe.db.exists("Wix Sync Report", period_end):
+            report_doc = frappe.get_doc("Wix Sync Report", period_end)
+        else:
+            report_doc = frappe.new_doc("Wix Sync Report")
+
+        report_doc.update({
+            "period_start": period_start,
+            "period_end": period_end,
+            "total_syncs": total_syncs,
+            "successful_syncs": successful_syncs,
+            "failed_syncs": failed_syncs,
+            "success_rate": (successful_syncs / total_syncs * 100) if total_syncs else 0,
+            # Compact, like the log payloads
+            "operations_breakdown": json.dumps([
+                {
+                    "operation": row.operation,
+                    "count": row.count,
+                    "successful": cint(row.successful),
+                    "failed": cint(row.failed)
+                }
+                for row in operations
+            ], separators=(",", ":"))
+        })
+        report_doc.save(ignore_permissions=True)
+        frappe.db.commit()
+
+    except Exception as e:
+        frappe.log_error(
+            message=str(e),
+            title="Failed to generate sync report"
+        )
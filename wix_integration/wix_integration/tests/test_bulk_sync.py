@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+
+from wix_integration import circuit_breaker
+from wix_integration.bulk_sync import bulk_upsert_items
+from wix_integration.tests.utils import StubServerTestCase, make_item
+
+class TestBulkUpsert(StubServerTestCase):
+	reject_skus = ("_Test Wix Bulk Rejected",)
+
+	def setUp(self):
+		super(TestBulkUpsert, self).setUp()
+		self.good = make_item("_Test Wix Bulk Mug", price=10)
+		self.rejected = make_item("_Test Wix Bulk Rejected", price=10)
+
+	def get_item(self, item_name):
+		return frappe.db.get_value("Item", item_name,
+			["wix_product_id", "wix_sync_status", "wix_payload_hash"], as_dict=True)
+
+	def test_partial_failure_is_per_item(self):
+		summary = bulk_upsert_items([self.good, self.rejected])
+		self.assertEqual((summary["success"], summary["failed"]), (1, 1))
+
+		good = self.get_item(self.good)
+		self.assertIn(good.wix_product_id, self.server.state.products)
+		self.assertEqual(good.wix_sync_status, "Synced")
+		self.assertTrue(good.wix_payload_hash)
+
+		# The stub refuses the SKU as invalid, which no retry can fix
+		rejected = self.get_item(self.rejected)
+		self.assertFalse(rejected.wix_product_id)
+		self.assertEqual(rejected.wix_sync_status, "Error")
+
+	def test_unchanged_items_are_skipped(self):
+		bulk_upsert_items([self.good])
+		sent = self.server.state.request_count
+
+		summary = bulk_upsert_items([self.good])
+		self.assertEqual((summary["skipped"], summary["success"]), (1, 0))
+		self.assertEqual(self.server.state.request_count, sent)
+
+	def test_changed_item_is_updated_in_place(self):
+		bulk_upsert_items([self.good])
+		wix_product_id = self.get_item(self.good).wix_product_id
+
+		frappe.db.set_value("Item", self.good, "item_name", "_Test Wix Bulk Mug Renamed")
+		summary = bulk_upsert_items([self.good])
+
+		self.assertEqual(summary["success"], 1)
+		self.assertEqual(self.get_item(self.good).wix_product_id, wix_product_id)
+		self.assertEqual(self.server.state.products[wix_product_id]["name"], "_Test Wix Bulk Mug Renamed")
+
+	def test_missing_item_fails_alone(self):
+		summary = bulk_upsert_items([self.good, "_Test Wix Missing Item"])
+		self.assertEqual((summary["success"], summary["failed"]), (1, 1))
+
+	def test_open_circuit_keeps_items_pending(self):
+		circuit_breaker.set_state(self.site, "open")
+		summary = bulk_upsert_items([self.good])
+
+		self.assertEqual((summary["queued"], summary["failed"]), (1, 0))
+		self.assertEqual(self.get_item(self.good).wix_sync_status, "Pending")
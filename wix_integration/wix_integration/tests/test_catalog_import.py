@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from unittest.mock import patch
+
+import frappe
+
+from wix_integration.api import push_item_to_wix
+from wix_integration.catalog_import import CATALOG_IMPORT_CHECKPOINT, import_catalog
+from wix_integration.id_resolver import forget_all
+from wix_integration.tests.utils import StubServerTestCase, make_item_group
+
+TEST_ATTRIBUTE = "_Test Wix Import Size"
+
+def make_product(name, sku, amount, choice=None):
+	"""A Wix product as the catalog query returns it, with one variant per choice"""
+	variant = {"sku": sku, "price": {"actualPrice": {"amount": amount}}}
+	if choice:
+		variant["choices"] = [{"optionChoiceNames": {
+			"optionName": TEST_ATTRIBUTE, "choiceName": choice, "renderType": "TEXT_CHOICES"
+		}}]
+	return {"name": name, "plainDescription": f"{name} from Wix", "visible": True, "productType": "PHYSICAL",
+		"variantsInfo": {"variants": [variant]}}
+
+class TestCatalogImport(StubServerTestCase):
+	"""Imports the stub catalog; commits are held back so tearDown can roll back"""
+
+	def setUp(self):
+		super(TestCatalogImport, self).setUp()
+		self.commit = patch.object(frappe.db, "commit")
+		self.commit.start()
+		self.server.state.products.clear()
+		frappe.db.delete("Wix Sync Checkpoint", CATALOG_IMPORT_CHECKPOINT)
+		forget_all()
+
+	def tearDown(self):
+		self.commit.stop()
+		super(TestCatalogImport, self).tearDown()
+		forget_all()
+
+	def get_settings_values(self):
+		return dict(super(TestCatalogImport, self).get_settings_values(), default_item_group=make_item_group())
+
+	def test_imported_items_are_not_pushed_back(self):
+		self.server.state.create(make_product("Imported Mug", "_Test Wix Imported Mug", "9.50"))
+		shirt = make_product("Imported Shirt", "_Test Wix Imported Shirt S", "12.00", choice="S")
+		shirt.update(slug="_Test Wix Imported Shirt", options=[{
+			"name": TEST_ATTRIBUTE,
+			"optionRenderType": "TEXT_CHOICES",
+			"choicesSettings": {"choices": [{"choiceType": "CHOICE_TEXT", "name": "S"}]}
+		}])
+		self.server.state.create(shirt)
+
+		summary = import_catalog(download_media=False)
+		self.assertEqual(summary["created"], 2)
+
+		sent = self.server.state.request_count
+		for item_code in ("_Test Wix Imported Mug", "_Test Wix Imported Shirt"):
+			self.assertEqual(frappe.db.get_value("Item", item_code, "wix_sync_status"), "Synced")
+			self.assertTrue(push_item_to_wix(item_code).get("skipped"))
+		self.assertEqual(self.server.state.request_count, sent)
+
+	def test_linked_item_with_other_content_is_pushed(self):
+		product, error = self.server.state.create(make_product("Linked Mug", "_Test Wix Linked Mug", "9.50"))
+		frappe.get_doc({
+			"doctype": "Item", "item_code": "_Test Wix Linked Mug", "item_name": "Mug as named in ERPNext",
+			"item_group": make_item_group(), "stock_uom": "Nos", "sync_with_wix": 0
+		}).insert(ignore_permissions=True)
+
+		self.assertEqual(import_catalog(download_media=False)["linked"], 1)
+		self.assertEqual(frappe.db.get_value("Item", "_Test Wix Linked Mug", "wix_product_id"), product["id"])
+		self.assertFalse(push_item_to_wix("_Test Wix Linked Mug").get("skipped"))
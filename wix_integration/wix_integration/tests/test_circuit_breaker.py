@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from wix_integration import circuit_breaker
+from wix_integration.tests.utils import make_test_site_id
+
+class TestCircuitBreaker(unittest.TestCase):
+	def setUp(self):
+		self.site = make_test_site_id()
+		self.conf = patch.dict(frappe.conf, {"wix_circuit_failures": 3, "wix_circuit_cooldown": 60})
+		self.conf.start()
+
+	def tearDown(self):
+		frappe.cache().execute_command("DEL", circuit_breaker.get_circuit_key(self.site))
+		self.conf.stop()
+
+	def record_failures(self, times):
+		for _ in range(times):
+			circuit_breaker.record_result(self.site, success=False)
+
+	def test_success_resets_the_failure_count(self):
+		self.record_failures(2)
+		self.assertEqual(circuit_breaker.get_status(self.site)["failures"], 2)
+
+		circuit_breaker.record_result(self.site, success=True)
+		status = circuit_breaker.get_status(self.site)
+		self.assertEqual((status["state"], status["failures"]), ("closed", 0))
+
+	def test_opens_at_the_threshold_and_fails_fast(self):
+		self.record_failures(3)
+
+		self.assertTrue(circuit_breaker.is_open(self.site))
+		self.assertGreater(circuit_breaker.get_status(self.site)["retry_in"], 0)
+		with self.assertRaises(circuit_breaker.CircuitOpenError):
+			circuit_breaker.before_request(self.site)
+
+	def test_probe_flag_bypasses_an_open_circuit(self):
+		self.record_failures(3)
+		frappe.flags.wix_circuit_probe = True
+		try:
+			circuit_breaker.before_request(self.site)
+		finally:
+			frappe.flags.wix_circuit_probe = False
+
+	def test_single_probe_after_the_cooldown(self):
+		circuit_breaker.set_state(self.site, "open")
+		allow = circuit_breaker.get_script(circuit_breaker.ALLOW_SCRIPT)
+		args = [0, circuit_breaker.PROBE_TIMEOUT, circuit_breaker.KEY_TTL]
+
+		# Cool-down over: exactly one caller gets to probe
+		decision, retry_in = allow(keys=[circuit_breaker.get_circuit_key(self.site)], args=args)
+		self.assertEqual(frappe.safe_decode(decision), "probe")
+		decision, retry_in = allow(keys=[circuit_breaker.get_circuit_key(self.site)], args=args)
+		self.assertEqual(frappe.safe_decode(decision), "deny")
+		self.assertEqual(circuit_breaker.get_status(self.site)["state"], "half_open")
+
+	def test_closing_resets_the_circuit(self):
+		self.record_failures(3)
+		circuit_breaker.set_state(self.site, "closed")
+
+		status = circuit_breaker.get_status(self.site)
+		self.assertEqual((status["state"], status["failures"]), ("closed", 0))
+		circuit_breaker.before_request(self.site)
+
+	def test_probe_restores_the_callers_flag(self):
+		frappe.flags.wix_circuit_probe = True
+		try:
+			with patch("wix_integration.api.test_wix_connection", return_value={"success": True}):
+				circuit_breaker.run_probe(self.site)
+			self.assertTrue(frappe.flags.wix_circuit_probe)
+		finally:
+			frappe.flags.wix_circuit_probe = False
+
+	def test_failed_probe_reopens_the_circuit(self):
+		circuit_breaker.set_state(self.site, "closed")
+		with patch("wix_integration.api.test_wix_connection", return_value={"success": False, "error": "down"}):
+			circuit_breaker.run_probe(self.site)
+		self.assertTrue(circuit_breaker.is_open(self.site))
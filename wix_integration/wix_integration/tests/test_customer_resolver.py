@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from wix_integration import customer_resolver
+from wix_integration.id_resolver import forget_all, rollback_savepoint, start_savepoint
+from wix_integration.retry_queue import classify_error
+
+class TestCustomerResolver(unittest.TestCase):
+	def setUp(self):
+		forget_all()
+		self.email = f"_test_wix_{frappe.generate_hash(length=8)}@example.com"
+		self.created = []
+
+	def tearDown(self):
+		forget_all()
+		frappe.db.rollback()
+		customer_resolver.invalidate_emails([self.email])
+		frappe.cache().execute_command("DEL", self.get_lock_key())
+
+	def get_lock_key(self):
+		return frappe.cache().make_key(f"wix_customer_lock|{self.email}")
+
+	def get_lock(self):
+		return frappe.cache().lock(self.get_lock_key(), timeout=10)
+
+	def create(self):
+		customer = frappe.get_doc({"doctype": "Customer", "customer_name": f"_Test Wix Buyer {len(self.created)}"})
+		customer.insert(ignore_permissions=True)
+		self.created.append(customer.name)
+		return customer.name
+
+	def test_email_is_normalized(self):
+		customer = self.create()
+		frappe.get_doc({
+			"doctype": "Contact",
+			"first_name": "_Test Wix Buyer",
+			"email_ids": [{"email_id": self.email.upper(), "is_primary": 1}],
+			"links": [{"link_doctype": "Customer", "link_name": customer}]
+		}).insert(ignore_permissions=True)
+
+		self.assertEqual(customer_resolver.resolve_customers([f" {self.email.upper()} "]), {self.email: customer})
+
+	def test_customer_is_created_once_per_job(self):
+		first = customer_resolver.get_or_create_customer(self.email, self.create)
+		self.assertEqual(customer_resolver.get_or_create_customer(self.email, self.create), first)
+		self.assertEqual(self.created, [first])
+
+	def test_savepoint_rollback_releases_the_lock(self):
+		start_savepoint("wix_test_customer")
+		customer_resolver.get_or_create_customer(self.email, self.create)
+		self.assertFalse(self.get_lock().acquire(blocking=False))
+
+		rollback_savepoint("wix_test_customer")
+
+		# The buyer's next order creates the Customer again instead of waiting
+		with patch.object(customer_resolver, "LOCK_WAIT", 0.1):
+			customer = customer_resolver.get_or_create_customer(self.email, self.create)
+		self.assertTrue(frappe.db.exists("Customer", customer))
+
+	def test_lock_timeout_is_retried(self):
+		lock = self.get_lock()
+		self.assertTrue(lock.acquire(blocking=False))
+
+		with patch.object(customer_resolver, "LOCK_WAIT", 0.1), \
+				self.assertRaises(customer_resolver.CustomerLockTimeout) as timeout:
+			customer_resolver.get_or_create_customer(self.email, self.create)
+		self.assertTrue(classify_error(timeout.exception)[0])
+		self.assertFalse(self.created)
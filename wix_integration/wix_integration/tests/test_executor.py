@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+
+from wix_integration import circuit_breaker, executor, wix_client
+from wix_integration.api import PRODUCTS_ENDPOINT, WixAPIError, WixCircuitOpenError
+from wix_integration.bulk_sync import BULK_CREATE_ENDPOINT
+from wix_integration.tests.utils import StubServerTestCase
+
+class TestExecutor(StubServerTestCase):
+	reject_skus = ("_TEST-WIX-BAD-SKU",)
+
+	def run_calls(self, calls, concurrency=4):
+		results = {}
+		executor.run_calls(calls, lambda call, response, error: results.__setitem__(call.context, (response, error)),
+			concurrency=concurrency)
+		return results
+
+	def test_concurrency_is_capped_at_the_pool_size(self):
+		self.assertEqual(executor.get_concurrency(frappe._dict(push_concurrency=0)), executor.DEFAULT_CONCURRENCY)
+		self.assertEqual(executor.get_concurrency(frappe._dict(push_concurrency=1000)), wix_client.POOL_MAXSIZE)
+
+	def test_each_call_gets_its_own_result(self):
+		results = self.run_calls([
+			executor.wix_call("POST", PRODUCTS_ENDPOINT, data={"product": {"name": f"Stub {i}"}}, context=i)
+			for i in range(10)
+		] + [
+			executor.wix_call("GET", "/stores/v3/unknown", context="missing")
+		])
+
+		self.assertEqual(len(results), 11)
+		for i in range(10):
+			response, error = results[i]
+			self.assertIsNone(error)
+			self.assertEqual(response["product"]["name"], f"Stub {i}")
+
+		response, error = results["missing"]
+		self.assertIsInstance(error, WixAPIError)
+		self.assertEqual(error.status_code, 404)
+
+	def test_bulk_results_are_per_item(self):
+		results = self.run_calls([executor.wix_call("POST", BULK_CREATE_ENDPOINT, data={"products": [
+			{"name": "Good", "variantsInfo": {"variants": [{"sku": "_TEST-WIX-GOOD-SKU"}]}},
+			{"name": "Bad", "variantsInfo": {"variants": [{"sku": "_TEST-WIX-BAD-SKU"}]}}
+		]}, context="bulk")])
+
+		response, error = results["bulk"]
+		self.assertIsNone(error)
+		self.assertEqual([r["itemMetadata"]["success"] for r in response["results"]], [True, False])
+
+	def test_throttled_calls_are_sent_again(self):
+		self.server.state.throttle_every = 3
+		results = self.run_calls([executor.wix_call("GET", PRODUCTS_ENDPOINT, context=i) for i in range(6)])
+		self.assertEqual(len(results), 6)
+		self.assertTrue(all(error is None for response, error in results.values()))
+
+	def test_failing_handler_does_not_stop_other_calls(self):
+		handled = []
+
+		def on_result(call, response, error):
+			if call.context == 0:
+				raise ValueError("handler bug")
+			handled.append(call.context)
+
+		executor.run_calls([executor.wix_call("GET", PRODUCTS_ENDPOINT, context=i) for i in range(4)], on_result)
+		self.assertEqual(sorted(handled), [1, 2, 3])
+
+	def test_open_circuit_is_reported_per_call(self):
+		circuit_breaker.set_state(self.site, "open")
+		sent = self.server.state.request_count
+
+		results = self.run_calls([executor.wix_call("GET", PRODUCTS_ENDPOINT, context=i) for i in range(3)])
+		self.assertEqual(len(results), 3)
+		self.assertTrue(all(isinstance(error, WixCircuitOpenError) for response, error in results.values()))
+		self.assertEqual(self.server.state.request_count, sent)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from wix_integration import tasks
+
+class TestHealthCheckNotification(unittest.TestCase):
+	def setUp(self):
+		tasks.release_alert_window("health_check")
+		self.sendmail = patch.object(frappe, "sendmail")
+		self.sendmail.start()
+
+	def tearDown(self):
+		self.sendmail.stop()
+		tasks.release_alert_window("health_check")
+		frappe.db.rollback()
+
+	def get_alerts(self):
+		return frappe.get_all("Notification Log", filters={"subject": "Wix Integration Health Check Failed",
+			"creation": (">=", self.since)}, pluck="for_user")
+
+	def notify(self):
+		self.since = frappe.db.sql("SELECT NOW()")[0][0]
+		tasks.send_health_check_notification("Connection refused")
+
+	def test_each_system_manager_is_alerted_and_emailed_once(self):
+		self.notify()
+
+		managers = frappe.get_all("Has Role", filters={"role": "System Manager", "parenttype": "User"}, pluck="parent")
+		self.assertTrue(set(self.get_alerts()) <= set(managers))
+		self.assertTrue(self.get_alerts())
+		frappe.sendmail.assert_called_once()
+		self.assertIn("Connection refused", frappe.sendmail.call_args.kwargs["message"])
+
+	def test_window_holds_back_a_second_alert(self):
+		self.notify()
+		tasks.send_health_check_notification("Connection refused")
+
+		self.assertEqual(len(self.get_alerts()), len(set(self.get_alerts())))
+		frappe.sendmail.assert_called_once()
+
+	def test_failed_alert_releases_the_window(self):
+		with patch.object(frappe.db, "bulk_insert", side_effect=frappe.QueryDeadlockError):
+			self.notify()
+		frappe.sendmail.assert_not_called()
+
+		self.assertTrue(tasks.claim_alert_window("health_check"))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from wix_integration import id_resolver
+from wix_integration.tests.utils import make_item
+
+class TestIdResolver(unittest.TestCase):
+	def setUp(self):
+		id_resolver.forget_all()
+		self.items = {}
+		for code in ("A", "B", "C"):
+			item = make_item(f"_Test Wix Resolver {code}")
+			frappe.db.set_value("Item", item, "wix_product_id", f"_test-wix-product-{code.lower()}")
+			self.items[f"_test-wix-product-{code.lower()}"] = item
+
+	def tearDown(self):
+		id_resolver.forget_all()
+		frappe.db.rollback()
+
+	def test_ids_are_resolved_in_batches_and_remembered(self):
+		wix_ids = list(self.items) + ["_test-wix-product-unknown"]
+		with patch.object(id_resolver, "RESOLVE_BATCH_SIZE", 2), \
+				patch.object(frappe, "get_all", wraps=frappe.get_all) as get_all:
+			resolved = id_resolver.resolve_ids("Product", wix_ids)
+			self.assertEqual(get_all.call_count, 2)
+
+			# Served from memory, including the id without an Item
+			self.assertEqual(id_resolver.resolve_ids("Product", wix_ids), resolved)
+			self.assertEqual(get_all.call_count, 2)
+
+		self.assertEqual(resolved, dict(self.items, **{"_test-wix-product-unknown": None}))
+
+	def test_ids_match_case_insensitively(self):
+		self.assertEqual(id_resolver.resolve_id("Product", "_TEST-WIX-PRODUCT-A"), self.items["_test-wix-product-a"])
+
+	def test_rolled_back_links_are_forgotten(self):
+		id_resolver.remember("Product", "_test-wix-product-kept", "_Test Wix Resolver A")
+		id_resolver.start_savepoint("wix_test_resolver")
+		id_resolver.remember("Product", "_test-wix-product-new", "_Test Wix Resolver B")
+
+		id_resolver.rollback_savepoint("wix_test_resolver")
+
+		known = id_resolver.get_map("Product")
+		self.assertEqual(known.get("_test-wix-product-kept"), "_Test Wix Resolver A")
+		self.assertNotIn("_test-wix-product-new", known)
+
+	def test_product_id_is_unique_and_not_copied(self):
+		self.assertTrue(frappe.get_meta("Item").get_field("wix_product_id").no_copy)
+
+		item = frappe.get_doc("Item", self.items["_test-wix-product-b"])
+		item.wix_product_id = "_test-wix-product-a"
+		with self.assertRaises(frappe.ValidationError):
+			item.save(ignore_permissions=True)
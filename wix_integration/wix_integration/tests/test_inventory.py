@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from unittest.mock import patch
+
+import frappe
+from frappe.utils import add_to_date
+
+from wix_integration.bulk_sync import bulk_upsert_items
+from wix_integration.inventory import INVENTORY_CHECKPOINT, sync_inventory
+from wix_integration.tests.utils import StubServerTestCase, make_item, wix_settings
+from wix_integration.utils import set_checkpoint
+
+class TestInventorySync(StubServerTestCase):
+	"""Syncs a Bin of a pushed Item; commits are held back so tearDown can roll back"""
+
+	def setUp(self):
+		self.warehouse = frappe.db.get_value("Warehouse", {"is_group": 0}, "name")
+		super(TestInventorySync, self).setUp()
+		self.commit = patch.object(frappe.db, "commit")
+		self.commit.start()
+		frappe.db.delete("Wix Sync Checkpoint", INVENTORY_CHECKPOINT)
+
+		self.item = make_item("_Test Wix Stock Mug", price=10)
+		frappe.db.set_value("Item", self.item, "sync_with_wix", 1, update_modified=False)
+		bulk_upsert_items([self.item])
+		self.bin = frappe.get_doc({
+			"doctype": "Bin",
+			"item_code": self.item,
+			"warehouse": self.warehouse,
+			"actual_qty": 7.6,
+			"reserved_qty": 2
+		}).insert(ignore_permissions=True)
+
+	def tearDown(self):
+		self.commit.stop()
+		super(TestInventorySync, self).tearDown()
+
+	def get_settings_values(self):
+		return dict(super(TestInventorySync, self).get_settings_values(), sync_inventory=True,
+			default_warehouse=self.warehouse, inventory_sync_mode="Quantity", stock_threshold=0)
+
+	def get_inventory_item(self):
+		return next(entry for entry in self.server.state.inventory.values()
+			if entry["product"]["variantSku"] == self.item)
+
+	def test_whole_available_quantity_is_sent(self):
+		summary = sync_inventory()
+
+		self.assertEqual(summary["updated"], 1)
+		inventory_item = self.get_inventory_item()
+		self.assertTrue(inventory_item["trackQuantity"])
+		self.assertEqual(inventory_item["quantity"], 5)
+
+	def test_level_wix_already_has_is_not_sent_again(self):
+		sync_inventory()
+		sent = self.server.state.request_count
+
+		# The settle window reads the Bin again, but nothing changed
+		summary = sync_inventory()
+		self.assertEqual((summary["updated"], summary["unchanged"]), (0, 1))
+		self.assertEqual(self.server.state.request_count - sent, 1)
+
+	def test_each_request_is_logged_with_its_timings(self):
+		sync_inventory()
+
+		log = frappe.get_all("Wix Sync Log", filters={"sync_type": "Inventory Sync", "status": "Success"},
+			fields=["duration", "build_time", "http_time", "db_time"], order_by="creation desc", limit=1)[0]
+		self.assertGreater(log.http_time, 0)
+		self.assertAlmostEqual(log.duration, log.build_time + log.http_time + log.db_time, delta=0.005)
+
+	def test_bin_committed_behind_the_checkpoint_is_picked_up(self):
+		set_checkpoint(INVENTORY_CHECKPOINT, watermark=str(add_to_date(self.bin.modified, minutes=5)), last_id="")
+		self.assertEqual(sync_inventory()["updated"], 1)
+
+	def test_stock_status_mode(self):
+		self.settings.stop()
+		self.settings = wix_settings(**dict(self.get_settings_values(), inventory_sync_mode="Stock Status",
+			stock_threshold=10))
+		self.settings.start()
+
+		# 5.6 available is below the threshold of 10
+		self.assertEqual(sync_inventory()["updated"], 1)
+		inventory_item = self.get_inventory_item()
+		self.assertFalse(inventory_item["inStock"])
+		self.assertFalse(inventory_item["trackQuantity"])
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import hashlib
+import os
+
+import frappe
+
+from wix_integration import media
+from wix_integration.api import build_product_payload
+from wix_integration.tests.utils import StubServerTestCase, make_item
+
+class TestMediaUpload(StubServerTestCase):
+	"""Uploads images from the site's public files to the stub"""
+
+	def setUp(self):
+		super(TestMediaUpload, self).setUp()
+		self.files = []
+		self.content = frappe.generate_hash(length=32).encode("ascii")
+
+	def tearDown(self):
+		for path in self.files:
+			os.remove(path)
+		super(TestMediaUpload, self).tearDown()
+
+	def write_image(self, content):
+		file_name = f"_test_wix_{frappe.generate_hash(length=8)}.png"
+		path = frappe.get_site_path("public", "files", file_name)
+		with open(path, "wb") as image:
+			image.write(content)
+		self.files.append(path)
+		return f"/files/{file_name}", path
+
+	def test_file_hash_follows_its_content(self):
+		file_url, path = self.write_image(self.content)
+		self.assertEqual(media.hash_file(path), hashlib.sha256(self.content).hexdigest())
+
+		with open(path, "ab") as image:
+			image.write(b"more")
+		# A new size makes a new cache key
+		self.assertEqual(media.hash_file(path), hashlib.sha256(self.content + b"more").hexdigest())
+
+	def test_same_content_is_uploaded_once(self):
+		first_url, first_path = self.write_image(self.content)
+		copy_url, copy_path = self.write_image(self.content)
+		first = make_item("_Test Wix Media Mug", image=first_url)
+		copy = make_item("_Test Wix Media Cup", image=copy_url)
+
+		media_ids = media.upload_item_images([first, copy])
+		self.assertEqual(len(media_ids), 1)
+		self.assertEqual(len(self.server.state.media), 1)
+
+		# Known content is not sent again
+		sent = self.server.state.request_count
+		self.assertEqual(media.upload_item_images([first, copy]), media_ids)
+		self.assertEqual(self.server.state.request_count, sent)
+
+		media_id = media_ids[media.hash_file(first_path)]
+		payload = build_product_payload(frappe.get_doc("Item", copy))
+		self.assertEqual(payload["media"], {"itemsInfo": {"items": [{"id": media_id}]}})
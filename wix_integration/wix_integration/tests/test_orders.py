@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from unittest.mock import patch
+
+import frappe
+
+from wix_integration import orders
+from wix_integration.id_resolver import forget_all
+from wix_integration.orders import ORDERS_CHECKPOINT, import_orders, upsert_sales_order
+from wix_integration.retry_queue import RETRY_DOCTYPE
+from wix_integration.tests.utils import StubServerTestCase, make_item
+from wix_integration.utils import get_checkpoint
+
+def make_order(order_id, updated, sku, quantity=1, amount="15.00", email=None):
+	"""A Wix eCommerce order with a single line"""
+	return {
+		"id": order_id,
+		"number": order_id[-6:],
+		"status": "APPROVED",
+		"createdDate": f"{updated[:10]}T08:00:00Z",
+		"updatedDate": updated,
+		"buyerInfo": {"email": email},
+		"lineItems": [{
+			"quantity": quantity,
+			"price": {"amount": amount},
+			"physicalProperties": {"sku": sku},
+			"catalogReference": {"catalogItemId": None}
+		}]
+	}
+
+class OrderImportTestCase(StubServerTestCase):
+	"""Imports orders seeded in the stub server; commits are held back so tearDown can roll back"""
+
+	def setUp(self):
+		super(OrderImportTestCase, self).setUp()
+		self.commit = patch.object(frappe.db, "commit")
+		self.commit.start()
+		self.server.state.orders.clear()
+		frappe.db.delete("Wix Sync Checkpoint", ORDERS_CHECKPOINT)
+		forget_all()
+		self.item = make_item("_Test Wix Order Mug", price=15, is_stock_item=0)
+
+	def tearDown(self):
+		self.commit.stop()
+		super(OrderImportTestCase, self).tearDown()
+		forget_all()
+
+	def get_settings_values(self):
+		return dict(super(OrderImportTestCase, self).get_settings_values(), sync_orders=True, sync_customers=False)
+
+	def seed(self, *orders):
+		for order in orders:
+			self.server.state.orders[order["id"]] = order
+
+	def new_order_id(self):
+		return f"_test_wix_order_{frappe.generate_hash(length=10)}"
+
+	def get_sales_order(self, order_id):
+		return frappe.db.get_value("Sales Order", {"wix_order_id": order_id}, ["name", "grand_total"], as_dict=True)
+
+class TestOrderImport(OrderImportTestCase):
+	def test_import_advances_the_checkpoint(self):
+		first, second = self.new_order_id(), self.new_order_id()
+		self.seed(make_order(first, "2030-01-01T10:00:00Z", self.item),
+			make_order(second, "2030-01-02T10:00:00Z", self.item, quantity=2))
+
+		summary = import_orders()
+
+		self.assertEqual(summary["created"], 2)
+		self.assertEqual(self.get_sales_order(second).grand_total, 30)
+		self.assertEqual(get_checkpoint(ORDERS_CHECKPOINT).watermark, "2030-01-02T10:00:00Z")
+
+	def test_boundary_order_is_upserted_idempotently(self):
+		order_id = self.new_order_id()
+		self.seed(make_order(order_id, "2030-01-01T10:00:00Z", self.item))
+		import_orders()
+
+		# The watermark is inclusive, so the last order comes back unchanged
+		summary = import_orders()
+		self.assertEqual((summary["created"], summary["unchanged"]), (0, 1))
+
+		self.seed(make_order(order_id, "2030-01-01T11:00:00Z", self.item, quantity=3))
+		self.assertEqual(import_orders()["updated"], 1)
+		self.assertEqual(frappe.db.count("Sales Order", {"wix_order_id": order_id}), 1)
+
+	def test_pages_follow_the_cursor(self):
+		self.seed(*[make_order(self.new_order_id(), f"2030-01-0{day}T10:00:00Z", self.item) for day in (1, 2, 3)])
+
+		summary = import_orders(page_size=1)
+		self.assertEqual((summary["pages"], summary["created"]), (3, 3))
+
+	def test_failed_order_is_scheduled_for_retry(self):
+		good, bad = self.new_order_id(), self.new_order_id()
+		self.seed(make_order(bad, "2030-01-01T10:00:00Z", self.item),
+			make_order(good, "2030-01-02T10:00:00Z", self.item))
+
+		def upsert(order, settings):
+			if order["id"] == bad:
+				raise frappe.QueryDeadlockError("Deadlock found")
+			return upsert_sales_order(order, settings)
+
+		with patch.object(orders, "upsert_sales_order", upsert):
+			summary = import_orders()
+
+		self.assertEqual((summary["created"], summary["failed"]), (1, 1))
+		self.assertIsNone(self.get_sales_order(bad))
+		self.assertEqual(self.get_retry_status(bad), "Queued")
+		# The import moves on; the retry queue owns the failed order now
+		self.assertEqual(get_checkpoint(ORDERS_CHECKPOINT).watermark, "2030-01-02T10:00:00Z")
+		self.assertFalse(self.get_error_logs(bad))
+
+	def test_dead_lettered_order_is_surfaced(self):
+		order_id = self.new_order_id()
+		self.seed(make_order(order_id, "2030-01-01T10:00:00Z", "_Test Wix Unknown SKU"))
+
+		import_orders()
+
+		# A missing Item is not worth retrying; the order lands in the Error Log instead
+		self.assertEqual(self.get_retry_status(order_id), "Dead Letter")
+		self.assertTrue(self.get_error_logs(order_id))
+
+	def get_retry_status(self, order_id):
+		return frappe.db.get_value(RETRY_DOCTYPE, {"entity_type": "Order", "entity_id": order_id}, "status")
+
+	def get_error_logs(self, order_id):
+		return frappe.get_all("Error Log", filters={"method": ("like", f"%{order_id}%")})
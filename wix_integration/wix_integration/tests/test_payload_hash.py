@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+
+import frappe
+
+from wix_integration.api import get_payload_hash, is_unchanged, push_item_to_wix
+from wix_integration.tests.utils import StubServerTestCase, make_item, make_item_price
+
+class TestPayloadHash(unittest.TestCase):
+	def test_bookkeeping_fields_are_ignored(self):
+		payload = {"name": "Mug", "variantsInfo": {"variants": [{"sku": "MUG"}]}}
+		self.assertEqual(get_payload_hash(payload), get_payload_hash(dict(payload, id="abc", revision="7")))
+		self.assertNotEqual(get_payload_hash(payload), get_payload_hash(dict(payload, name="Cup")))
+
+	def test_key_order_does_not_matter(self):
+		self.assertEqual(get_payload_hash({"a": 1, "b": 2}), get_payload_hash({"b": 2, "a": 1}))
+
+	def test_unpushed_item_is_never_unchanged(self):
+		payload_hash = get_payload_hash({"name": "Mug"})
+		self.assertFalse(is_unchanged(frappe._dict(wix_payload_hash=payload_hash), payload_hash))
+		self.assertTrue(is_unchanged(frappe._dict(wix_product_id="abc", wix_payload_hash=payload_hash), payload_hash))
+
+class TestSkipUnchanged(StubServerTestCase):
+	def setUp(self):
+		super(TestSkipUnchanged, self).setUp()
+		self.item = make_item("_Test Wix Delta Mug", price=10)
+		push_item_to_wix(self.item)
+
+	def test_unchanged_item_is_not_sent(self):
+		sent = self.server.state.request_count
+		result = push_item_to_wix(self.item)
+
+		self.assertTrue(result.get("skipped"))
+		self.assertEqual(self.server.state.request_count, sent)
+		self.assertEqual(frappe.db.get_value("Item", self.item, "wix_sync_status"), "Synced")
+
+	def test_forced_push_is_sent(self):
+		sent = self.server.state.request_count
+		self.assertFalse(push_item_to_wix(self.item, force=True).get("skipped"))
+		self.assertGreater(self.server.state.request_count, sent)
+
+	def test_price_change_is_sent(self):
+		frappe.db.delete("Item Price", {"item_code": self.item})
+		make_item_price(self.item, 12)
+
+		result = push_item_to_wix(self.item)
+		self.assertFalse(result.get("skipped"))
+		product = self.server.state.products[result["wix_product_id"]]
+		self.assertEqual(product["variantsInfo"]["variants"][0]["price"]["actualPrice"]["amount"], "12.00")
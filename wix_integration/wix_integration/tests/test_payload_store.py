@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import json
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from wix_integration.payload_store import (
+	COMPRESSED_PREFIX,
+	SUCCESS_BODY_LIMIT,
+	decode_payload,
+	encode_payload
+)
+
+class TestPayloadStore(unittest.TestCase):
+	def test_small_body_is_compact_json(self):
+		self.assertEqual(encode_payload({"a": 1, "b": [1, 2]}), '{"a":1,"b":[1,2]}')
+
+	def test_large_body_round_trips_compressed(self):
+		data = {"products": [{"id": str(i), "name": f"Product {i}"} for i in range(200)]}
+		stored = encode_payload(data)
+
+		self.assertTrue(stored.startswith(COMPRESSED_PREFIX))
+		self.assertLess(len(stored), len(json.dumps(data)))
+		self.assertEqual(json.loads(decode_payload(stored)), data)
+
+	def test_success_body_is_truncated_unless_sampled(self):
+		body = "x" * (SUCCESS_BODY_LIMIT * 2)
+		with patch.dict(frappe.conf, {"wix_log_sample_rate": 0}):
+			stored = json.loads(decode_payload(encode_payload(body, keep_full=False)))
+
+		self.assertTrue(stored["_truncated"])
+		self.assertEqual(stored["_size"], len(body))
+		self.assertEqual(stored["preview"], body[:SUCCESS_BODY_LIMIT])
+
+	def test_failure_body_is_kept_in_full(self):
+		body = "x" * (SUCCESS_BODY_LIMIT * 2)
+		self.assertEqual(decode_payload(encode_payload(body)), body)
+
+	def test_empty_and_uncompressed_values(self):
+		self.assertIsNone(encode_payload(None))
+		self.assertEqual(decode_payload(""), "")
+		# Rows written before compression existed are plain JSON
+		self.assertEqual(decode_payload('{"a":1}'), '{"a":1}')
+		self.assertEqual(decode_payload('{"a":1}', pretty=True), '{\n  "a": 1\n}')
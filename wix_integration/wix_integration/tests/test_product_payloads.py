@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+
+import frappe
+
+from wix_integration.api import build_product_payload, build_product_payloads
+from wix_integration.tests.utils import make_item, make_item_price
+
+TEST_ATTRIBUTE = "_Test Wix Size"
+
+class TestProductPayloads(unittest.TestCase):
+	"""The batched builder must produce exactly what the per-Item builder does"""
+
+	def setUp(self):
+		make_attribute()
+
+		self.standalone = make_item("_Test Wix Mug", price=12.5)
+		self.template = make_item("_Test Wix Tee", has_variants=1, attributes=[{"attribute": TEST_ATTRIBUTE}])
+		self.variants = [make_variant(self.template, size, price)
+			for size, price in (("S", 20), ("M", 22.5))]
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def assert_same_payload(self, item_name):
+		batched = build_product_payloads([item_name])
+		self.assertEqual(batched[item_name][1], build_product_payload(frappe.get_doc("Item", item_name)))
+
+	def test_standalone_item(self):
+		self.assert_same_payload(self.standalone)
+
+	def test_template_with_variants(self):
+		self.assert_same_payload(self.template)
+		payload = build_product_payloads([self.template])[self.template][1]
+		self.assertEqual([v["sku"] for v in payload["variantsInfo"]["variants"]], sorted(self.variants))
+		self.assertEqual(payload["options"][0]["name"], TEST_ATTRIBUTE)
+
+	def test_many_items_at_once(self):
+		batched = build_product_payloads([self.standalone, self.template, "_Test Wix Missing Item"])
+		self.assertEqual(set(batched), {self.standalone, self.template})
+		for item_name, (item, payload) in batched.items():
+			self.assertEqual(payload, build_product_payload(frappe.get_doc("Item", item_name)))
+
+def make_attribute():
+	if not frappe.db.exists("Item Attribute", TEST_ATTRIBUTE):
+		frappe.get_doc({
+			"doctype": "Item Attribute",
+			"attribute_name": TEST_ATTRIBUTE,
+			"item_attribute_values": [
+				{"attribute_value": "S", "abbr": "S"},
+				{"attribute_value": "M", "abbr": "M"}
+			]
+		}).insert(ignore_permissions=True)
+
+def make_variant(template, size, price):
+	from erpnext.controllers.item_variant import create_variant
+
+	variant = create_variant(template, {TEST_ATTRIBUTE: size})
+	variant.sync_with_wix = 0
+	variant.insert(ignore_permissions=True)
+	make_item_price(variant.name, price)
+	return variant.name
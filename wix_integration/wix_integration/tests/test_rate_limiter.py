@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import time
+import unittest
+from email.utils import formatdate
+from unittest.mock import patch
+
+import frappe
+
+from wix_integration import rate_limiter
+from wix_integration.api import PRODUCTS_ENDPOINT, make_wix_request
+from wix_integration.tests.utils import StubServerTestCase, clear_site_state, make_test_site_id
+
+class TestParseRetryAfter(unittest.TestCase):
+	def test_delta_seconds(self):
+		self.assertEqual(rate_limiter.parse_retry_after("5"), 5.0)
+		self.assertEqual(rate_limiter.parse_retry_after("-3"), 0)
+
+	def test_http_date(self):
+		value = formatdate(time.time() + 30, usegmt=True)
+		self.assertAlmostEqual(rate_limiter.parse_retry_after(value), 30, delta=2)
+		self.assertEqual(rate_limiter.parse_retry_after(formatdate(time.time() - 30, usegmt=True)), 0)
+
+	def test_missing_or_invalid(self):
+		self.assertIsNone(rate_limiter.parse_retry_after(None))
+		self.assertIsNone(rate_limiter.parse_retry_after(""))
+		self.assertIsNone(rate_limiter.parse_retry_after("soon"))
+
+class TestTokenBucket(unittest.TestCase):
+	def setUp(self):
+		self.site = make_test_site_id()
+		self.conf = patch.dict(frappe.conf, {"wix_rate_limit": 1, "wix_rate_burst": 3, "wix_rate_min": 0.2})
+		self.conf.start()
+
+	def tearDown(self):
+		clear_site_state(self.site)
+		self.conf.stop()
+
+	def test_burst_then_wait(self):
+		for _ in range(3):
+			rate_limiter.acquire(self.site, timeout=0)
+
+		# The bucket is empty and refills at one token per second
+		with self.assertRaises(rate_limiter.RateLimitTimeout):
+			rate_limiter.acquire(self.site, timeout=0)
+
+		started = time.monotonic()
+		rate_limiter.acquire(self.site, timeout=5)
+		self.assertGreater(time.monotonic() - started, 0.5)
+
+	def test_throttle_halves_the_rate_and_blocks(self):
+		rate_limiter.report_throttle(self.site, retry_after=5)
+		status = rate_limiter.get_status(self.site)
+
+		self.assertAlmostEqual(status["refill_rate"], 0.5, delta=0.01)
+		self.assertGreater(status["blocked_for"], 4)
+		with self.assertRaises(rate_limiter.RateLimitTimeout):
+			rate_limiter.acquire(self.site, timeout=1)
+
+	def test_throttled_rate_has_a_floor(self):
+		for _ in range(6):
+			rate_limiter.report_throttle(self.site, retry_after=0.01)
+		self.assertAlmostEqual(rate_limiter.get_status(self.site)["refill_rate"], 0.2, delta=0.01)
+
+class TestThrottledRequests(StubServerTestCase):
+	def test_throttled_call_is_retried_and_slows_every_worker(self):
+		self.server.state.throttle_every = 2
+		for _ in range(3):
+			self.assertIn("products", make_wix_request("GET", PRODUCTS_ENDPOINT, params={"limit": 1}))
+
+		# Each 429 halved the refill rate shared through Redis
+		self.assertLess(rate_limiter.get_status(self.site)["refill_rate"], 100)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from unittest.mock import patch
+
+import frappe
+
+from wix_integration import reconcile
+from wix_integration.api import push_item_to_wix
+from wix_integration.tests.utils import StubServerTestCase, make_item
+
+class TestCatalogReconciliation(StubServerTestCase):
+	"""Reconciles pushed Items with the stub catalog; commits are held back so tearDown can roll back"""
+
+	def setUp(self):
+		super(TestCatalogReconciliation, self).setUp()
+		self.commit = patch.object(frappe.db, "commit")
+		self.commit.start()
+		self.server.state.products.clear()
+		self.server.state.inventory.clear()
+
+	def tearDown(self):
+		self.commit.stop()
+		frappe.cache().execute_command("DEL", reconcile.get_index_key(), reconcile.get_summary_key(),
+			reconcile.get_orphans_key(), *[f"{reconcile.get_summary_key()}|{key}" for key in reconcile.DRIFT_KINDS])
+		super(TestCatalogReconciliation, self).tearDown()
+
+	def push(self, item_code, **values):
+		item = make_item(item_code, price=10, **values)
+		return push_item_to_wix(item)["wix_product_id"]
+
+	def test_edits_in_wix_are_changed_and_deleted_products_missing(self):
+		edited = self.push("_Test Wix Reconcile Edited")
+		deleted = self.push("_Test Wix Reconcile Deleted")
+		self.push("_Test Wix Reconcile Untouched")
+		self.server.state.products[edited]["name"] = "Edited in Wix"
+		del self.server.state.products[deleted]
+
+		summary = reconcile.reconcile_catalog(restart=True)
+
+		self.assertEqual(summary["changed_sample"], ["_Test Wix Reconcile Edited"])
+		self.assertEqual(summary["missing_sample"], ["_Test Wix Reconcile Deleted"])
+		self.assertEqual(summary["orphaned"], 0)
+
+	def test_remote_image_is_not_drift(self):
+		# Wix keeps its own media for the URL, so the pushed media never comes back
+		self.push("_Test Wix Reconcile Remote Image", image="https://example.com/files/mug.png")
+
+		summary = reconcile.reconcile_catalog(restart=True)
+		self.assertEqual((summary["changed"], summary["missing"]), (0, 0))
+
+	def test_orphan_scanned_twice_is_counted_once(self):
+		self.push("_Test Wix Reconcile Linked")
+		orphan, error = self.server.state.create({"name": "Only in Wix", "variantsInfo": {"variants": [{"sku": "X"}]}})
+
+		reconcile.reconcile_catalog(restart=True)
+		# HSCAN may return the same ids again
+		reconcile.find_orphans()
+
+		summary = reconcile.get_summary()
+		self.assertEqual((summary["orphaned"], summary["orphaned_sample"]), (1, [orphan["id"]]))
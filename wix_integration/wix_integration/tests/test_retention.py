@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import gzip
+import json
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+import frappe
+from frappe.utils import add_days, now_datetime, nowdate
+
+from wix_integration import retention
+from wix_integration.tests.utils import wix_settings
+from wix_integration.utils import log_integration, log_sync
+
+TEST_OPERATION = "_Test Wix Retention"
+
+class TestLogRetention(unittest.TestCase):
+	"""Purges commit per batch; commits are held back so tearDown can roll back"""
+
+	def setUp(self):
+		self.commit = patch.object(frappe.db, "commit")
+		self.commit.start()
+		self.settings = wix_settings(log_retention_days=30, failed_log_retention_days=90, archive_purged_logs=False)
+		self.settings.start()
+
+	def tearDown(self):
+		self.settings.stop()
+		self.commit.stop()
+		frappe.db.rollback()
+
+	def make_logs(self, status, days_ago, count=1):
+		"""Sync and integration log rows dated `days_ago`, named by their reference"""
+		names = []
+		for _ in range(count):
+			reference = f"{TEST_OPERATION} {frappe.generate_hash(length=8)}"
+			log_sync("Product Sync", status, "Item", reference)
+			log_integration(TEST_OPERATION, status, reference_doctype="Item", reference_name=reference)
+			names.append(reference)
+
+		date = add_days(now_datetime(), -days_ago)
+		frappe.db.sql("UPDATE `tabWix Sync Log` SET sync_date = %s WHERE reference_name IN %s", (date, names))
+		frappe.db.sql("UPDATE `tabWix Integration Log` SET creation = %s WHERE reference_name IN %s", (date, names))
+		return names
+
+	def kept(self, doctype, references):
+		return set(frappe.get_all(doctype, filters={"reference_name": ("in", references)}, pluck="reference_name"))
+
+	def test_each_status_has_its_retention(self):
+		fresh = self.make_logs("Success", 1)
+		expired = self.make_logs("Success", 40)
+		failed = self.make_logs("Failed", 40)
+		expired_failed = self.make_logs("Failed", 100)
+
+		summary = retention.purge_logs(archive=False)
+
+		self.assertTrue(summary["complete"])
+		for doctype in ("Wix Sync Log", "Wix Integration Log"):
+			self.assertEqual(self.kept(doctype, fresh + expired + failed + expired_failed), set(fresh + failed))
+
+	def test_batches_page_through_every_expired_row(self):
+		expired = self.make_logs("Success", 40, count=5)
+		failed = self.make_logs("Failed", 40, count=2)
+
+		retention.purge_logs(archive=False, batch_size=2)
+
+		self.assertEqual(self.kept("Wix Sync Log", expired + failed), set(failed))
+
+	def test_every_doctype_gets_its_own_budget(self):
+		expired = self.make_logs("Success", 40)
+		get_expired_rows = retention.get_expired_rows
+
+		def slow_integration_log(doctype, *args):
+			if doctype == "Wix Integration Log":
+				# A backlog that uses up the whole budget
+				time.sleep(0.2)
+			return get_expired_rows(doctype, *args)
+
+		with patch.object(retention, "get_expired_rows", slow_integration_log):
+			summary = retention.purge_logs(archive=False, time_budget=0.1)
+
+		self.assertFalse(summary["complete"])
+		self.assertFalse(self.kept("Wix Sync Log", expired))
+
+	def test_purged_rows_are_archived(self):
+		expired = self.make_logs("Failed", 100)
+		retention.purge_logs(archive=True)
+
+		path = frappe.get_site_path("private", retention.ARCHIVE_FOLDER, f"wix_sync_log-{nowdate()}.jsonl.gz")
+		self.assertTrue(os.path.exists(path))
+		with gzip.open(path, "rt", encoding="utf-8") as archive:
+			archived = [json.loads(line) for line in archive]
+		self.assertIn(expired[0], {row.get("reference_name") for row in archived})
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+
+import frappe
+
+from wix_integration.api import WixAPIError, WixCircuitOpenError
+from wix_integration.retry_queue import (
+	DEFAULT_MAX_RETRY_ATTEMPTS,
+	RETRY_BASE_DELAY,
+	RETRY_DOCTYPE,
+	RETRY_MAX_DELAY,
+	classify_error,
+	get_backoff,
+	get_max_retry_attempts,
+	schedule_retry
+)
+
+class TestClassifyError(unittest.TestCase):
+	def test_per_item_wix_errors(self):
+		self.assertEqual(classify_error({"code": "UNAVAILABLE", "description": "Try later"}), (True, "Try later"))
+		self.assertEqual(classify_error({"code": "INVALID_ARGUMENT"}), (False, "INVALID_ARGUMENT"))
+		# No code at all: nothing says the item itself is wrong
+		self.assertTrue(classify_error({})[0])
+
+	def test_api_errors_by_status(self):
+		self.assertTrue(classify_error(WixAPIError("Failed to connect"))[0])
+		self.assertTrue(classify_error(WixAPIError("Unavailable", status_code=503))[0])
+		self.assertTrue(classify_error(WixAPIError("Too many requests", status_code=429))[0])
+		self.assertEqual(classify_error(WixAPIError("Bad request", status_code=400)), (False, "Bad request"))
+
+	def test_local_errors(self):
+		self.assertTrue(classify_error(frappe.QueryDeadlockError("deadlock"))[0])
+		self.assertFalse(classify_error(ValueError("bad data"))[0])
+
+class TestBackoff(unittest.TestCase):
+	def test_exponential_with_equal_jitter(self):
+		for attempts in range(1, 15):
+			delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+			for _ in range(20):
+				backoff = get_backoff(attempts)
+				self.assertGreaterEqual(backoff, delay / 2)
+				self.assertLessEqual(backoff, delay)
+
+class TestMaxRetryAttempts(unittest.TestCase):
+	def test_default_only_when_never_set(self):
+		self.assertEqual(get_max_retry_attempts(frappe._dict()), DEFAULT_MAX_RETRY_ATTEMPTS)
+		self.assertEqual(get_max_retry_attempts(frappe._dict(max_retry_attempts="")), DEFAULT_MAX_RETRY_ATTEMPTS)
+		self.assertEqual(get_max_retry_attempts(frappe._dict(max_retry_attempts=0)), 0)
+		self.assertEqual(get_max_retry_attempts(frappe._dict(max_retry_attempts=5)), 5)
+
+class TestScheduleRetry(unittest.TestCase):
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_open_circuit_uses_no_attempt(self):
+		status = schedule_retry("Product", "_Test Wix Circuit Item", WixCircuitOpenError("circuit open"),
+			frappe._dict(max_retry_attempts=0))
+
+		self.assertEqual(status, "Queued")
+		self.assertFalse(frappe.db.exists(RETRY_DOCTYPE, {"entity_id": "_Test Wix Circuit Item"}))
+
+	def test_permanent_error_is_dead_lettered(self):
+		status = schedule_retry("Product", "_Test Wix Bad Item", {"code": "INVALID_ARGUMENT"},
+			frappe._dict(max_retry_attempts=3))
+		self.assertEqual(status, "Dead Letter")
+
+	def test_no_retries_when_set_to_zero(self):
+		status = schedule_retry("Product", "_Test Wix Flaky Item", {"code": "UNAVAILABLE"},
+			frappe._dict(max_retry_attempts=0))
+		self.assertEqual(status, "Dead Letter")
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import json
+import time
+import unittest
+from unittest.mock import patch
+
+import frappe
+from frappe.utils import now_datetime, today
+
+from wix_integration import rollup
+from wix_integration.rollup import LATENCY_BUCKETS, get_percentile
+from wix_integration.utils import SyncTimer, log_sync, set_checkpoint
+
+def histogram(**counts):
+	"""Bucket counts by bucket index, e.g. histogram(b0=4, b1=4)"""
+	buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+	for key, count in counts.items():
+		buckets[int(key[1:])] = count
+	return buckets
+
+class TestPercentile(unittest.TestCase):
+	def test_empty_histogram(self):
+		self.assertEqual(get_percentile([], 0.5), 0)
+		self.assertEqual(get_percentile(histogram(), 0.95), 0)
+
+	def test_interpolates_inside_the_bucket(self):
+		# Ten calls between 0 and 0.1s: the median is half way through
+		self.assertAlmostEqual(get_percentile(histogram(b0=10), 0.5), 0.05)
+
+	def test_crosses_buckets(self):
+		buckets = histogram(b0=4, b1=4)
+		self.assertAlmostEqual(get_percentile(buckets, 0.5), 0.1)
+		# Rank 6 is the second of four calls between 0.1 and 0.25s
+		self.assertAlmostEqual(get_percentile(buckets, 0.75), 0.175)
+
+	def test_open_bucket_is_bounded_by_the_slowest_call(self):
+		buckets = histogram(**{f"b{len(LATENCY_BUCKETS)}": 2})
+		self.assertAlmostEqual(get_percentile(buckets, 1, max_duration=100), 100)
+		self.assertAlmostEqual(get_percentile(buckets, 0.5, max_duration=100), 80)
+
+	def test_never_above_the_slowest_call(self):
+		buckets = histogram(b8=1)
+		self.assertEqual(get_percentile(buckets, 0.99, max_duration=40), 40)
+
+class TestSyncTimer(unittest.TestCase):
+	def test_stages_add_up_to_the_duration(self):
+		timer = SyncTimer()
+		with timer.stage("http"):
+			time.sleep(0.02)
+		with timer.stage("http"):
+			time.sleep(0.02)
+		timer.add("build", 0.5)
+
+		self.assertGreaterEqual(timer.stages["http"], 0.04)
+		self.assertAlmostEqual(timer.duration, timer.stages["http"] + 0.5)
+
+	def test_failed_stage_is_still_timed(self):
+		timer = SyncTimer()
+		with self.assertRaises(ValueError):
+			with timer.stage("db"):
+				raise ValueError("write failed")
+		self.assertIn("db", timer.stages)
+
+class TestDailyRollup(unittest.TestCase):
+	"""Rollups commit per day; commits are held back so tearDown can roll back"""
+
+	def setUp(self):
+		self.commit = patch.object(frappe.db, "commit")
+		self.commit.start()
+
+	def tearDown(self):
+		self.commit.stop()
+		frappe.db.rollback()
+
+	def get_today(self):
+		"""Count and histogram of today's successful inventory syncs in the rollup"""
+		row = frappe.db.get_value(rollup.ROLLUP_DOCTYPE,
+			{"rollup_date": today(), "sync_type": "Inventory Sync", "status": "Success"},
+			["sync_count", "latency_histogram"], as_dict=True)
+		if not row:
+			return 0, histogram()
+		return row.sync_count, json.loads(row.latency_histogram)
+
+	def test_day_is_rebuilt_from_its_logs(self):
+		rollup.rebuild_day(today(), now_datetime())
+		count, buckets = self.get_today()
+
+		for duration in (0.05, 0.2, 100):
+			log_sync("Inventory Sync", "Success", duration=duration)
+		rollup.rebuild_day(today(), now_datetime())
+
+		new_count, new_buckets = self.get_today()
+		self.assertEqual(new_count - count, 3)
+		self.assertEqual([b - a for a, b in zip(buckets, new_buckets)],
+			histogram(b0=1, b1=1, **{f"b{len(LATENCY_BUCKETS)}": 1}))
+
+	def test_refresh_resumes_at_the_watermark(self):
+		watermark = now_datetime()
+		set_checkpoint(rollup.ROLLUP_CHECKPOINT, watermark=str(watermark))
+		log_sync("Inventory Sync", "Success", duration=0.05)
+		count, buckets = self.get_today()
+
+		# Today, and yesterday within the settle time after midnight; not every day since the first log
+		self.assertLessEqual(rollup.refresh_daily_rollup(), 2)
+		self.assertEqual(self.get_today()[0], count + 1)
+		self.assertGreaterEqual(rollup.get_rollup_watermark(), watermark)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from unittest.mock import patch
+
+import frappe
+
+from wix_integration.tasks import PUSH_LOCK, sync_pending_products
+from wix_integration.tests.utils import StubServerTestCase, make_item
+from wix_integration.utils import job_lock
+
+class TestPendingSyncQueue(StubServerTestCase):
+	"""Item saves queue a flush instead of calling Wix; commits are held back so tearDown can roll back"""
+
+	def setUp(self):
+		super(TestPendingSyncQueue, self).setUp()
+		self.commit = patch.object(frappe.db, "commit")
+		self.commit.start()
+		self.enqueue = patch.object(frappe, "enqueue")
+		self.enqueue.start()
+		frappe.flags.wix_sync_enqueued = False
+
+		self.item = make_item("_Test Wix Queued Mug", price=10)
+
+	def tearDown(self):
+		self.enqueue.stop()
+		self.commit.stop()
+		super(TestPendingSyncQueue, self).tearDown()
+		frappe.flags.wix_sync_enqueued = False
+
+	def save_synced(self):
+		item = frappe.get_doc("Item", self.item)
+		item.sync_with_wix = 1
+		item.save(ignore_permissions=True)
+
+	def test_saves_are_queued_for_one_flush(self):
+		sent = self.server.state.request_count
+		self.save_synced()
+		self.save_synced()
+
+		self.assertEqual(frappe.db.get_value("Item", self.item, "wix_sync_status"), "Pending")
+		self.assertEqual(frappe.enqueue.call_count, 1)
+		self.assertEqual(self.server.state.request_count, sent)
+
+	def test_next_transaction_queues_its_own_flush(self):
+		self.save_synced()
+		frappe.db.rollback()
+
+		self.item = make_item("_Test Wix Queued Cup", price=10)
+		self.save_synced()
+		self.assertEqual(frappe.enqueue.call_count, 2)
+
+	def test_flush_pushes_pending_items(self):
+		self.save_synced()
+		sync_pending_products()
+
+		item = frappe.db.get_value("Item", self.item, ["wix_sync_status", "wix_product_id"], as_dict=True)
+		self.assertEqual(item.wix_sync_status, "Synced")
+		self.assertIn(item.wix_product_id, self.server.state.products)
+
+	def test_one_flush_at_a_time(self):
+		self.save_synced()
+		with job_lock(PUSH_LOCK, 10) as acquired:
+			self.assertTrue(acquired)
+			sync_pending_products()
+		self.assertEqual(frappe.db.get_value("Item", self.item, "wix_sync_status"), "Pending")
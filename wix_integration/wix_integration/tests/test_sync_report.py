@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import json
+import unittest
+from unittest.mock import patch
+
+import frappe
+from frappe.utils import add_days, today
+
+from wix_integration.tasks import generate_sync_report
+from wix_integration.utils import log_integration
+
+TEST_OPERATION = "_Test Wix Report Operation"
+
+class TestWeeklySyncReport(unittest.TestCase):
+	def setUp(self):
+		self.commit = patch.object(frappe.db, "commit")
+		self.commit.start()
+
+	def tearDown(self):
+		self.commit.stop()
+		frappe.db.rollback()
+
+	def log(self, status, days_ago):
+		log_integration(TEST_OPERATION, status)
+		frappe.db.sql("""
+			UPDATE `tabWix Integration Log` SET creation = %s
+			WHERE operation = %s AND creation >= %s
+		""", (add_days(today(), -days_ago), TEST_OPERATION, today()))
+
+	def test_counts_the_last_seven_full_days(self):
+		self.log("Success", 1)
+		self.log("Success", 3)
+		self.log("Failed", 7)
+		# Outside the period: today, and before the week
+		self.log("Failed", 0)
+		self.log("Failed", 8)
+
+		generate_sync_report()
+
+		report = frappe.get_doc("Wix Sync Report", today())
+		operations = {row["operation"]: row for row in json.loads(report.operations_breakdown)}
+		self.assertEqual(operations[TEST_OPERATION], {"operation": TEST_OPERATION, "count": 3, "successful": 2, "failed": 1})
+
+	def test_breakdown_is_compact_json(self):
+		self.log("Success", 1)
+		generate_sync_report()
+
+		breakdown = frappe.db.get_value("Wix Sync Report", today(), "operations_breakdown")
+		self.assertEqual(breakdown, json.dumps(json.loads(breakdown), separators=(",", ":")))
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import json
+import unittest
+from unittest.mock import patch
+
+import frappe
+from frappe.utils import now_datetime
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from wix_integration import webhooks
+from wix_integration.tests.utils import wix_settings
+from wix_integration.utils import job_lock
+
+TEST_ENTITY_TYPE = "_test.wix.entity"
+
+def make_key_pair():
+	key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+	public_key = key.public_key().public_bytes(
+		serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+	).decode("ascii")
+	return key, public_key
+
+def sign_event(key, event_id, entity_id, event_type="wix.test.updated"):
+	"""A webhook body as Wix sends it: a JWT whose data claim wraps the event"""
+	data = {"id": event_id, "entityFqdn": TEST_ENTITY_TYPE, "entityId": entity_id, "slug": "updated"}
+	return jwt.encode({"data": json.dumps({"eventType": event_type, "data": json.dumps(data)})}, key, algorithm="RS256")
+
+class TestDecodeEvent(unittest.TestCase):
+	def test_signed_event_is_decoded(self):
+		key, public_key = make_key_pair()
+		event = webhooks.decode_event(sign_event(key, "evt-1", "entity-1"), public_key)
+
+		self.assertEqual((event.event_id, event.entity_type, event.entity_id), ("evt-1", TEST_ENTITY_TYPE, "entity-1"))
+		self.assertEqual(json.loads(event.payload)["slug"], "updated")
+
+	def test_foreign_signature_is_refused(self):
+		key, public_key = make_key_pair()
+		other_key, other_public_key = make_key_pair()
+		with self.assertRaises(jwt.InvalidTokenError):
+			webhooks.decode_event(sign_event(other_key, "evt-1", "entity-1"), public_key)
+
+class TestWebhookInbox(unittest.TestCase):
+	"""The consumer commits as it goes, so the events are deleted explicitly"""
+
+	def setUp(self):
+		self.prefix = f"_test_wix_event_{frappe.generate_hash(length=8)}"
+		self.count = 0
+		self.failing = set()
+		self.handled = []
+		self.settings = wix_settings(max_retry_attempts=3)
+		self.settings.start()
+		self.handlers = patch.dict(webhooks.EVENT_HANDLERS, {TEST_ENTITY_TYPE: self.handle})
+		self.handlers.start()
+
+	def tearDown(self):
+		self.handlers.stop()
+		self.settings.stop()
+		frappe.db.rollback()
+		frappe.db.delete("Wix Webhook Event", {"name": ("like", f"{self.prefix}%")})
+		frappe.db.commit()
+
+	def handle(self, data, settings):
+		if data["n"] in self.failing:
+			raise ValueError(f"event {data['n']} failed")
+		self.handled.append(data["n"])
+
+	def store(self, entity_id):
+		"""Store the next event of an entity; names sort in arrival order"""
+		self.count += 1
+		name = f"{self.prefix}_{self.count:03d}"
+		webhooks.store_event(frappe._dict(event_id=name, event_type="wix.test.updated", entity_type=TEST_ENTITY_TYPE,
+			entity_id=entity_id, payload=json.dumps({"n": self.count})))
+		frappe.db.commit()
+		return name
+
+	def get_event(self, name):
+		return frappe.db.get_value("Wix Webhook Event", name, ["status", "attempts", "next_attempt_at"], as_dict=True)
+
+	def test_redelivery_is_stored_once(self):
+		name = self.store("entity-1")
+		webhooks.store_event(frappe._dict(event_id=name, event_type="wix.test.updated",
+			entity_type=TEST_ENTITY_TYPE, entity_id="entity-1", payload="{}"))
+		self.assertEqual(frappe.db.count("Wix Webhook Event", {"name": name}), 1)
+
+	def test_events_are_processed_in_order(self):
+		names = [self.store("entity-1"), self.store("entity-2"), self.store("entity-1")]
+		webhooks.process_webhook_inbox()
+
+		self.assertEqual(self.handled, [1, 2, 3])
+		self.assertTrue(all(self.get_event(name).status == "Processed" for name in names))
+
+	def test_failed_event_backs_off_and_holds_its_entity(self):
+		self.failing.add(1)
+		first, other, later = self.store("entity-1"), self.store("entity-2"), self.store("entity-1")
+		webhooks.process_webhook_inbox()
+
+		failed = self.get_event(first)
+		self.assertEqual((failed.status, failed.attempts), ("Queued", 1))
+		self.assertGreater(failed.next_attempt_at, now_datetime())
+		self.assertEqual(self.get_event(other).status, "Processed")
+		# Still behind the failed event of the same entity
+		self.assertEqual(self.get_event(later).status, "Queued")
+		self.assertEqual(self.handled, [2])
+
+	def test_event_out_of_retries_fails(self):
+		self.failing.add(1)
+		first, later = self.store("entity-1"), self.store("entity-1")
+		with patch.object(webhooks, "get_max_retry_attempts", return_value=0):
+			webhooks.process_webhook_inbox()
+			self.assertEqual(self.get_event(first).status, "Failed")
+
+			# A failed event no longer holds up the ones after it
+			webhooks.process_webhook_inbox()
+		self.assertEqual(self.get_event(later).status, "Processed")
+
+	def test_one_consumer_at_a_time(self):
+		name = self.store("entity-1")
+		with job_lock("webhook_inbox", 10) as acquired:
+			self.assertTrue(acquired)
+			webhooks.process_webhook_inbox()
+		self.assertEqual(self.get_event(name).status, "Queued")
+
+	def test_abandoned_events_are_claimed_again(self):
+		name = self.store("entity-1")
+		self.assertTrue(webhooks.claim_event(name))
+		self.assertFalse(webhooks.claim_event(name))
+
+		# The consumer holding it died; the next one picks it up
+		webhooks.process_webhook_inbox()
+		self.assertEqual(self.get_event(name).status, "Processed")
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from unittest.mock import patch
+
+import frappe
+
+from wix_integration import circuit_breaker, wix_client
+from wix_integration.api import PRODUCTS_ENDPOINT, WixAPIError, WixCircuitOpenError, make_wix_request
+from wix_integration.tests.utils import StubServerTestCase
+
+class TestWixClient(StubServerTestCase):
+	def test_create_product(self):
+		response = make_wix_request("POST", PRODUCTS_ENDPOINT, data={"product": {"name": "Stub Tee"}})
+		self.assertEqual(response["product"]["name"], "Stub Tee")
+		self.assertIn(response["product"]["id"], self.server.state.products)
+
+	def test_error_status_raises(self):
+		with self.assertRaises(WixAPIError) as raised:
+			make_wix_request("POST", PRODUCTS_ENDPOINT, data={"product": {}})
+		self.assertEqual(raised.exception.status_code, 400)
+
+		# A refused request is not an outage
+		self.assertEqual(circuit_breaker.get_status(self.site)["failures"], 0)
+
+	def test_connections_are_reused(self):
+		make_wix_request("GET", PRODUCTS_ENDPOINT)
+		before = wix_client.get_pool_stats()
+
+		for _ in range(5):
+			make_wix_request("GET", PRODUCTS_ENDPOINT, params={"limit": 1})
+
+		after = wix_client.get_pool_stats()
+		self.assertEqual(after["requests"] - before["requests"], 5)
+		self.assertEqual(after["connections"], before["connections"])
+
+	def test_connection_error_counts_towards_the_circuit(self):
+		# Nothing listens on the discard port
+		with patch.dict(frappe.conf, {"wix_api_base_url": "http://127.0.0.1:9"}):
+			with self.assertRaises(WixAPIError):
+				make_wix_request("GET", PRODUCTS_ENDPOINT)
+
+		self.assertEqual(circuit_breaker.get_status(self.site)["failures"], 1)
+
+	def test_open_circuit_sends_nothing(self):
+		circuit_breaker.set_state(self.site, "open")
+		sent = self.server.state.request_count
+
+		with self.assertRaises(WixCircuitOpenError):
+			make_wix_request("GET", PRODUCTS_ENDPOINT)
+		self.assertEqual(self.server.state.request_count, sent)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import dataclasses
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from wix_integration import circuit_breaker
+from wix_integration.doctype.wix_settings import wix_settings
+from wix_integration.tests.utils import StubServerTestCase
+
+class TestCredentialCheck(StubServerTestCase):
+	def setUp(self):
+		super(TestCredentialCheck, self).setUp()
+		self.doc = frappe.get_single("Wix Settings")
+		self.doc.update({"enable_sync": 0, "wix_site_id": self.site, "wix_api_key": "_test_wix_api_key"})
+
+	def tearDown(self):
+		frappe.cache().delete_value(f"wix_credentials_verified|{self.doc.get_credentials_hash()}")
+		super(TestCredentialCheck, self).tearDown()
+
+	def test_verified_credentials_are_not_checked_again(self):
+		self.doc.validate()
+		self.assertTrue(self.doc.is_credentials_verified())
+		sent = self.server.state.request_count
+
+		self.doc.validate()
+		self.assertEqual(self.server.state.request_count, sent)
+
+	def test_changed_credentials_are_checked(self):
+		self.doc.validate()
+		self.addCleanup(frappe.cache().delete_value, f"wix_credentials_verified|{self.doc.get_credentials_hash()}")
+		sent = self.server.state.request_count
+
+		self.doc.wix_api_key = "_test_wix_other_key"
+		self.assertFalse(self.doc.is_credentials_verified())
+		self.doc.validate()
+		self.assertEqual(self.server.state.request_count, sent + 1)
+
+	def test_check_runs_past_an_open_circuit_and_closes_it(self):
+		circuit_breaker.set_state(self.site, "open")
+		frappe.flags.wix_circuit_probe = False
+
+		self.doc.validate_wix_credentials()
+
+		self.assertFalse(circuit_breaker.is_open(self.site))
+		# The caller's flag is left as it was
+		self.assertFalse(frappe.flags.wix_circuit_probe)
+
+class TestSettingsSnapshot(unittest.TestCase):
+	def setUp(self):
+		wix_settings._snapshots.clear()
+		# Check the version in Redis on every call
+		self.interval = patch.object(wix_settings, "VERSION_CHECK_INTERVAL", 0)
+		self.interval.start()
+
+	def tearDown(self):
+		self.interval.stop()
+		wix_settings._snapshots.clear()
+		frappe.db.rollback()
+
+	def test_snapshot_is_reused_until_the_version_moves(self):
+		snapshot = wix_settings.get_settings_snapshot()
+		self.assertIs(wix_settings.get_settings_snapshot(), snapshot)
+
+		wix_settings.bump_settings_version()
+		self.assertIsNot(wix_settings.get_settings_snapshot(), snapshot)
+
+	def test_snapshot_is_read_only(self):
+		snapshot = wix_settings.get_settings_snapshot()
+		with self.assertRaises(dataclasses.FrozenInstanceError):
+			snapshot.enable_sync = True
+		self.assertNotIn(snapshot.wix_api_key or "_no_key_", repr(snapshot))
+
+	def test_version_moves_only_after_commit(self):
+		version = wix_settings.get_settings_version()
+		frappe.get_single("Wix Settings").on_update()
+		self.assertEqual(wix_settings.get_settings_version(), version)
+
+		# What the commit of the save runs
+		frappe.db.after_commit.run()
+		self.assertNotEqual(wix_settings.get_settings_version(), version)
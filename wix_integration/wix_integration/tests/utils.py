@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Shared fixtures for the Wix integration tests"""
+from __future__ import unicode_literals
+import dataclasses
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from wix_integration import circuit_breaker, rate_limiter, stub_server
+from wix_integration.api import get_selling_price_list
+from wix_integration.doctype.wix_settings.wix_settings import WixSettings, WixSettingsSnapshot
+
+TEST_ITEM_GROUP = "_Test Wix Item Group"
+
+def wix_settings(**values):
+	"""Patch the Wix Settings snapshot read by every module"""
+	snapshot = dataclasses.replace(WixSettingsSnapshot.load(), **values)
+	return patch.object(WixSettings, "get_settings", return_value=snapshot)
+
+def make_test_site_id():
+	"""A Wix site ID of its own, so Redis state never leaks between tests"""
+	return f"_test_wix_site_{frappe.generate_hash(length=8)}"
+
+def clear_site_state(wix_site_id):
+	"""Drop the rate limiter bucket and circuit of a test site"""
+	frappe.cache().execute_command("DEL", rate_limiter.get_bucket_key(wix_site_id))
+	frappe.cache().execute_command("DEL", circuit_breaker.get_circuit_key(wix_site_id))
+
+class StubServerTestCase(unittest.TestCase):
+	"""Points the Wix client at an in-process stub server with a generous rate limit"""
+
+	reject_skus = ()
+
+	@classmethod
+	def setUpClass(cls):
+		cls.server, base_url = stub_server.start_in_thread(reject_skus=list(cls.reject_skus))
+		cls.conf = patch.dict(frappe.conf, {"wix_api_base_url": base_url, "wix_rate_limit": 100, "wix_rate_burst": 100})
+		cls.conf.start()
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.conf.stop()
+		cls.server.shutdown()
+		cls.server.server_close()
+
+	def setUp(self):
+		self.server.state.throttle_every = 0
+		self.site = make_test_site_id()
+		self.settings = wix_settings(**self.get_settings_values())
+		self.settings.start()
+
+	def tearDown(self):
+		self.settings.stop()
+		clear_site_state(self.site)
+		frappe.db.rollback()
+
+	def get_settings_values(self):
+		return {
+			"enable_sync": True,
+			"wix_site_id": self.site,
+			"wix_api_key": "_test_wix_api_key",
+			"sync_products": True,
+			"max_retry_attempts": 3
+		}
+
+def make_item_group():
+	if not frappe.db.exists("Item Group", TEST_ITEM_GROUP):
+		frappe.get_doc({
+			"doctype": "Item Group",
+			"item_group_name": TEST_ITEM_GROUP,
+			"parent_item_group": "All Item Groups",
+			"is_group": 0
+		}).insert(ignore_permissions=True)
+	return TEST_ITEM_GROUP
+
+def make_item(item_code, price=None, **values):
+	"""An Item outside the sync queue, optionally priced in the Wix price list"""
+	item = frappe.get_doc(dict({
+		"doctype": "Item",
+		"item_code": item_code,
+		"item_name": item_code,
+		"description": f"<p>{item_code} for the <b>Wix</b> tests</p>",
+		"item_group": make_item_group(),
+		"stock_uom": "Nos",
+		"sync_with_wix": 0
+	}, **values)).insert(ignore_permissions=True)
+
+	if price is not None:
+		make_item_price(item.name, price)
+	return item.name
+
+def make_item_price(item_code, price):
+	frappe.get_doc({
+		"doctype": "Item Price",
+		"item_code": item_code,
+		"price_list": get_selling_price_list(),
+		"price_list_rate": price
+	}).insert(ignore_permissions=True)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import now_datetime
+
+from .payload_store import encode_payload
+
+class SyncTimer(object):
+	"""Monotonic stopwatch that adds up the time a sync spends in each stage"""
+
+	def __init__(self):
+		self.stages = {}
+
+	@contextmanager
+	def stage(self, name):
+		started = time.monotonic()
+		try:
+			yield
+		finally:
+			self.add(name, time.monotonic() - started)
+
+	def add(self, name, seconds):
+		self.stages[name] = self.stages.get(name, 0) + seconds
+
+	@property
+	def duration(self):
+		return sum(self.stages.values())
+
+def log_integration(operation, status, request_data=None, response_data=None,
+		error_message=None, reference_doctype=None, reference_name=None, duration=None):
+	"""Record a single Wix API call in Wix Integration Log; duration is in seconds"""
+	try:
+		frappe.get_doc({
+			"doctype": "Wix Integration Log",
+			"operation": operation,
+			"status": status,
+			"reference_doctype": reference_doctype,
+			"reference_name": reference_name,
+			"request_data": encode_payload(request_data, keep_full=status != "Success"),
+			"response_data": encode_payload(response_data, keep_full=status != "Success"),
+			"error_message": error_message,
+			"duration": duration
+		}).insert(ignore_permissions=True)
+	except Exception as e:
+		frappe.logger().error(f"Failed to write Wix Integration Log: {str(e)}")
+
+def log_sync(sync_type, status, reference_doctype=None, reference_name=None, wix_id=None, error_message=None,
+	duration=None, timer=None):
+	"""Record the outcome of syncing a document in Wix Sync Log.
+
+	Pass a SyncTimer to store the time spent building the payload, waiting on
+	Wix and writing back; the duration (in seconds) is then their sum.
+	"""
+	stages = timer.stages if timer else {}
+	if timer and duration is None:
+		duration = timer.duration
+
+	try:
+		frappe.get_doc({
+			"doctype": "Wix Sync Log",
+			"sync_type": sync_type,
+			"status": status,
+			"sync_date": now_datetime(),
+			"reference_doctype": reference_doctype,
+			"reference_name": reference_name,
+			"wix_id": wix_id,
+			"error_message": error_message,
+			"duration": duration,
+			"build_time": stages.get("build"),
+			"http_time": stages.get("http"),
+			"db_time": stages.get("db")
+		}).insert(ignore_permissions=True)
+	except Exception as e:
+		frappe.logger().error(f"Failed to write Wix Sync Log: {str(e)}")
+
+@contextmanager
+def job_lock(name, timeout):
+	"""Single-flight guard for a job across workers.
+
+	Yields False, without waiting, when another worker holds the lock. The
+	lock expires after `timeout` seconds in case its holder dies.
+	"""
+	lock = frappe.cache().lock(frappe.cache().make_key(f"wix_job_lock|{name}"), timeout=timeout)
+	acquired = lock.acquire(blocking=False)
+	try:
+		yield acquired
+	finally:
+		if acquired:
+			try:
+				lock.release()
+			except Exception:
+				# Expired while the job was still running
+				pass
+
+def retry_failed_syncs():
+	"""Retry the failed syncs whose backoff has expired"""
+	from .retry_queue import process_due_retries
+	return process_due_retries()
+
+def get_checkpoint(checkpoint_name):
+	"""Saved state of an incremental sync job, as a dict (empty if it never ran)"""
+	return frappe.db.get_value(
+		"Wix Sync Checkpoint",
+		checkpoint_name,
+		["watermark", "last_id", "cursor", "last_run", "processed_count"],
+		as_dict=True
+	) or frappe._dict()
+
+def set_checkpoint(checkpoint_name, **values):
+	"""Create or update the checkpoint of an incremental sync job.
+
+	The write joins the caller's transaction, so committing a page of work
+	and its checkpoint happens atomically.
+	"""
+	values["last_run"] = now_datetime()
+	if frappe.db.exists("Wix Sync Checkpoint", checkpoint_name):
+		frappe.db.set_value("Wix Sync Checkpoint", checkpoint_name, values, update_modified=False)
+	else:
+		frappe.get_doc(dict(values, doctype="Wix Sync Checkpoint", checkpoint_name=checkpoint_name)).insert(
+			ignore_permissions=True
+		)
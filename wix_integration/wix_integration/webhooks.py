@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Wix webhook receiver and inbox consumer.
+
+The receiver only verifies the JWT signature, stores the event in the Wix
+Webhook Event inbox (deduplicated by event ID) and returns. The consumer
+runs in the background, one at a time, processes events oldest first and
+keeps the order of events for the same entity: once an event fails, it
+backs off like the retry queue and later events of that entity wait
+behind it. Events are marked Processed only after their handler
+succeeded, so delivery is at-least-once.
+"""
+from __future__ import unicode_literals
+import hashlib
+import json
+
+import frappe
+from frappe.utils import add_to_date, now_datetime
+import jwt
+
+from .api import get_wix_settings
+from .id_resolver import forget, forget_all
+from .retry_queue import get_backoff, get_max_retry_attempts
+from .utils import SyncTimer, job_lock, log_sync
+
+INBOX_BATCH_SIZE = 200
+
+# Longer than the short queue's job timeout, so the lock outlives its job
+INBOX_LOCK_TIMEOUT = 600
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def receive():
+	"""Webhook endpoint registered in the Wix app dashboard"""
+	settings = get_wix_settings()
+	if not settings.enable_webhook or not settings.webhook_public_key:
+		raise frappe.PermissionError
+
+	token = frappe.request.get_data(as_text=True)
+	try:
+		event = decode_event(token, settings.webhook_public_key)
+	except (jwt.InvalidTokenError, ValueError, KeyError):
+		frappe.local.response.http_status_code = 401
+		return
+
+	store_event(event)
+	enqueue_inbox_processing()
+
+def decode_event(token, public_key):
+	"""Verify the RS256 signature and pull out the fields needed to route the event"""
+	claims = jwt.decode(token, public_key, algorithms=["RS256"])
+	envelope = json.loads(claims["data"])
+
+	raw_data = envelope.get("data") or "{}"
+	data = json.loads(raw_data) if isinstance(raw_data, str) else raw_data
+
+	return frappe._dict(
+		event_id=data.get("id") or hashlib.sha256(token.encode("utf-8")).hexdigest(),
+		event_type=envelope.get("eventType"),
+		entity_type=data.get("entityFqdn"),
+		entity_id=data.get("entityId"),
+		payload=raw_data if isinstance(raw_data, str) else json.dumps(raw_data)
+	)
+
+def store_event(event):
+	"""Append an event to the inbox with a single INSERT; redeliveries are ignored"""
+	now = now_datetime()
+	doc = frappe.get_doc({
+		"doctype": "Wix Webhook Event",
+		"name": event.event_id,
+		"event_id": event.event_id,
+		"event_type": event.event_type,
+		"entity_type": event.entity_type,
+		"entity_id": event.entity_id,
+		"payload": event.payload,
+		"status": "Queued",
+		"attempts": 0,
+		"owner": "Guest",
+		"modified_by": "Guest",
+		"creation": now,
+		"modified": now
+	})
+	doc.db_insert(ignore_if_duplicate=True)
+
+def enqueue_inbox_processing():
+	"""Start the inbox consumer after commit unless one is already queued"""
+	frappe.enqueue(
+		"wix_integration.tasks.process_webhook_events",
+		queue="short",
+		job_id="wix_process_webhook_inbox",
+		deduplicate=True,
+		enqueue_after_commit=True
+	)
+
+def process_webhook_inbox(batch_size=INBOX_BATCH_SIZE):
+	"""Process queued webhook events, oldest first and in order per entity.
+
+	Only one consumer runs at a time. Events still marked Processing were
+	left behind by a consumer that died, and are queued again.
+	"""
+	with job_lock("webhook_inbox", INBOX_LOCK_TIMEOUT) as acquired:
+		if not acquired:
+			return
+
+		frappe.db.sql("""
+			UPDATE `tabWix Webhook Event` SET status = 'Queued' WHERE status = 'Processing'
+		""")
+		frappe.db.commit()
+		drain_inbox(batch_size)
+
+def drain_inbox(batch_size):
+	settings = get_wix_settings()
+	max_retries = get_max_retry_attempts(settings)
+	attempted = set()
+
+	while True:
+		blocked = set()
+		progressed = False
+		after = None
+		now = now_datetime()
+
+		while True:
+			events = get_queued_events(after, batch_size)
+			if not events:
+				break
+			after = (events[-1].creation, events[-1].name)
+
+			for event in events:
+				entity = (event.entity_type, event.entity_id)
+				if event.name in attempted or entity in blocked \
+						or (event.next_attempt_at and event.next_attempt_at > now):
+					# Keep later events of this entity behind the one that failed
+					blocked.add(entity)
+					continue
+
+				attempted.add(event.name)
+				if not claim_event(event.name):
+					blocked.add(entity)
+					continue
+
+				try:
+					handle_event(event, settings)
+					frappe.db.set_value("Wix Webhook Event", event.name, {
+						"status": "Processed",
+						"attempts": event.attempts + 1,
+						"next_attempt_at": None,
+						"processed_at": now_datetime(),
+						"error_message": None
+					}, update_modified=False)
+					progressed = True
+				except Exception as e:
+					frappe.db.rollback()
+					forget_all()
+					attempts = event.attempts + 1
+					failed = attempts > max_retries
+					frappe.db.set_value("Wix Webhook Event", event.name, {
+						"status": "Failed" if failed else "Queued",
+						"attempts": attempts,
+						"next_attempt_at": None if failed else add_to_date(now_datetime(), seconds=get_backoff(attempts)),
+						"error_message": str(e)
+					}, update_modified=False)
+					blocked.add(entity)
+
+				frappe.db.commit()
+
+		if not progressed:
+			break
+
+def get_queued_events(after, limit):
+	"""A page of queued events in arrival order, after the (creation, name) keyset position"""
+	conditions = ""
+	if after:
+		conditions = "AND (creation > %(creation)s OR (creation = %(creation)s AND name > %(name)s))"
+
+	return frappe.db.sql(f"""
+		SELECT name, creation, event_type, entity_type, entity_id, payload, attempts, next_attempt_at
+		FROM `tabWix Webhook Event`
+		WHERE status = 'Queued' {conditions}
+		ORDER BY creation ASC, name ASC
+		LIMIT %(limit)s
+	""", {"creation": after[0] if after else None, "name": after[1] if after else None, "limit": limit}, as_dict=True)
+
+def claim_event(name):
+	"""Move an event from Queued to Processing; False if it was no longer Queued"""
+	frappe.db.sql("""
+		UPDATE `tabWix Webhook Event` SET status = 'Processing' WHERE name = %s AND status = 'Queued'
+	""", (name,))
+	claimed = frappe.db.sql("SELECT ROW_COUNT()")[0][0] > 0
+	frappe.db.commit()
+	return claimed
+
+def handle_event(event, settings):
+	"""Dispatch an inbox event to the handler of its entity type"""
+	handler = EVENT_HANDLERS.get(event.entity_type)
+	if handler:
+		handler(json.loads(event.payload or "{}"), settings)
+
+def get_entity(data):
+	"""Entity carried by a created/updated domain event"""
+	entity = (data.get("createdEvent") or {}).get("entityAsJson") \
+		or (data.get("updatedEvent") or {}).get("currentEntityAsJson")
+	return json.loads(entity) if isinstance(entity, str) else entity
+
+def handle_order_event(data, settings):
+	"""Create or refresh the Sales Order of a created/updated Wix order"""
+	if not settings.sync_orders:
+		return
+
+	order = get_entity(data)
+	if not order:
+		return
+
+	from .orders import upsert_sales_order
+	timer = SyncTimer()
+	with timer.stage("db"):
+		result, sales_order = upsert_sales_order(order, settings)
+	if result != "unchanged":
+		log_sync("Order Sync", "Success", "Sales Order", sales_order, wix_id=order.get("id"), timer=timer)
+
+def handle_product_event(data, settings):
+	"""Track deletions and revision changes of Wix products linked to Items"""
+	product_id = data.get("entityId")
+	if not product_id:
+		return
+
+	if data.get("slug") == "deleted":
+		# The next push of the Item creates the product again
+		frappe.db.sql("""
+			UPDATE `tabItem`
+			SET wix_product_id = NULL, wix_product_revision = NULL, wix_payload_hash = NULL,
+				wix_sync_status = ''
+			WHERE wix_product_id = %s
+		""", (product_id,))
+		forget("Product", [product_id])
+		return
+
+	product = get_entity(data) or {}
+	if product.get("revision"):
+		# Keep the stored revision current so our next update is not rejected
+		frappe.db.sql("""
+			UPDATE `tabItem` SET wix_product_revision = %s WHERE wix_product_id = %s
+		""", (product.get("revision"), product_id))
+
+EVENT_HANDLERS = {
+	"wix.ecom.v1.order": handle_order_event,
+	"wix.stores.catalog.v3.product": handle_product_event
+}
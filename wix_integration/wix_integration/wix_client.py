@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import os
+import threading
+
+import frappe
+from frappe.utils import cint
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import circuit_breaker, rate_limiter
+
+WIX_API_BASE = "https://www.wixapis.com"
+DEFAULT_TIMEOUT = 30
+
+# Connections kept open per host; sized for the concurrent push executor
+POOL_MAXSIZE = 20
+
+# Times a call is retried after Wix answered 429
+MAX_THROTTLE_RETRIES = 3
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def get_api_base():
+	"""Wix API base URL; `wix_api_base_url` in site config points it at a stub server"""
+	return (frappe.conf.get("wix_api_base_url") or WIX_API_BASE).rstrip("/")
+
+def get_session():
+	"""Keep-alive session shared by every Wix call in this worker process.
+
+	The session is rebuilt after a fork so that workers never share sockets
+	inherited from a preloaded parent.
+	"""
+	global _session, _session_pid
+
+	if _session is not None and _session_pid == os.getpid():
+		return _session
+
+	with _session_lock:
+		if _session is None or _session_pid != os.getpid():
+			session = requests.Session()
+			adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE, pool_block=False)
+			session.mount("https://", adapter)
+			session.mount("http://", adapter)
+			session.headers.update({
+				"Accept": "application/json",
+				"Accept-Encoding": "gzip, deflate",
+				"Connection": "keep-alive"
+			})
+			_session = session
+			_session_pid = os.getpid()
+
+	return _session
+
+def get_timeout(settings=None):
+	"""Request timeout in seconds from the Connection Timeout field of Wix Settings"""
+	if settings is None:
+		from .api import get_wix_settings
+		settings = get_wix_settings()
+
+	return cint(settings.get("connection_timeout") if settings else 0) or DEFAULT_TIMEOUT
+
+def get_url(endpoint):
+	return endpoint if endpoint.startswith("http") else f"{get_api_base()}{endpoint}"
+
+def request(method, endpoint, headers, json=None, params=None, timeout=None):
+	"""Send a request to the Wix API over the pooled session and return the raw response.
+
+	Every call first checks the site's circuit breaker, which raises
+	CircuitOpenError while Wix is considered down, then takes a token from
+	the shared rate limiter. A 429 slows the limiter down for all workers
+	and the call is retried. Connection errors, timeouts and 5xx answers
+	count towards opening the circuit.
+	"""
+	url = get_url(endpoint)
+	timeout = timeout or DEFAULT_TIMEOUT
+	wix_site_id = (headers or {}).get("wix-site-id")
+
+	circuit_breaker.before_request(wix_site_id)
+
+	for attempt in range(MAX_THROTTLE_RETRIES + 1):
+		rate_limiter.acquire(wix_site_id, timeout=timeout)
+		try:
+			response = send(method, url, headers, json, params, timeout)
+		except requests.exceptions.RequestException as e:
+			record_error(wix_site_id, e)
+			raise
+
+		if not record_response(wix_site_id, response):
+			return response
+
+	return response
+
+def send(method, url, headers, json=None, params=None, timeout=None):
+	"""The bare HTTP round trip. Safe to run in a pool thread: no site context needed."""
+	return get_session().request(
+		method,
+		url,
+		headers=headers,
+		json=json,
+		params=params,
+		timeout=timeout or DEFAULT_TIMEOUT
+	)
+
+def record_error(wix_site_id, error):
+	"""Count connection errors and timeouts towards opening the circuit"""
+	if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+		circuit_breaker.record_result(wix_site_id, success=False)
+
+def record_response(wix_site_id, response):
+	"""Feed a response to the circuit breaker or, for a 429, the rate limiter; True if throttled"""
+	if response.status_code != 429:
+		circuit_breaker.record_result(wix_site_id, success=response.status_code < 500)
+		return False
+
+	rate_limiter.report_throttle(
+		wix_site_id,
+		rate_limiter.parse_retry_after(response.headers.get("Retry-After"))
+	)
+	return True
+
+def get_pool_stats():
+	"""Requests sent and connections opened by this worker, and how often a connection was reused"""
+	stats = {"requests": 0, "connections": 0}
+
+	session = _session if _session_pid == os.getpid() else None
+	if session is not None:
+		for adapter in set(session.adapters.values()):
+			pools = adapter.poolmanager.pools
+			for key in pools.keys():
+				pool = pools.get(key)
+				if pool is None:
+					continue
+				stats["requests"] += pool.num_requests
+				stats["connections"] += pool.num_connections
+
+	reused = max(stats["requests"] - stats["connections"], 0)
+	stats["reuse_ratio"] = round(reused / stats["requests"], 3) if stats["requests"] else 0
+	return stats